@@ -4,8 +4,8 @@ assertion statements for commonly used function parameters and other checking fu
 
 Creator: Sebastian Guo
 """
+import re
 import pandas, numpy
-from nltk import NaiveBayesClassifier
 
 class FormatError(Exception):
     """
@@ -55,7 +55,7 @@ def assert_type_df(df_reader):
     """ Assert: df_reader is a pandas DataFrame object. """
     assert type(df_reader) == pandas.DataFrame, repr(df_reader) + " is not a DataFrame object."
 
-def assert_raw_data_file_format(raw_data_file):
+def assert_raw_data_file_format(raw_data_file, text=True):
     """
     Asserts the file contains the column names global_ID, local_ID, and
     comment. If one of the column names does not exist, the function returns false.
@@ -67,19 +67,31 @@ def assert_raw_data_file_format(raw_data_file):
     Parameter raw_data_file: the reader with the file that you want
     to extract the data of the column numbers from.
     Precondition: must be a DataFrame object from the pandas python module.
+
+    Parameter text: whether or not the column comment is required. Tables whose
+    text is read from a comment store only need the ID columns.
+    Precondition: must be a boolean.
     """
     assert_type_df(raw_data_file)
     try:
         raw_data_file["global_ID"]
         raw_data_file["local_ID"]
-        raw_data_file["comment"]
+        if text:
+            raw_data_file["comment"]
     except:
         raise AssertionError("The column headers for the file do not exist or are incorrectly formatted.")
-    assert raw_data_file["global_ID"].dtypes == int and raw_data_file["local_ID"].dtypes == int, \
+    assert pandas.api.types.is_integer_dtype(raw_data_file["global_ID"]) and \
+        pandas.api.types.is_integer_dtype(raw_data_file["local_ID"]), \
         "The columns global and local ID do not contain integers."
 
 def assert_roster_file_format(roster_file):
-    """ Asserts the file contains the correct column names. """
+    """
+    Asserts the file contains the correct column names. A Roster object from
+    module roster is checked through the DataFrame it was built from.
+    """
+    import roster
+    if isinstance(roster_file, roster.Roster):
+        roster_file = roster_file.frame
     assert_type_df(roster_file)
     try:
         roster_file["Player"]
@@ -123,22 +135,31 @@ def assert_agg_roster_ment_file_format(game_file, roster_file):
         game_file["named entity"]
         game_file["category"]
         game_file["mentions"]
-        for player in roster_file["Player"]:
+        import roster
+        for player in roster.as_roster(roster_file).player_list:
             game_file[player]
     except:
         raise AssertionError("The game_file does not contain the correct headers.")
 
 def assert_cmt_lvl_ment_file_format(cmt_lvl_ment_file, roster_list):
-    """ Assert file is a DataFrame and contains the correct headers. """
-    assert_raw_data_file_format(cmt_lvl_ment_file)
+    """
+    Assert file is a DataFrame and contains the correct headers. The comments
+    are either in a column "comment" or referenced by a column "comment_ID" (see
+    module comment_store).
+    """
+    assert_type_df(cmt_lvl_ment_file)
     try:
         cmt_lvl_ment_file["global_ID"]
         cmt_lvl_ment_file["local_ID"]
-        cmt_lvl_ment_file["comment"]
+        if "comment_ID" not in cmt_lvl_ment_file.columns:
+            cmt_lvl_ment_file["comment"]
         for player in roster_list:
             cmt_lvl_ment_file[player]
     except:
         raise AssertionError("The headers of the file are incorrectly formatted.")
+    assert pandas.api.types.is_integer_dtype(cmt_lvl_ment_file["global_ID"]) and \
+        pandas.api.types.is_integer_dtype(cmt_lvl_ment_file["local_ID"]), \
+        "The columns global and local ID do not contain integers."
 
 def assert_game_thread_info_file_format(game_thread_info_file):
     """ Assert that file has correct headers and is a DataFrame. """
@@ -150,6 +171,17 @@ def assert_game_thread_info_file_format(game_thread_info_file):
     except:
         raise AssertionError("The file does not contain the correct headers.")
 
+def assert_thread_index(thread_index):
+    """ Assert the thread index is a DataFrame made by module thread_index. """
+    assert_type_df(thread_index)
+    try:
+        thread_index["Thread Type"]
+        thread_index["Post Date"]
+        thread_index["Teams"]
+    except:
+        raise AssertionError("The thread index does not contain the correct headers.")
+    assert thread_index.index.name == "ID", "The thread index is not indexed by ID."
+
 def assert_season_result_file_format(season_result_file):
     """ Assert the file is a DataFrame and has the correct headers. """
     assert_type_df(season_result_file)
@@ -205,7 +237,8 @@ def assert_mgmt_stat_file_format(mgmt_stat_file):
         assert headers[0] == "Manager Average Net Sentiment Per Game"
         assert headers[3] == "Manager Average Positive Comments Per Game"
         assert headers[6] == "Manager Average Negative Comments Per Game"
-        assert headers[9] == "Manager Average Mentions Per Game"
+        # calc_mgmt_stats() writes the games won and lost in the last row.
+        assert re.fullmatch(r"Win/Loss Ratio: \d+/\d+", headers[9])
         for row in range(mgmt_stat_file.shape[0]):
             if row in [0, 3, 6, 9]: # Correspond to empty rows in file
                 assert pandas.isnull(mgmt_stat_file["Win"][row])
@@ -216,6 +249,17 @@ def assert_mgmt_stat_file_format(mgmt_stat_file):
     except:
         raise AssertionError("The file does not contain correct headers.")
 
+def assert_mgmt_mentions_file_format(mgmt_mentions_file):
+    """ Assert the file is a DataFrame object and has the correct headers. """
+    assert_type_df(mgmt_mentions_file)
+    try:
+        mgmt_mentions_file["Coach"]
+        mgmt_mentions_file["Race"]
+        mgmt_mentions_file["Mentions Per Win"]
+        mgmt_mentions_file["Mentions Per Loss"]
+    except:
+        raise AssertionError("The file does not contain the correct headers.")
+
 def assert_compare_machine_hand(machine_code_file, ground_truth_file):
     """
     Asserts the file machine_code and hand_code have the same column headers and
@@ -233,7 +277,112 @@ def assert_compare_machine_hand(machine_code_file, ground_truth_file):
     assert machine_code_file.columns.tolist() == ground_truth_file.columns.tolist(), \
         "The headers of the two files do not match up."
 
+def assert_compare_machine_hand_keys(machine_code_file, ground_truth_file, roster_list):
+    """
+    Asserts both files have the columns global_ID, local_ID and the players in
+    roster_list, and every (global_ID, local_ID) comment of ground_truth_file
+    is in machine_code_file. Unlike assert_compare_machine_hand(), the files
+    do not have to hold the same comments in the same order.
+    """
+    assert_type_df(machine_code_file)
+    assert_type_df(ground_truth_file)
+    assert_str_list(roster_list)
+    for column in ["global_ID", "local_ID"] + roster_list:
+        assert column in machine_code_file.columns, \
+            "machine_code_file does not have the column " + repr(column) + "."
+        assert column in ground_truth_file.columns, \
+            "ground_truth_file does not have the column " + repr(column) + "."
+    keys = ["global_ID", "local_ID"]
+    machine_keys = pandas.MultiIndex.from_frame(machine_code_file[keys])
+    truth_keys = pandas.MultiIndex.from_frame(ground_truth_file[keys])
+    assert truth_keys.isin(machine_keys).all(), \
+        "ground_truth_file has comments that are not in machine_code_file."
+
+def assert_train_size(train_size):
+    """
+    Assert: train_size is either a positive integer or a float between 0 and 1.
+    """
+    if type(train_size) == float:
+        assert 0 < train_size < 1, repr(train_size) + " is not between 0 and 1."
+    else:
+        assert type(train_size) == int, repr(train_size) + " is not an integer or float."
+        assert train_size > 0, repr(train_size) + " is not greater than zero."
+
+def assert_nb_counts(counts):
+    """ Assert counts is a dictionary of Naive Bayes counts from new_nb_counts(). """
+    assert type(counts) == dict, repr(counts) + " is not a dictionary."
+    for key in ["label_freq", "feature_freq", "feature_values"]:
+        assert key in counts, "The Naive Bayes counts do not contain " + repr(key) + "."
+
+def assert_labelled_comment_file_format(labelled_file):
+    """
+    Assert the file is a DataFrame with the headers "comment" and "label" and
+    every label is either "Positive" or "Negative".
+    """
+    assert_type_df(labelled_file)
+    try:
+        labelled_file["comment"]
+        labels = labelled_file["label"]
+    except:
+        raise AssertionError("The file does not contain the correct headers.")
+    assert labels.isin(["Positive", "Negative"]).all(), \
+        "The labels must be either 'Positive' or 'Negative'."
+
+def assert_comment_list(comments):
+    """
+    Assert: comments is a list and every entry is either a string or a list of
+    string tokens.
+    """
+    assert type(comments) == list, repr(comments) + " is not a list."
+    for comment in comments:
+        if type(comment) == list:
+            assert_str_list(comment)
+        else:
+            assert type(comment) == str, repr(comment) + " is not a string or list."
+
+def assert_token_layer(layer):
+    """ Assert: layer is one of the layers of module token_cache. """
+    assert layer in ["clean"], repr(layer) + " is not a token layer."
+
+def assert_prob_table(prob_table):
+    """
+    Assert: prob_table is a probability table from
+    sentiment_analysis.comment_probabilities() with matching lengths.
+    """
+    assert type(prob_table) == dict, repr(prob_table) + " is not a dictionary."
+    try:
+        num_cmts = len(prob_table["local_ID"])
+        assert len(prob_table["prob_pos"]) == num_cmts
+        assert prob_table["mentions"].shape == (num_cmts, len(prob_table["mgmt_list"]))
+    except:
+        raise AssertionError("The probability table is incorrectly formatted.")
+
+def assert_cutoffs(pos_cutoff, neg_cutoff):
+    """ Assert: both cutoffs are between 0 and 1 and neg_cutoff <= pos_cutoff. """
+    assert 0 <= pos_cutoff <= 1, repr(pos_cutoff) + " is not between 0 and 1."
+    assert 0 <= neg_cutoff <= 1, repr(neg_cutoff) + " is not between 0 and 1."
+    assert neg_cutoff <= pos_cutoff, "neg_cutoff is greater than pos_cutoff."
+
+def assert_socket_path(socket_path):
+    """ Assert: socket_path is a non-empty string. """
+    assert type(socket_path) == str and socket_path != "", \
+        repr(socket_path) + " is not a socket path."
+
 def assert_classifier(classifier):
-    """ Assert classifier is a Naive Bayes Classifier object. """
+    """
+    Assert classifier is a Naive Bayes Classifier object or the socket path of
+    a scoring service from sentiment_server.py.
+    """
+    if type(classifier) == str:
+        return
+    # Imported here so that modules using assertions don't load NLTK.
+    from nltk import NaiveBayesClassifier
     assert type(classifier) == NaiveBayesClassifier, \
         "The classifier is not a Naive Bayes Classifier object."
+
+def assert_fact_table(facts):
+    """ Assert: facts is a DataFrame with the columns of the fact table. """
+    import fact_table
+    assert_type_df(facts)
+    assert list(facts.columns) == fact_table.FACT_COLUMNS, \
+        "The fact table is incorrectly formatted."
@@ -0,0 +1,136 @@
+"""
+Module with the comment text store. Every comment of the raw scrape is kept once,
+in one buffer with offsets (the buffer of module raw_cache), and addressed by a
+comment ID: its row in the store. Comments with the same (global_ID, local_ID)
+share one ID. Mention tables such as cmt_lvl_roster_mentions.csv and the files
+in cmt_lvl_roster_mentions_by_game can hold a "comment_ID" column instead of
+the text, and the text is only turned back into strings when it is needed: for
+the comments that are classified, or when a table is exported with with_text().
+
+The store is a dictionary with the keys of a raw cache ("text", "offsets",
+"null", "rows") and:
+
+"keys": the sorted (global_ID << 32) | local_ID key of every different comment.
+"key_ids": the comment ID of every key, the first row with that key.
+
+Export a mention table with the text with
+    python comment_store.py --team 76ers
+
+Creator: Sebastian Guo
+"""
+import argparse
+import numpy
+import pandas
+import assertions
+import raw_cache
+
+def open_comment_store(csv_path):
+    """
+    Returns the comment store of a raw csv file, backed by its memory-mapped raw
+    cache (see raw_cache.open_raw_cache()). The text is not read.
+
+    Parameter csv_path: the path of the raw csv file.
+    Precondition: must be a string.
+    """
+    cache = raw_cache.open_raw_cache(csv_path)
+    return _add_keys(dict(cache), numpy.asarray(cache["global_ID"]),
+        numpy.asarray(cache["local_ID"]))
+
+def from_frame(raw_data_file):
+    """
+    Returns a comment store of the comments of a DataFrame, for tables that do
+    not come from a raw csv file. The comment IDs are the row numbers.
+
+    Parameter raw_data_file: the comments.
+    Precondition: must be a DataFrame with the headers global_ID, local_ID and comment.
+    """
+    assertions.assert_raw_data_file_format(raw_data_file)
+    null = raw_data_file["comment"].isna().to_numpy()
+    encoded = [b"" if missing else str(comment).encode("utf-8")
+        for comment, missing in zip(raw_data_file["comment"].to_numpy(), null)]
+    offsets = numpy.zeros(len(encoded) + 1, dtype=numpy.int64)
+    numpy.cumsum([len(text) + 1 for text in encoded], out=offsets[1:])
+    store = {"text": numpy.frombuffer(b"".join(text + b"\0" for text in encoded),
+        dtype=numpy.uint8), "offsets": offsets, "null": null, "rows": len(encoded)}
+    return _add_keys(store, raw_data_file["global_ID"].to_numpy(),
+        raw_data_file["local_ID"].to_numpy())
+
+def comment_keys(global_IDs, local_IDs):
+    """ Returns the int64 keys (global_ID << 32) | local_ID of arrays of IDs. """
+    return (numpy.asarray(global_IDs, dtype=numpy.int64) << 32) | \
+        numpy.asarray(local_IDs, dtype=numpy.int64)
+
+def comment_ids(store, global_IDs, local_IDs):
+    """
+    Returns a numpy int64 array with the comment ID of every (global_ID,
+    local_ID), or -1 for comments not in the store.
+
+    Parameter store: a comment store.
+    Precondition: must be a dictionary from open_comment_store() or from_frame().
+
+    Parameter global_IDs, local_IDs: the IDs of the comments.
+    Precondition: must be arrays or Series of integers of the same length.
+    """
+    keys = comment_keys(global_IDs, local_IDs)
+    ids = numpy.full(len(keys), -1, dtype=numpy.int64)
+    if len(store["keys"]) == 0:
+        return ids
+    positions = numpy.minimum(numpy.searchsorted(store["keys"], keys), len(store["keys"]) - 1)
+    found = store["keys"][positions] == keys
+    ids[found] = store["key_ids"][positions[found]]
+    return ids
+
+def texts(store, ids):
+    """
+    Returns the text of the comments with the comment IDs ids as a list of
+    strings, with None for missing comments.
+    """
+    ids = numpy.asarray(ids, dtype=numpy.int64)
+    assert ((ids >= 0) & (ids < store["rows"])).all(), "A comment ID is not in the store."
+    return raw_cache.comments(store, ids.tolist())
+
+def with_text(table, store):
+    """
+    Returns a copy of a mention table with a "comment_ID" column where that
+    column is replaced by the "comment" column with the text, the layout of
+    name_matching.comment_roster() without a store.
+
+    Parameter table: the mention table.
+    Precondition: must be a DataFrame with the column "comment_ID".
+
+    Parameter store: the store the comment IDs refer to.
+    Precondition: must be a dictionary from open_comment_store() or from_frame().
+    """
+    assertions.assert_type_df(table)
+    assert "comment_ID" in table.columns, "The table does not have the column 'comment_ID'."
+    table = table.copy()
+    position = table.columns.get_loc("comment_ID")
+    comments = texts(store, table["comment_ID"].to_numpy())
+    table.insert(position, "comment", pandas.Series(comments, index=table.index,
+        dtype="str"))
+    return table.drop(columns="comment_ID")
+
+def _add_keys(store, global_IDs, local_IDs):
+    """ Adds the keys of the different comments and their comment IDs to a store. """
+    keys, first = numpy.unique(comment_keys(global_IDs, local_IDs), return_index=True)
+    store["keys"] = keys
+    store["key_ids"] = first.astype(numpy.int64)
+    return store
+
+def _parse_args(argv=None):
+    """ Parses the command line arguments of the export. """
+    parser = argparse.ArgumentParser(description="Export a mention table that " +
+        "holds comment IDs with the comment text.")
+    parser.add_argument("--team", default="76ers")
+    parser.add_argument("--table", default="cmt_lvl_roster_mentions.csv",
+        help="the mention table in the folder of the team")
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    args = _parse_args()
+    team_path = "/home/sebastianguo/Documents/Research/Teams/" + args.team + "/"
+    comment_store = open_comment_store(team_path + "csv_data/regseason_postgame_2020_" +
+        args.team + "_.csv")
+    mention_table = pandas.read_csv(team_path + args.table)
+    with_text(mention_table, comment_store).to_csv(team_path +
+        args.table.replace(".csv", "_text.csv"), index=False)
@@ -3,15 +3,25 @@ Module that extracts data from scrapped csv files without using the allenNLP.
 
 Creator: Sebastian Guo
 """
-import pandas, re, string
+import pandas, re, string, sys
 import assertions
+import comment_store
 import name_matching
+import roster
+import type_policy
 
-def create_data_frame(global_ID, cmt_data_list, team):
+# Kinds of name variations matched besides full, first and last names.
+ALIAS_TYPES = ["short", "nicknames"]
+STOP_WORD_ENGINES = ["replace", "regex", "none"]
+MATCHERS = ["regex", "token"]
+
+def create_data_frame(global_ID, cmt_data_list, team, write=True):
     """
-    Returns a csv file after making a DataFrame object with four columns: global_ID,
-    local_ID, name, and the category. Using the global ID attribute, all of the
-    rows in the DataFrame should have the same global ID.
+    Returns a DataFrame object with four columns: global_ID, local_ID, name, and
+    the category, and saves it as a csv file. Using the global ID attribute, all
+    of the rows in the DataFrame should have the same global ID. Comments without
+    named entities have no name or category (None), so the DataFrame is the same
+    as the one read back from the csv file.
 
     Parameter globalID: the global ID corresponding to a Reddit thread. For this
     specific global ID, extract the data from the 2DList.
@@ -25,6 +35,9 @@ def create_data_frame(global_ID, cmt_data_list, team):
 
     Parameter team: the basketball team the code is running on.
     Precondition: team is a string
+
+    Parameter write: whether or not to save the DataFrame as a csv file.
+    Precondition: must be a boolean.
     """
     assertions.assert_global_ID(global_ID)
     assertions.assert_cmt_data_list(cmt_data_list)
@@ -36,18 +49,21 @@ def create_data_frame(global_ID, cmt_data_list, team):
         if (len(lst) == 2 and global_ID == lst[0]):
             dictionary["global_ID"].append(global_ID)
             dictionary["local_ID"].append(lst[1])
-            dictionary["name"].append("")
-            dictionary["category"].append("")
+            dictionary["name"].append(None)
+            dictionary["category"].append(None)
         elif (len(lst) == 4 and global_ID == lst[0]):
             dictionary["global_ID"].append(global_ID)
             dictionary["local_ID"].append(lst[1])
             dictionary["name"].append(lst[2])
             dictionary["category"].append(lst[3])
-    df = pandas.DataFrame(dictionary)
-    df.to_csv(r'/home/sebastianguo/Documents/Research/Teams/' + team +
-        '/roster_mentions_by_game/' + str(global_ID) + ".csv", index=False)
+    df = type_policy.apply_types(pandas.DataFrame(dictionary))
+    if write:
+        df.to_csv(r'/home/sebastianguo/Documents/Research/Teams/' +
+            team + '/roster_mentions_by_game/' + str(global_ID) + ".csv", index=False)
+    return df
 
-def extract_col_data(raw_data_file, roster_file, word_file_reader, team):
+def extract_col_data(raw_data_file, roster_file, word_file_reader, team,
+    alias_types=ALIAS_TYPES, stop_words="replace", matcher="regex", store=None):
     """
     Returns a two dimensional list. Each inner list corresponds to a named entity,
     its category (person, place, nickname) with its associated global and local
@@ -72,50 +88,90 @@ def extract_col_data(raw_data_file, roster_file, word_file_reader, team):
     Parameter raw_data_file: the reader object with the csvfile that you want
     to extract the data from.
     Precondition: must be a DataFrame object created from the pandas module with
-    headers global ID, local ID and comment. The terms in the global and local ID
-    columns must be integers.
+    headers global ID, local ID and comment (only global ID and local ID if store
+    is given). The terms in the global and local ID columns must be integers.
 
     Parameter roster_file: the reader object containing nicknames to check for in
     the comments.
     Precondition: must be a DataFrame object created from the pandas module and
-    contain the correct headers.
+    contain the correct headers, or a Roster object.
+
+    Parameter alias_types: the name variations matched besides full, first and
+    last names: "short" for the shortened first and last names and "nicknames".
+    Precondition: must be a list with entries from ALIAS_TYPES.
+
+    Parameter stop_words: how the words in word_file_reader are removed from the
+    comments: "replace" with one str.replace() per word (and its capitalized
+    form), "regex" with one regular expression of all words, or "none" to keep
+    them.
+    Precondition: must be a string in STOP_WORD_ENGINES.
+
+    Parameter matcher: how full, first and last names and nicknames are found:
+    "regex" with a regular expression over the comment, which also matches
+    names inside longer words, or "token" by looking up the words of the split
+    comment, which only matches whole words (and their plural/possessive "s").
+    Precondition: must be a string in MATCHERS.
+
+    Parameter store: if given, the text of the comments is read from this
+    comment store by their global and local IDs instead of from a "comment"
+    column of raw_data_file.
+    Precondition: must be None or a comment store from module comment_store that
+    has every comment of raw_data_file.
     """
-    assertions.assert_raw_data_file_format(raw_data_file)
+    assertions.assert_raw_data_file_format(raw_data_file, store is None)
     assertions.assert_roster_file_format(roster_file)
     assertions.assert_team(team)
     assertions.assert_word_removal_file_format(word_file_reader, team)
+    _assertion_extraction_config(alias_types, stop_words, matcher)
+    roster_file = roster.as_roster(roster_file).frame
     glob_ID = raw_data_file["global_ID"]
     loc_ID = raw_data_file["local_ID"]
-    comm = raw_data_file["comment"]
+    comm = raw_data_file["comment"] if store is None else comment_store.texts(store,
+        comment_store.comment_ids(store, glob_ID, loc_ID))
     cmt_data_list = []
     # For column "Player", "Nicknames", "First", and "Last", include potential
     # substrings in this list that could mistake as names.
-    stop_words = word_file_reader[team].tolist()
+    stop_word_list = word_file_reader[team].tolist()
+    stop_word_re = None
+    if stop_words == "regex" and stop_word_list != []:
+        stop_word_re = re.compile("|".join(re.escape(term) for word in stop_word_list
+            for term in [word, string.capwords(word)]))
     # every comment is unique in its glob/loc ID. Maintain list of past IDs to
     # prevent having duplicate comments.
     duplicates = []
     # call create_list here to prevent redundacy
-    short_f = _create_list(roster_file, "First Short")
-    short_l = _create_list(roster_file, "Last Short")
-    name_str = _make_name_str(roster_file["Player"],
-        roster_file["First"], roster_file["Last"])
-    nickname_str = _make_nickname_str(_create_list(roster_file, "Nicknames"))
+    short_f = _create_list(roster_file, "First Short") if "short" in alias_types else []
+    short_l = _create_list(roster_file, "Last Short") if "short" in alias_types else []
+    nicknames = _create_list(roster_file, "Nicknames") if "nicknames" in alias_types else []
+    if matcher == "token":
+        name_str = _make_token_table(roster_file["Player"].tolist() +
+            roster_file["First"].dropna().tolist() + roster_file["Last"].dropna().tolist())
+        nickname_str = _make_token_table(nicknames) if nicknames != [] else None
+    else:
+        name_str = _make_name_str(roster_file["Player"],
+            roster_file["First"], roster_file["Last"])
+        nickname_str = _make_nickname_str(nicknames) if nicknames != [] else None
     for index in range(raw_data_file.shape[0]):
         if [glob_ID[index], loc_ID[index]] not in duplicates and not pandas.isnull(comm[index]):
             new_comm = comm[index]
             try:
-                for word in stop_words:
-                    new_comm = new_comm.replace(word, "")
-                    new_comm = new_comm.replace(string.capwords(word), "")
+                if stop_words == "replace":
+                    for word in stop_word_list:
+                        new_comm = new_comm.replace(word, "")
+                        new_comm = new_comm.replace(string.capwords(word), "")
+                elif stop_word_re is not None:
+                    new_comm = stop_word_re.sub("", new_comm)
+                comm_split = _split_comment(new_comm)
                 _extract_entities(cmt_data_list, glob_ID[index], loc_ID[index],
-                    new_comm, name_str, nickname_str, short_f, short_l)
+                    new_comm, name_str, nickname_str, short_f, short_l, comm_split,
+                    matcher)
             except:
                 raise Exception("Failed to create 2D list of named entities.")
         duplicates.append([glob_ID[index], loc_ID[index]])
     return cmt_data_list
 
 def _extract_entities(cmt_data_list, global_ID, local_ID, comment, name_str,
-    nickname_str, short_flist, short_llist):
+    nickname_str, short_flist, short_llist, comm_split=None, matcher="regex"):
     """
     Returns a 2D list with 1D lists as named entities/categories(person, place, etc.).
     If the comment contains no named entities, return [global ID, local ID].
@@ -124,11 +180,23 @@ def _extract_entities(cmt_data_list, global_ID, local_ID, comment, name_str,
 
     roster_file is the file with the basketball roster full names, and shortened
     ones.
+
+    comm_split is the comment already split by _split_comment(), if available.
+    With matcher "token", name_str and nickname_str are tables from
+    _make_token_table() and comm_split must be given. nickname_str is None if
+    nicknames are not matched.
     """
     add_blank = len(cmt_data_list)
-    _find_name(cmt_data_list, global_ID, local_ID, comment, name_str)
-    _find_short_name(cmt_data_list, global_ID, local_ID, comment, short_flist, short_llist)
-    _find_nickname(cmt_data_list, global_ID, local_ID, comment, nickname_str)
+    if matcher == "token":
+        _find_token_name(cmt_data_list, global_ID, local_ID, comm_split, name_str)
+    else:
+        _find_name(cmt_data_list, global_ID, local_ID, comment, name_str)
+    _find_short_name(cmt_data_list, global_ID, local_ID, comment, short_flist,
+        short_llist, comm_split)
+    if nickname_str is not None and matcher == "token":
+        _find_token_name(cmt_data_list, global_ID, local_ID, comm_split, nickname_str)
+    elif nickname_str is not None:
+        _find_nickname(cmt_data_list, global_ID, local_ID, comment, nickname_str)
     # Add something to the 2D list to signal that the comment has no named entities.
     if len(cmt_data_list) == add_blank:
         cmt_data_list.append([global_ID, local_ID])
@@ -141,21 +209,24 @@ def _find_name(cmt_data_list, global_ID, local_ID, comment, name_str):
     re_obj = re.compile(name_str, re.IGNORECASE)
     re_list = re_obj.findall(comment)
     for entity in re_list:
-        cmt_data_list.append([global_ID, local_ID, string.capwords(entity), "U-PER"])
+        # Interned, so every mention of a name shares one string.
+        cmt_data_list.append([global_ID, local_ID, sys.intern(string.capwords(entity)),
+            "U-PER"])
     return cmt_data_list
 
 def _find_short_name(cmt_data_list, global_ID, local_ID, comment, short_flist,
-    short_llist):
+    short_llist, comm_split=None):
     """
     Finds any shortened versions of the players names in a comment using regular
     expressions. While finding nicknames and full names uses regular expressions,
     shortened names are a little bit more tricky. For example, if you are looking
     for a nickname like "Rich" in the string "Richard", it'll still return a hit
     even though we are only looking for "Rich".
+
+    If comm_split is given, it is used instead of splitting the comment again.
     """
-    no_punc = re.sub(r'[^\w\s]','',comment).lower()
-    # Split into every word, assume shortened names are one words
-    comm_split = no_punc.split()
+    if comm_split is None:
+        comm_split = _split_comment(comment)
     for term1 in short_flist:
         count_short = (comm_split.count(term1.lower()) +
             comm_split.count(term1.lower() + "s"))
@@ -170,6 +241,15 @@ def _find_short_name(cmt_data_list, global_ID, local_ID, comment, short_flist,
             count_long -= 1
     return cmt_data_list
 
+def _split_comment(comment):
+    """
+    Returns a comment with its punctuation removed, lowercased and split into
+    words.
+    """
+    no_punc = re.sub(r'[^\w\s]','',comment).lower()
+    # Split into every word, assume shortened names are one words
+    return no_punc.split()
+
 def _find_nickname(cmt_data_list, global_ID, local_ID, comment, nickname_str):
     """
     Checks and adds to list any mentions of named entities as nicknames. The
@@ -179,9 +259,46 @@ def _find_nickname(cmt_data_list, global_ID, local_ID, comment, nickname_str):
     re_obj = re.compile(nickname_str, re.IGNORECASE)
     re_list = re_obj.findall(comment)
     for term in re_list:
-        cmt_data_list.append([global_ID, local_ID, string.capwords(term), "U-PER"])
+        cmt_data_list.append([global_ID, local_ID, sys.intern(string.capwords(term)),
+            "U-PER"])
+    return cmt_data_list
+
+def _find_token_name(cmt_data_list, global_ID, local_ID, comm_split, token_table):
+    """
+    Finds the names of token_table in a split comment and adds them to
+    cmt_data_list like _find_name(). At every word, the longest name starting
+    there is taken, and a name ending in the plural/possessive "s" is found too.
+    """
+    names, max_len = token_table
+    position = 0
+    while position < len(comm_split):
+        found = 0
+        for length in range(min(max_len, len(comm_split) - position), 0, -1):
+            words = comm_split[position:position + length]
+            name = names.get(tuple(words))
+            if name is None and words[-1].endswith("s"):
+                name = names.get(tuple(words[:-1] + [words[-1][:-1]]))
+            if name is not None:
+                cmt_data_list.append([global_ID, local_ID, name, "U-PER"])
+                found = length
+                break
+        position += max(found, 1)
     return cmt_data_list
 
+def _make_token_table(name_list):
+    """
+    Returns a tuple (names, max_len) for _find_token_name(), where names maps
+    the split of every name to the name as written in the roster, which is what
+    Roster.match() looks up, and max_len is the largest number of words of a
+    name. The first name of a split wins.
+    """
+    names = {}
+    for name in name_list:
+        words = tuple(_split_comment(name))
+        if words != ():
+            names.setdefault(words, name)
+    return names, max([len(words) for words in names] + [1])
+
 def _make_name_str(full_name, first_name, last_name):
     """
     Make a string to input for the regular expression.
@@ -247,3 +364,11 @@ def get_global_ID(raw_data_file):
         if item not in glob_ID_list:
             glob_ID_list.append(item)
     return glob_ID_list
+
+def _assertion_extraction_config(alias_types, stop_words, matcher):
+    """ Function to assert the configuration parameters of extract_col_data(). """
+    assertions.assert_str_list(alias_types)
+    for alias_type in alias_types:
+        assert alias_type in ALIAS_TYPES, repr(alias_type) + " is not an alias type."
+    assert stop_words in STOP_WORD_ENGINES, repr(stop_words) + " is not a stop word engine."
+    assert matcher in MATCHERS, repr(matcher) + " is not a matcher."
@@ -0,0 +1,163 @@
+"""
+Module with the season fact table of management mentions. Every game scored by
+the sentiment stage of pipeline.py appends one row per manager to the fact table
+of its team, so season and league statistics are computed with one read instead
+of opening every csv file in mgmt_and_race_by_game.
+
+The fact table is in long format with the columns in FACT_COLUMNS. It is stored
+as a sequence of pickled DataFrame chunks, one per game, in a single file that is
+only appended to, except by remove_games(). If a game is appended more than
+once, read_facts() keeps the rows of its last chunk.
+
+Creator: Sebastian Guo
+"""
+import os, pickle
+import numpy
+import pandas
+import assertions
+
+FACT_COLUMNS = ["team", "global_ID", "date", "result", "person", "position",
+    "race", "mentions", "pos", "neg", "net"]
+# A later chunk of the same game replaces the earlier ones.
+_GAME_KEY = ["team", "global_ID"]
+_CATEGORY_COLUMNS = ["team", "result", "person", "position", "race"]
+
+def fact_table_path(team):
+    """ Returns the path of the fact table of a team. """
+    return "/home/sebastianguo/Documents/Research/Teams/" + team + "/mgmt_facts.pkl"
+
+def game_facts(team, global_ID, date, result, mgmt_race_file):
+    """
+    Returns the fact table rows of one game as a DataFrame with the columns in
+    FACT_COLUMNS.
+
+    Parameter team: the basketball team of the game.
+    Precondition: must be a string.
+
+    Parameter global_ID: the global ID of the game thread.
+    Precondition: must be an integer greater than zero.
+
+    Parameter date: the date of the game, or None/NaT if no game was found for
+    the thread.
+    Precondition: must be None or a value pandas.to_datetime() accepts.
+
+    Parameter result: whether or not the game corresponding to the global ID was won.
+    Precondition: must be either "Win", "Lose", or "N/A".
+
+    Parameter mgmt_race_file: the DataFrame returned by
+    mgmt_matching.coach_mentions_glob() for the game.
+    Precondition: must be a DataFrame with the headers of mgmt_and_race_by_game.
+    """
+    _assertion_game_facts(team, global_ID, result, mgmt_race_file)
+    # The last row of mgmt_and_race_by_game only holds the game result.
+    managers = mgmt_race_file.iloc[:-1]
+    facts = pandas.DataFrame({
+        "team": team,
+        "global_ID": int(global_ID),
+        "date": pandas.to_datetime(date),
+        "result": result,
+        "person": managers["Name"].to_numpy(),
+        "position": managers["Pos"].to_numpy(),
+        "race": managers["Race"].to_numpy(),
+        "mentions": managers["Mentions"].astype("int64").to_numpy(),
+        "pos": managers["Positive comments"].astype("int64").to_numpy(),
+        "neg": managers["Negative comments"].astype("int64").to_numpy(),
+        "net": managers["Net sentiment"].astype("int64").to_numpy()},
+        columns=FACT_COLUMNS)
+    facts["date"] = facts["date"].astype("datetime64[ns]")
+    return facts
+
+def append_facts(facts, path):
+    """
+    Appends the rows in facts to the fact table at path as one chunk. The file is
+    created if it does not exist.
+
+    Parameter facts: the rows to append.
+    Precondition: must be a DataFrame with the columns in FACT_COLUMNS.
+
+    Parameter path: the path of the fact table.
+    Precondition: must be a string.
+    """
+    assertions.assert_fact_table(facts)
+    assert type(path) == str, repr(path) + " is not a string."
+    with open(path, "ab") as fact_file:
+        pickle.dump(facts, fact_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+def read_facts(paths):
+    """
+    Returns the fact tables at paths as one DataFrame with the columns in
+    FACT_COLUMNS. The text columns are categorical. Paths that do not exist are
+    skipped.
+
+    Parameter paths: the path of a fact table or a list of paths, for example
+    [fact_table_path(team) for team in teams] for league statistics.
+    Precondition: must be a string or a list of strings.
+    """
+    if type(paths) == str:
+        paths = [paths]
+    assert type(paths) == list, repr(paths) + " is not a list."
+    chunks = []
+    for path in paths:
+        assert type(path) == str, repr(path) + " is not a string."
+        chunks += _read_chunks(path)
+    if chunks == []:
+        return _empty_facts()
+    chunk_numbers = numpy.repeat(numpy.arange(len(chunks)), [len(chunk) for chunk in chunks])
+    facts = pandas.concat(chunks, ignore_index=True)
+    last_chunks = pandas.Series(chunk_numbers).groupby([facts[column] for column in
+        _GAME_KEY]).transform("max").to_numpy()
+    facts = facts[chunk_numbers == last_chunks].reset_index(drop=True)
+    for column in _CATEGORY_COLUMNS:
+        facts[column] = facts[column].astype("category")
+    return facts
+
+def remove_games(path, global_IDs):
+    """
+    Removes every chunk of the games in global_IDs from the fact table at path,
+    for games that are no longer in the data. The other chunks are kept as they
+    are and the file is replaced in one step.
+
+    Parameter path: the path of the fact table.
+    Precondition: must be a string.
+
+    Parameter global_IDs: the global IDs of the games to remove.
+    Precondition: must be a list of integers.
+    """
+    assert type(path) == str, repr(path) + " is not a string."
+    assert type(global_IDs) == list, repr(global_IDs) + " is not a list."
+    with open(path + ".tmp", "wb") as fact_file:
+        for chunk in _read_chunks(path):
+            chunk = chunk[~chunk["global_ID"].isin(global_IDs)]
+            if len(chunk) > 0:
+                pickle.dump(chunk, fact_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + ".tmp", path)
+
+def _read_chunks(path):
+    """ Returns the list of chunks of the fact table at path, or [] if there is none. """
+    chunks = []
+    if not os.path.exists(path):
+        return chunks
+    with open(path, "rb") as fact_file:
+        while True:
+            try:
+                chunks.append(pickle.load(fact_file))
+            except EOFError:
+                break
+    return chunks
+
+def _empty_facts():
+    """ Returns a fact table without rows. """
+    facts = pandas.DataFrame({column: [] for column in FACT_COLUMNS})
+    for column in ["global_ID", "mentions", "pos", "neg", "net"]:
+        facts[column] = facts[column].astype("int64")
+    facts["date"] = facts["date"].astype("datetime64[ns]")
+    for column in _CATEGORY_COLUMNS:
+        facts[column] = facts[column].astype("category")
+    return facts
+
+def _assertion_game_facts(team, global_ID, result, mgmt_race_file):
+    """ Asserts the preconditions of game_facts(). """
+    assertions.assert_team(team)
+    assertions.assert_global_ID(global_ID)
+    assertions.assert_result(result)
+    assertions.assert_type_df(mgmt_race_file)
@@ -0,0 +1,219 @@
+"""
+Module with a grouped statistics engine over the management fact table from
+module fact_table. Statistics are computed with pandas group-by operations for
+any grouping dimensions instead of loops with one accumulator per combination,
+so calc_mgmt_stats() and league or multi-season analyses share the same code.
+
+A dimension is any column of the fact table ("result", "race", "position",
+"person", "team", ...) or one of the columns added by add_dimensions():
+"salary band", "seasons spent" and "home/away".
+
+Creator: Sebastian Guo
+"""
+import numpy
+import pandas
+import assertions
+import roster as roster_module
+
+VALUE_COLUMNS = ["mentions", "pos", "neg", "net"]
+# Dimensions that have one value per game, so they split the games counted.
+GAME_DIMENSIONS = ["team", "global_ID", "date", "result", "home/away"]
+# Upper edges of the salary bands, in dollars per year.
+SALARY_BANDS = [1000000, 5000000, 10000000, 20000000]
+
+def group_stats(facts, dimensions, values=VALUE_COLUMNS):
+    """
+    Returns a DataFrame indexed by dimensions with, for every value column v,
+    the columns:
+
+    "v": the sum of v over the rows of the group.
+    "v per game": the sum divided by the number of games of the group.
+    "v per game per person": "v per game" divided by the number of people in
+    the group.
+
+    and the columns "games" and "people". The games of a group are counted over
+    the game dimensions in dimensions only (see GAME_DIMENSIONS), so the games
+    won are the same for every race when grouping by result and race. The
+    people of a group are the different people with rows in it.
+
+    Parameter facts: the fact table, optionally with columns from add_dimensions().
+    Precondition: must be a DataFrame with the columns in fact_table.FACT_COLUMNS.
+
+    Parameter dimensions: the columns to group by.
+    Precondition: must be a list of column names of facts.
+
+    Parameter values: the columns to sum.
+    Precondition: must be a list with entries from VALUE_COLUMNS.
+    """
+    _assertion_group_stats(facts, dimensions, values)
+    grouped = facts.groupby(dimensions, observed=True, dropna=False)
+    stats = grouped[values].sum()
+    stats["people"] = grouped["person"].nunique()
+    game_dimensions = [dim for dim in dimensions if dim in GAME_DIMENSIONS]
+    if game_dimensions == []:
+        stats["games"] = facts["global_ID"].nunique()
+    else:
+        games = facts.groupby(game_dimensions, observed=True,
+            dropna=False)["global_ID"].nunique().rename("games")
+        stats = stats.join(games, on=game_dimensions)
+    for value in values:
+        stats[value + " per game"] = stats[value] / stats["games"]
+        stats[value + " per game per person"] = stats[value + " per game"] / stats["people"]
+    return stats
+
+def count_games(facts, dimensions):
+    """
+    Returns a Series indexed by dimensions with the number of different games in
+    every group of facts.
+
+    Parameter facts: the fact table.
+    Precondition: must be a DataFrame with the columns in fact_table.FACT_COLUMNS.
+
+    Parameter dimensions: the game dimensions to group by.
+    Precondition: must be a list with entries from GAME_DIMENSIONS.
+    """
+    _assertion_group_stats(facts, dimensions, [])
+    return facts.groupby(dimensions, observed=True, dropna=False)["global_ID"].nunique()
+
+def bootstrap_stats(facts, dimensions, values=VALUE_COLUMNS, strata=None,
+    num_samples=2000, confidence=0.95, seed=0):
+    """
+    Returns a DataFrame indexed by strata + dimensions with bootstrap confidence
+    intervals of "v per game per person" from group_stats() for every value
+    column v, in the columns "v ci low" and "v ci high".
+
+    Games are resampled with replacement within every stratum, so the number of
+    games won and lost stays fixed. All resamples of a stratum are drawn at once
+    as a (num_samples, games) matrix of game indexes, turned into a matrix of
+    how often every game was drawn and multiplied with the (games, groups)
+    matrix of per-game sums, so there is no loop over the resamples.
+
+    Parameter facts: the fact table, optionally with columns from add_dimensions().
+    Precondition: must be a DataFrame with the columns in fact_table.FACT_COLUMNS.
+
+    Parameter dimensions: the columns to group by within a game.
+    Precondition: must be a list of column names of facts that are not in strata.
+
+    Parameter values: the columns to sum.
+    Precondition: must be a list with entries from VALUE_COLUMNS.
+
+    Parameter strata: the game dimensions games are resampled within. If None,
+    ["result"].
+    Precondition: must be None or a non-empty list with entries from GAME_DIMENSIONS.
+
+    Parameter num_samples: the number of bootstrap resamples.
+    Precondition: must be an integer greater than zero.
+
+    Parameter confidence: the confidence level of the intervals.
+    Precondition: must be a number between 0 and 1.
+
+    Parameter seed: the seed of the random number generator, so the intervals
+    are the same on every run.
+    Precondition: must be an integer.
+    """
+    strata = ["result"] if strata is None else strata
+    _assertion_bootstrap_stats(facts, dimensions, values, strata, num_samples,
+        confidence, seed)
+    rng = numpy.random.default_rng(seed)
+    quantiles = [(1 - confidence) / 2, (1 + confidence) / 2]
+    game_sums = facts.groupby(strata + ["global_ID"] + dimensions, observed=True,
+        dropna=False)[values].sum()
+    # Rows are the games of every stratum, columns are (value, *dimensions).
+    table = game_sums.unstack(dimensions, fill_value=0)
+    people = facts.groupby(strata + dimensions, observed=True, dropna=False)["person"].nunique()
+    ci_dict = {}
+    for stratum, block in table.groupby(level=strata, observed=True):
+        num_games = block.shape[0]
+        game_ind = rng.integers(0, num_games, size=(num_samples, num_games))
+        draws = numpy.bincount((game_ind + num_games *
+            numpy.arange(num_samples)[:, None]).ravel(),
+            minlength=num_samples * num_games).reshape(num_samples, num_games)
+        means = draws @ block.to_numpy(dtype=numpy.float64) / num_games
+        low, high = numpy.quantile(means, quantiles, axis=0)
+        for col_ind, column in enumerate(block.columns):
+            key = tuple(stratum) + tuple(column[1:])
+            if key not in people.index:
+                continue
+            row = ci_dict.setdefault(key, {})
+            row[column[0] + " ci low"] = low[col_ind] / people[key]
+            row[column[0] + " ci high"] = high[col_ind] / people[key]
+    columns = [value + bound for value in values for bound in [" ci low", " ci high"]]
+    if ci_dict == {}:
+        index = pandas.MultiIndex.from_arrays([[]] * len(strata + dimensions),
+            names=strata + dimensions)
+    else:
+        index = pandas.MultiIndex.from_tuples(list(ci_dict), names=strata + dimensions)
+    return pandas.DataFrame(list(ci_dict.values()), index=index, columns=columns)
+
+def add_dimensions(facts, roster_file, thread_index=None, team=None,
+    salary_bands=SALARY_BANDS):
+    """
+    Returns a copy of facts with the columns "salary band", "seasons spent" and,
+    if thread_index is given, "home/away".
+
+    "salary band" is the interval of salary_bands the person's annual salary is
+    in, "seasons spent" is taken from the roster, and "home/away" is "home" or
+    "away" if the thread title names the team as the home or away team and
+    missing otherwise.
+
+    Parameter facts: the fact table.
+    Precondition: must be a DataFrame with the columns in fact_table.FACT_COLUMNS.
+
+    Parameter roster_file: the roster of the people in facts.
+    Precondition: must be a Roster or a DataFrame with the roster headers.
+
+    Parameter thread_index: the thread index from module thread_index.
+    Precondition: must be None or a DataFrame from build_thread_index().
+
+    Parameter team: the team of the home/away column. If None, the "team"
+    column of facts is used.
+    Precondition: must be None or a string.
+
+    Parameter salary_bands: the increasing upper edges of the salary bands.
+    Precondition: must be a list of numbers.
+    """
+    assertions.assert_fact_table(facts)
+    roster = roster_module.as_roster(roster_file)
+    facts = facts.copy()
+    salary = facts["person"].map(lambda name: _member_attribute(roster, name, "salary"))
+    edges = [-numpy.inf] + list(salary_bands) + [numpy.inf]
+    facts["salary band"] = pandas.cut(pandas.to_numeric(salary, errors="coerce"), edges)
+    facts["seasons spent"] = facts["person"].map(
+        lambda name: _member_attribute(roster, name, "seasons"))
+    if thread_index is not None:
+        assertions.assert_thread_index(thread_index)
+        teams = facts["team"].astype(object) if team is None else pandas.Series(team,
+            index=facts.index)
+        home = thread_index["Home Team"].reindex(facts["global_ID"]).to_numpy()
+        away = thread_index["Away Team"].reindex(facts["global_ID"]).to_numpy()
+        teams = teams.to_numpy()
+        facts["home/away"] = pandas.Categorical(numpy.where(home == teams, "home",
+            numpy.where(away == teams, "away", None)), categories=["home", "away"])
+    return facts
+
+def _member_attribute(roster, name, attribute):
+    """ Returns an attribute of a roster member, or None if name is not on the roster. """
+    member = roster.get(name)
+    return None if member is None else getattr(member, attribute)
+
+def _assertion_group_stats(facts, dimensions, values):
+    """ Function to assert assertions for group_stats(). """
+    assertions.assert_type_df(facts)
+    assertions.assert_str_list(dimensions)
+    for column in dimensions:
+        assert column in facts.columns, repr(column) + " is not a column of the facts."
+    for value in values:
+        assert value in VALUE_COLUMNS, repr(value) + " is not a value column."
+
+def _assertion_bootstrap_stats(facts, dimensions, values, strata, num_samples,
+    confidence, seed):
+    """ Function to assert assertions for bootstrap_stats(). """
+    _assertion_group_stats(facts, dimensions + strata, values)
+    assert strata != [], "strata is empty."
+    for column in strata:
+        assert column in GAME_DIMENSIONS, repr(column) + " is not a game dimension."
+        assert column not in dimensions, repr(column) + " is a stratum and a dimension."
+    assert type(num_samples) == int and num_samples > 0, \
+        repr(num_samples) + " is not an integer greater than zero."
+    assert 0 < confidence < 1, repr(confidence) + " is not between 0 and 1."
+    assert type(seed) == int, repr(seed) + " is not an integer."
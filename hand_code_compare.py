@@ -39,68 +39,136 @@ def compare_files(machine_code_file, ground_truth_file, roster_list, team):
     Parameter team: the basketball team the code is run on.
     Precondition: team is of type string
     """
-    assertions.assert_compare_machine_hand(machine_code_file, ground_truth_file)
-    assertions.assert_str_list(roster_list)
+    assertions.assert_compare_machine_hand_keys(machine_code_file, ground_truth_file,
+        roster_list)
     assertions.assert_team(team)
-    length = len(machine_code_file)
-    matrix_one = _create_matrix(numpy.empty((0, length), int), machine_code_file, roster_list)
-    matrix_two = _create_matrix(numpy.empty((0, length), int), ground_truth_file, roster_list)
-    matrix_diff = numpy.subtract(matrix_two, matrix_one)
-    matrix_sum = numpy.add(matrix_one, matrix_two)
+    counts = confusion_counts(machine_code_file, ground_truth_file, roster_list)
     appendDict = {"Calculations":["True Positives", "False Positives",
         "False Negatives", "Precision", "Recall", "Num. of comments"], "Total":[]}
 
-    _add_values(appendDict, matrix_sum, matrix_diff, roster_list)
+    _add_values(appendDict, counts, roster_list)
     df = pandas.DataFrame(appendDict)
     df.to_csv(r'/home/sebastianguo/Documents/Research/Teams/' + team +
         '/precision_and_recall.csv', index=False)
 
-def _add_values(dictionary, matrix_sum, matrix_diff, roster_list):
+def confusion_counts(machine_code_file, ground_truth_file, roster_list):
     """
-    Takes in a numpy array and modifies it to add either the recall or precision of
-    the columns corresponding to mentions of players. The matrix with the values
-    -1, 0, 1, and 2 is in column major order.
+    Returns a DataFrame indexed by player with the columns "True Positives",
+    "False Positives" and "False Negatives" of the machine code compared to the
+    ground truth, and the attribute num_comments in df.attrs.
+
+    The comments are matched on (global_ID, local_ID) through the index of the
+    machine code file, so the ground truth can be any sample of the comments in
+    any order. A comment that appears more than once in a file is counted once.
+    All players are counted in one pass over two (comments, players) matrices:
+    the sum of the matrices is 2 for a true positive, and their difference
+    (ground truth - machine code) is -1 for a false positive and +1 for a false
+    negative.
+
+    Parameter machine_code_file: a csv file containing individual comments and
+    marks for whether or not each comment contains a mention of a player.
+    Precondition: must be a DataFrame object from the pandas module with the
+    columns global_ID, local_ID and the players in roster_list.
+
+    Parameter ground_truth_file: a hand coded csv file of a sample of the
+    comments in machine_code_file.
+    Precondition: must be a DataFrame object from the pandas module with the
+    columns global_ID, local_ID and the players in roster_list.
+
+    Parameter roster_list: a list of strings with players to compare the csvfile to.
+    Precondition: roster_list must be a list with string entries.
     """
-    agg_true_pos = 0
-    agg_fal_pos = 0
-    agg_fal_neg = 0
-    for index in range(len(roster_list)):
-        player = roster_list[index]
-        col_true_pos = numpy.count_nonzero(matrix_sum[index] == 2)
-        col_fal_pos = numpy.count_nonzero(matrix_diff[index] == -1)
-        col_fal_neg = numpy.count_nonzero(matrix_diff[index] == 1)
-        dictionary[player] = [col_true_pos, col_fal_pos, col_fal_neg]
-        try:
-            dictionary[player] += [col_true_pos/(col_true_pos + col_fal_pos)]
-        except:
-            dictionary[player] += ["null"]
-        try:
-            dictionary[player] += [col_true_pos/(col_true_pos + col_fal_neg)]
-        except:
-            dictionary[player] += ["null"]
-        agg_true_pos += col_true_pos
-        agg_fal_pos += col_fal_pos
-        agg_fal_neg += col_fal_neg
-        dictionary[player].append("")
-    dictionary["Total"] = [agg_true_pos, agg_fal_pos, agg_fal_neg]
-    try:
-        dictionary["Total"] += [agg_true_pos/(agg_true_pos + agg_fal_pos)]
-    except:
-        dictionary["Total"] += ["null"]
-    try:
-        dictionary["Total"] += [agg_true_pos/(agg_true_pos + agg_fal_neg)]
-    except:
-        dictionary["Total"] += ["null"]
-    dictionary["Total"].append("")
-
-def _create_matrix(matrix, comment_file, roster_list):
+    assertions.assert_compare_machine_hand_keys(machine_code_file, ground_truth_file,
+        roster_list)
+    keys = ["global_ID", "local_ID"]
+    machine = machine_code_file.drop_duplicates(keys).set_index(keys)
+    truth = ground_truth_file.drop_duplicates(keys).set_index(keys)
+    matrix_one = numpy.nan_to_num(machine[roster_list].reindex(truth.index).to_numpy(
+        dtype=numpy.float64)).astype(numpy.int64)
+    matrix_two = numpy.nan_to_num(truth[roster_list].to_numpy(
+        dtype=numpy.float64)).astype(numpy.int64)
+    matrix_diff = matrix_two - matrix_one
+    matrix_sum = matrix_one + matrix_two
+    counts = pandas.DataFrame({"True Positives": (matrix_sum == 2).sum(axis=0),
+        "False Positives": (matrix_diff == -1).sum(axis=0),
+        "False Negatives": (matrix_diff == 1).sum(axis=0)},
+        index=pandas.Index(roster_list, name="Player"))
+    counts.attrs["num_comments"] = len(truth)
+    return counts
+
+def compare_samples(samples, write=True):
     """
-    Create a two-dimensional matrix to represent whether or not a table of
-    comments contain mentions of certain players in them. A "1" means that the
-    comment does have a mention and a "0" means the comment doesn't. The matrix
-    is in column major order.
+    Compares many hand coded samples, of one or several teams, in one call and
+    returns a DataFrame with one row per sample and player, one "Total" row per
+    sample, one "Total" row per team (all samples of the team pooled) and one
+    "All Teams" row. Every row has the columns "Team", "Sample", "Player", "True
+    Positives", "False Positives", "False Negatives", "Precision", "Recall" and
+    "Num. of comments". A precision or recall that divides by zero is NaN in the
+    DataFrame and "null" in the csv file, like in compare_files().
+
+    Parameter samples: the samples to compare. A sample is a tuple (team,
+    sample name, machine_code_file, ground_truth_file, roster_list) with the
+    parameters of confusion_counts().
+    Precondition: must be a non-empty list of such tuples.
+
+    Parameter write: whether or not to save the DataFrame as
+    misc_data/precision_and_recall_samples.csv.
+    Precondition: must be a boolean.
+    """
+    assert type(samples) == list and samples != [], repr(samples) + " is not a non-empty list."
+    assert type(write) == bool, repr(write) + " is not a boolean."
+    frames = []
+    for team, sample, machine_code_file, ground_truth_file, roster_list in samples:
+        assertions.assert_team(team)
+        counts = confusion_counts(machine_code_file, ground_truth_file, roster_list)
+        frame = counts.reset_index()
+        frame.insert(0, "Sample", sample)
+        frame.insert(0, "Team", team)
+        frame["Num. of comments"] = counts.attrs["num_comments"]
+        total = frame[_COUNT_COLUMNS].sum().to_dict()
+        total.update({"Team": team, "Sample": sample, "Player": "Total",
+            "Num. of comments": counts.attrs["num_comments"]})
+        frames += [frame, pandas.DataFrame([total])]
+    df = pandas.concat(frames, ignore_index=True)
+    sample_totals = df[df["Player"] == "Total"]
+    team_totals = sample_totals.groupby("Team", sort=False)[_COUNT_COLUMNS +
+        ["Num. of comments"]].sum().reset_index()
+    team_totals["Sample"] = "All Samples"
+    team_totals["Player"] = "Total"
+    all_teams = team_totals[_COUNT_COLUMNS + ["Num. of comments"]].sum().to_dict()
+    all_teams.update({"Team": "All Teams", "Sample": "All Samples", "Player": "Total"})
+    df = pandas.concat([df, team_totals, pandas.DataFrame([all_teams])], ignore_index=True)
+    true_pos = df["True Positives"].to_numpy(dtype=numpy.float64)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        df["Precision"] = true_pos / (true_pos + df["False Positives"].to_numpy())
+        df["Recall"] = true_pos / (true_pos + df["False Negatives"].to_numpy())
+    df = df[["Team", "Sample", "Player"] + _COUNT_COLUMNS + ["Precision", "Recall",
+        "Num. of comments"]]
+    if write:
+        df.to_csv(r'/home/sebastianguo/Documents/Research/misc_data/' +
+            'precision_and_recall_samples.csv', index=False, na_rep="null")
+    return df
+
+_COUNT_COLUMNS = ["True Positives", "False Positives", "False Negatives"]
+
+def _add_values(dictionary, counts, roster_list):
+    """
+    Adds the true positives, false positives, false negatives, precision and
+    recall of every player and of all players together to the dictionary.
     """
     for player in roster_list:
-        matrix = numpy.append(matrix, [comment_file[player]], axis=0)
-    matrix = numpy.nan_to_num(matrix)
-    return matrix
+        col_true_pos, col_fal_pos, col_fal_neg = counts.loc[player, _COUNT_COLUMNS]
+        dictionary[player] = [col_true_pos, col_fal_pos, col_fal_neg] + \
+            _prec_rec(col_true_pos, col_fal_pos, col_fal_neg) + [""]
+    agg_true_pos, agg_fal_pos, agg_fal_neg = counts[_COUNT_COLUMNS].sum()
+    dictionary["Total"] = [agg_true_pos, agg_fal_pos, agg_fal_neg] + \
+        _prec_rec(agg_true_pos, agg_fal_pos, agg_fal_neg) + [""]
+
+def _prec_rec(true_pos, fal_pos, fal_neg):
+    """
+    Returns a list with the precision and recall, where a value that divides by
+    zero is "null".
+    """
+    precision = true_pos/(true_pos + fal_pos) if true_pos + fal_pos != 0 else "null"
+    recall = true_pos/(true_pos + fal_neg) if true_pos + fal_neg != 0 else "null"
+    return [precision, recall]
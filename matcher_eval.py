@@ -0,0 +1,163 @@
+"""
+Module with a harness that measures how the extraction configuration trades
+accuracy against speed. It runs extract_col_data() and comment_roster() over the
+comments of a hand coded sample once per configuration (which name variations
+are matched, how stop words are removed, and which matcher finds names) and
+reports the precision, recall, comments per second and peak memory of every
+configuration side by side.
+
+Run it for a team with
+    python matcher_eval.py --team 76ers
+
+Creator: Sebastian Guo
+"""
+import argparse, itertools, time, tracemalloc
+import pandas, numpy
+import assertions
+import extraction_v2
+import name_matching
+import hand_code_compare
+import roster as roster_module
+
+def default_configurations():
+    """
+    Returns a list with every combination of alias types (all, no nicknames, no
+    shortened names, neither), stop word engine and matcher. A configuration is
+    a dictionary with the keys "alias_types", "stop_words" and "matcher", the
+    parameters of extraction_v2.extract_col_data().
+    """
+    alias_options = [extraction_v2.ALIAS_TYPES, ["short"], ["nicknames"], []]
+    return [{"alias_types": list(alias_types), "stop_words": stop_words, "matcher": matcher}
+        for alias_types, stop_words, matcher in itertools.product(alias_options,
+        extraction_v2.STOP_WORD_ENGINES, extraction_v2.MATCHERS)]
+
+def evaluate_configurations(raw_data_file, roster_file, word_file_reader,
+    ground_truth_file, team, configurations=None, repeats=3, write=True):
+    """
+    Returns a DataFrame with one row per configuration and the columns "Alias
+    Types", "Stop Words", "Matcher", "True Positives", "False Positives",
+    "False Negatives", "Precision", "Recall", "Comments", "Comments Per Second"
+    and "Peak Memory (MB)", and saves it as matcher_evaluation.csv.
+
+    Only the comments of raw_data_file that are in ground_truth_file are used.
+    The speed is the best of repeats timed runs. The peak memory is measured with
+    tracemalloc in one more run, since tracing slows the code down.
+
+    Parameter raw_data_file: the file that contains the raw scrapped data.
+    Precondition: must be a DataFrame with the headers global_ID, local_ID and comment.
+
+    Parameter roster_file: the roster of the team.
+    Precondition: must be a Roster or a DataFrame with the roster headers.
+
+    Parameter word_file_reader: the words removed from the comments before extraction.
+    Precondition: must be a DataFrame with a column for team.
+
+    Parameter ground_truth_file: a hand coded sample of the comments.
+    Precondition: must be a DataFrame with the columns global_ID, local_ID and
+    the players of the roster.
+
+    Parameter team: the basketball team the code is run on.
+    Precondition: must be a string.
+
+    Parameter configurations: the configurations to evaluate. If None,
+    default_configurations().
+    Precondition: must be None or a list of dictionaries with the keys
+    "alias_types", "stop_words" and "matcher".
+
+    Parameter repeats: the number of timed runs of every configuration.
+    Precondition: must be an integer greater than zero.
+
+    Parameter write: whether or not to save the DataFrame as a csv file.
+    Precondition: must be a boolean.
+    """
+    _assertion_evaluate_configurations(raw_data_file, ground_truth_file, team, repeats)
+    if configurations is None:
+        configurations = default_configurations()
+    roster = roster_module.as_roster(roster_file)
+    roster_list = list(roster.player_list)
+    keys = pandas.MultiIndex.from_frame(ground_truth_file[["global_ID", "local_ID"]])
+    sample = raw_data_file[pandas.MultiIndex.from_frame(raw_data_file[["global_ID",
+        "local_ID"]]).isin(keys)].reset_index(drop=True)
+    num_comments = len(sample.drop_duplicates(["global_ID", "local_ID"]))
+
+    end_dict = {"Alias Types":[], "Stop Words":[], "Matcher":[], "True Positives":[],
+        "False Positives":[], "False Negatives":[], "Precision":[], "Recall":[],
+        "Comments":[], "Comments Per Second":[], "Peak Memory (MB)":[]}
+    for config in configurations:
+        best_time = numpy.inf
+        for _ in range(repeats):
+            start = time.perf_counter()
+            machine_file = _run_configuration(sample, roster, roster_list,
+                word_file_reader, team, config)
+            best_time = min(best_time, time.perf_counter() - start)
+        tracemalloc.start()
+        try:
+            _run_configuration(sample, roster, roster_list, word_file_reader, team, config)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        counts = hand_code_compare.confusion_counts(machine_file, ground_truth_file,
+            roster_list)
+        true_pos, fal_pos, fal_neg = counts[["True Positives", "False Positives",
+            "False Negatives"]].sum()
+        end_dict["Alias Types"].append(",".join(config["alias_types"]) or "none")
+        end_dict["Stop Words"].append(config["stop_words"])
+        end_dict["Matcher"].append(config["matcher"])
+        end_dict["True Positives"].append(true_pos)
+        end_dict["False Positives"].append(fal_pos)
+        end_dict["False Negatives"].append(fal_neg)
+        end_dict["Precision"].append(round(true_pos/(true_pos + fal_pos), 4)
+            if true_pos + fal_pos != 0 else numpy.nan)
+        end_dict["Recall"].append(round(true_pos/(true_pos + fal_neg), 4)
+            if true_pos + fal_neg != 0 else numpy.nan)
+        end_dict["Comments"].append(num_comments)
+        end_dict["Comments Per Second"].append(round(num_comments / best_time, 1))
+        end_dict["Peak Memory (MB)"].append(round(peak / 2**20, 3))
+    df = pandas.DataFrame(end_dict)
+    if write:
+        df.to_csv(r'/home/sebastianguo/Documents/Research/Teams/' + team +
+            '/matcher_evaluation.csv', index=False)
+    return df
+
+def _run_configuration(sample, roster, roster_list, word_file_reader, team, config):
+    """
+    Runs extract_col_data() and comment_roster() on the sample with one
+    configuration and returns the comment level mentions with 0/1 player columns.
+    """
+    cmt_data_list = extraction_v2.extract_col_data(sample, roster, word_file_reader,
+        team, config["alias_types"], config["stop_words"], config["matcher"])
+    # comment_roster() marks a mention with 1 and no mention with 0.
+    return name_matching.comment_roster(sample, roster, roster_list, cmt_data_list,
+        team, False)
+
+def _assertion_evaluate_configurations(raw_data_file, ground_truth_file, team, repeats):
+    """ Function to assert assertions for evaluate_configurations(). """
+    assertions.assert_raw_data_file_format(raw_data_file)
+    assertions.assert_type_df(ground_truth_file)
+    assertions.assert_team(team)
+    assert type(repeats) == int and repeats > 0, \
+        repr(repeats) + " is not an integer greater than zero."
+
+def _parse_args(argv=None):
+    """ Parses the command line arguments of the harness. """
+    parser = argparse.ArgumentParser(description="Compare the accuracy and speed " +
+        "of extraction configurations on a hand coded sample.")
+    parser.add_argument("--team", default="76ers")
+    parser.add_argument("--repeats", type=int, default=3)
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    args = _parse_args()
+    team_path = "/home/sebastianguo/Documents/Research/Teams/" + args.team + "/csv_data/"
+    with open(team_path + "regseason_postgame_2020_" + args.team + "_.csv",
+        newline='') as raw_file:
+        raw_data_reader = pandas.read_csv(raw_file)
+    with open(team_path + "roster.csv", newline='') as roster_file:
+        roster_reader = roster_module.Roster(pandas.read_csv(roster_file))
+    with open(team_path + "word_removal.csv", newline='') as word_file:
+        word_file_reader = pandas.read_csv(word_file)
+    with open(team_path + "hand_code_sample.csv", newline='') as hand_code_file:
+        hand_code_reader = pandas.read_csv(hand_code_file)
+    result = evaluate_configurations(raw_data_reader, roster_reader, word_file_reader,
+        hand_code_reader, args.team, repeats=args.repeats)
+    print(result.to_string(index=False))
@@ -0,0 +1,247 @@
+"""
+Module with the mention index: an inverted index from every roster person to the
+comments that mention them, built with cmt_lvl_roster_mentions.csv by
+name_matching.comment_roster() and saved as Teams/<team>/mention_index.npz.
+
+A comment is kept as its key (global_ID << 32) | local_ID (see
+comment_store.comment_keys()). The keys of every person, the posting list, are
+sorted, and only the differences between neighbouring keys are stored, each as
+a variable-length integer of 7 bits per byte (the high bit is set on every byte
+but the last of a number). Comments of one thread differ by their local ID, so
+most differences fit in one or two bytes. The index is a dictionary with:
+
+"people": the roster names, in the order of the roster_list.
+"counts": the number of comments in the posting list of every person.
+"offsets": where the bytes of every person's posting list start in "data",
+plus the length of "data".
+"data": the encoded posting lists of all people, one after another.
+
+Queries decode only the lists of the people asked for, and combine them with
+all_of() (comments mentioning every person) and any_of() (comments mentioning
+any of them). filter_games() keeps the comments of games with a result or in a
+range of dates. For example, the comments that mentioned Joel Embiid after losses
+in January:
+
+    python mention_index.py --team 76ers --people "Joel Embiid" --result Lose \
+        --start 2020-01-01 --end 2020-01-31
+
+Creator: Sebastian Guo
+"""
+import argparse
+import numpy
+import pandas
+import assertions
+import comment_store
+import raw_cache
+import thread_index as thread_index_module
+
+RESULTS = ["Win", "Lose", "N/A"]
+
+def mention_index_path(team):
+    """ Returns the path of the mention index of a team. """
+    return "/home/sebastianguo/Documents/Research/Teams/" + team + "/mention_index.npz"
+
+def build_mention_index(cmt_lvl_ment_file, roster_list):
+    """
+    Returns the mention index of a table of comments and mention flags.
+
+    Parameter cmt_lvl_ment_file: a table made by name_matching.comment_roster().
+    Precondition: must be a DataFrame with the headers global_ID, local_ID and
+    every person in roster_list, whose flags are 1 for a mention.
+
+    Parameter roster_list: the people to index.
+    Precondition: must be a list with string entries.
+    """
+    assertions.assert_str_list(roster_list)
+    assertions.assert_cmt_lvl_ment_file_format(cmt_lvl_ment_file, roster_list)
+    keys = comment_store.comment_keys(cmt_lvl_ment_file["global_ID"].to_numpy(),
+        cmt_lvl_ment_file["local_ID"].to_numpy())
+    encoded = []
+    counts = numpy.zeros(len(roster_list), dtype=numpy.int64)
+    for person_ind in range(len(roster_list)):
+        flags = cmt_lvl_ment_file[roster_list[person_ind]].to_numpy() == 1
+        postings = numpy.unique(keys[flags])
+        counts[person_ind] = len(postings)
+        encoded.append(encode_postings(postings))
+    offsets = numpy.zeros(len(encoded) + 1, dtype=numpy.int64)
+    numpy.cumsum([len(data) for data in encoded], out=offsets[1:])
+    return {"people": list(roster_list), "counts": counts, "offsets": offsets,
+        "data": numpy.concatenate(encoded) if encoded else numpy.zeros(0, dtype=numpy.uint8)}
+
+def save_mention_index(index, path):
+    """
+    Saves a mention index to a numpy file at path. The names are stored as one
+    newline separated buffer since roster names never contain newlines.
+    """
+    numpy.savez(path, people=numpy.frombuffer("\n".join(index["people"]).encode("utf-8"),
+        dtype=numpy.uint8), counts=index["counts"], offsets=index["offsets"],
+        data=index["data"])
+
+def load_mention_index(path):
+    """ Returns the mention index saved by save_mention_index() at path. """
+    with numpy.load(path) as arrays:
+        people = arrays["people"].tobytes().decode("utf-8")
+        return {"people": people.split("\n") if people != "" else [],
+            "counts": arrays["counts"], "offsets": arrays["offsets"], "data": arrays["data"]}
+
+def encode_postings(keys):
+    """
+    Returns a sorted array of comment keys as a numpy uint8 array: the first key
+    and the differences between the next ones, each as a variable-length integer.
+
+    Parameter keys: the comment keys.
+    Precondition: must be a sorted numpy array of different non-negative integers.
+    """
+    deltas = numpy.diff(numpy.asarray(keys, dtype=numpy.int64), prepend=0).astype(numpy.uint64)
+    assert (numpy.asarray(keys) >= 0).all() and (deltas[1:] > 0).all(), \
+        "The keys are not sorted, different and non-negative."
+    # The number of bytes of every number, 7 bits per byte.
+    lengths = numpy.ones(len(deltas), dtype=numpy.int64)
+    for shift in range(7, 64, 7):
+        lengths += deltas >= (numpy.uint64(1) << numpy.uint64(shift))
+    data = numpy.zeros(int(lengths.sum()), dtype=numpy.uint8)
+    starts = numpy.cumsum(lengths) - lengths
+    for byte in range(int(lengths.max()) if len(lengths) else 0):
+        has_byte = lengths > byte
+        value = (deltas[has_byte] >> numpy.uint64(7 * byte)) & numpy.uint64(0x7f)
+        more = (lengths[has_byte] > byte + 1).astype(numpy.uint64) << numpy.uint64(7)
+        data[starts[has_byte] + byte] = (value | more).astype(numpy.uint8)
+    return data
+
+def decode_postings(data):
+    """ Returns the sorted numpy int64 array of comment keys encoded in data. """
+    data = numpy.asarray(data, dtype=numpy.uint8)
+    if len(data) == 0:
+        return numpy.zeros(0, dtype=numpy.int64)
+    last = (data & 0x80) == 0
+    ends = numpy.flatnonzero(last)
+    starts = numpy.concatenate(([0], ends[:-1] + 1))
+    # The position of every byte within its number.
+    number = numpy.cumsum(last) - last
+    shifts = (numpy.arange(len(data)) - starts[number]) * 7
+    parts = (data & 0x7f).astype(numpy.uint64) << shifts.astype(numpy.uint64)
+    deltas = numpy.bitwise_or.reduceat(parts, starts)
+    return numpy.cumsum(deltas.astype(numpy.int64))
+
+def postings(index, person):
+    """
+    Returns the sorted comment keys of the comments mentioning person.
+
+    Parameter index: a mention index.
+    Precondition: must be a dictionary from build_mention_index() or load_mention_index().
+
+    Parameter person: the person.
+    Precondition: must be a string in index["people"].
+    """
+    person_ind = _person_ind(index, person)
+    start, end = index["offsets"][person_ind], index["offsets"][person_ind + 1]
+    return decode_postings(index["data"][start:end])
+
+def all_of(index, people):
+    """
+    Returns the sorted comment keys of the comments mentioning every person in
+    people. The lists are intersected from the shortest one up.
+    """
+    assertions.assert_str_list(people)
+    assert len(people) > 0, "people is empty."
+    people = sorted(people, key=lambda person: index["counts"][_person_ind(index, person)])
+    keys = postings(index, people[0])
+    for person in people[1:]:
+        if len(keys) == 0:
+            break
+        keys = numpy.intersect1d(keys, postings(index, person), assume_unique=True)
+    return keys
+
+def any_of(index, people):
+    """ Returns the sorted comment keys of the comments mentioning any person in people. """
+    assertions.assert_str_list(people)
+    lists = [postings(index, person) for person in people]
+    return numpy.unique(numpy.concatenate(lists)) if lists else numpy.zeros(0, dtype=numpy.int64)
+
+def filter_games(keys, game_results, result=None, start=None, end=None, thread_index=None):
+    """
+    Returns the comment keys in keys whose game has the result result and a date
+    from start to end (both included).
+
+    Parameter keys: comment keys.
+    Precondition: must be a numpy array of integers.
+
+    Parameter game_results: the results of the games by global ID.
+    Precondition: must be a DataFrame from mgmt_matching.resolve_game_results()
+    (the stage game_results of pipeline.py).
+
+    Parameter result: the result to keep, or None for every result.
+    Precondition: must be None or a string in RESULTS.
+
+    Parameter start, end: the first and last date to keep, or None.
+    Precondition: must be None, a string or a datetime.
+
+    Parameter thread_index: the thread index of module thread_index. If given,
+    threads without a game date are dated by their post date.
+    Precondition: must be None or a DataFrame from module thread_index.
+    """
+    assert result is None or result in RESULTS, repr(result) + " is not in " + str(RESULTS) + "."
+    global_IDs = numpy.asarray(keys, dtype=numpy.int64) >> 32
+    keep = numpy.ones(len(global_IDs), dtype=bool)
+    if thread_index is not None:
+        assertions.assert_thread_index(thread_index)
+    if result is not None:
+        keep &= game_results["Result"].reindex(global_IDs).to_numpy() == result
+    if start is not None or end is not None:
+        dates = game_results["Game Date"].reindex(global_IDs)
+        if thread_index is not None:
+            dates = dates.fillna(thread_index["Post Date"].reindex(global_IDs))
+        dates = dates.to_numpy()
+        if start is not None:
+            keep &= dates >= numpy.datetime64(pandas.Timestamp(start))
+        if end is not None:
+            keep &= dates <= numpy.datetime64(pandas.Timestamp(end))
+    return numpy.asarray(keys)[keep]
+
+def to_frame(keys, store=None):
+    """
+    Returns comment keys as a DataFrame with the columns global_ID and local_ID,
+    and the column comment with the text if a comment store is given.
+    """
+    keys = numpy.asarray(keys, dtype=numpy.int64)
+    df = pandas.DataFrame({"global_ID": keys >> 32, "local_ID": keys & 0xffffffff})
+    if store is not None:
+        df["comment_ID"] = comment_store.comment_ids(store, df["global_ID"], df["local_ID"])
+        df = comment_store.with_text(df, store)
+    return df
+
+def _person_ind(index, person):
+    """ Returns the position of person in the mention index. """
+    assert person in index["people"], repr(person) + " is not in the mention index."
+    return index["people"].index(person)
+
+def _parse_args(argv=None):
+    """ Parses the command line arguments of a query. """
+    parser = argparse.ArgumentParser(description="Find the comments mentioning " +
+        "roster people in the mention index of a team.")
+    parser.add_argument("--team", default="76ers")
+    parser.add_argument("--people", nargs="+", required=True)
+    parser.add_argument("--any", action="store_true",
+        help="comments mentioning any of the people instead of all of them")
+    parser.add_argument("--result", choices=RESULTS)
+    parser.add_argument("--start", help="the first game date, for example 2020-01-01")
+    parser.add_argument("--end", help="the last game date")
+    parser.add_argument("--text", action="store_true", help="print the comment text")
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    args = _parse_args()
+    team_path = "/home/sebastianguo/Documents/Research/Teams/" + args.team + "/"
+    mention_index = load_mention_index(mention_index_path(args.team))
+    comment_keys = any_of(mention_index, args.people) if args.any else \
+        all_of(mention_index, args.people)
+    if args.result is not None or args.start is not None or args.end is not None:
+        misc_path = "/home/sebastianguo/Documents/Research/misc_data/"
+        game_thread_index = thread_index_module.load_thread_index(misc_path +
+            "game_thread_urls_2020_enhanced.csv", raw_cache.read_table(misc_path + "teams.csv"))
+        comment_keys = filter_games(comment_keys, pandas.read_pickle(team_path +
+            "game_results.pkl"), args.result, args.start, args.end, game_thread_index)
+    comment_text_store = comment_store.open_comment_store(team_path +
+        "csv_data/regseason_postgame_2020_" + args.team + "_.csv") if args.text else None
+    print(to_frame(comment_keys, comment_text_store).to_string(index=False))
+    print(str(len(comment_keys)) + " comments.")
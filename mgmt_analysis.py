@@ -5,15 +5,23 @@ factor in how people blame/credit someone for a team's performance.
 Creator: Sebastian Guo
 """
 import assertions
+import sentiment_analysis
+import roster as roster_module
+import fact_table
+import group_stats
+import concurrent.futures
 import pandas
 import numpy
 
-def calc_mgmt_stats(global_ID_list, mgmt_list, roster_file, team):
+def calc_mgmt_stats(global_ID_list, mgmt_list, roster_file, team, pos_cutoff=None,
+    neg_cutoff=None, bootstrap_samples=2000, confidence=0.95, seed=0):
     """
     A function to calculate statistical averages for comment sentiment and
-    management mentions. It takes in a csv file created by function
-    coach_mentions_glob() which contains data about comment sentiment for
-    comments mentioning management. The function then finds the average net
+    management mentions. It takes in the fact table rows appended for every game
+    after coach_mentions_glob() (or the csv files it created, for games missing
+    from the fact table) which contain data about comment sentiment for
+    comments mentioning management. The statistics are computed with the
+    group-by engine in module group_stats. The function then finds the average net
     sentiment per game won/loss per race and average positive/negative comments
     per won/loss game per race. To make the stats comparable, the averages are
     divided by the number of AA or CA coaches.
@@ -38,151 +46,200 @@ def calc_mgmt_stats(global_ID_list, mgmt_list, roster_file, team):
     Precondition: must be a list with string entries.
 
     Parameter roster_file: a csv file containing player/coach names and nicknames.
-    Precondition: must be a DataFrame with the correct headers.
+    Precondition: must be a DataFrame with the correct headers or a Roster object.
 
     Parameter team: the team that the function works on.
     Precondition: must be a string.
+
+    Parameter pos_cutoff, neg_cutoff: if given, the positive and negative
+    comments of every game are recounted with these cutoffs from the comment
+    probabilities saved by sentiment_analysis.manager_cmt_sentiment(), instead
+    of taking the counts in the files from coach_mentions_glob(). No comment is
+    classified again.
+    Precondition: must be None or numbers between 0 and 1 with neg_cutoff <=
+    pos_cutoff.
+
+    Parameter bootstrap_samples: the number of times the won and the lost games
+    are resampled to find confidence intervals with
+    group_stats.bootstrap_stats(). The intervals are written in the columns
+    "Win CI Low", "Win CI High", "Loss CI Low" and "Loss CI High" of
+    mgmt_sentiment.csv and "Mentions Per Win CI Low", ... of mgmt_mentions.csv.
+    If zero, no intervals are computed.
+    Precondition: must be an integer greater than or equal to zero.
+
+    Parameter confidence: the confidence level of the intervals.
+    Precondition: must be a number between 0 and 1.
+
+    Parameter seed: the seed of the resampling, so the intervals are the same on
+    every run.
+    Precondition: must be an integer.
     """
     _assertion_calc_mgmt_stats(global_ID_list, mgmt_list, roster_file, team)
+    assert type(bootstrap_samples) == int and bootstrap_samples >= 0, \
+        repr(bootstrap_samples) + " is not an integer greater than or equal to zero."
+    if pos_cutoff is not None or neg_cutoff is not None:
+        pos_cutoff = 0.5 if pos_cutoff is None else pos_cutoff
+        neg_cutoff = 0.5 if neg_cutoff is None else neg_cutoff
+        assertions.assert_cutoffs(pos_cutoff, neg_cutoff)
     end_dict = {"Statistic Per Game Won or Lost (Per Coach)":["Manager Average Net Sentiment Per Game",
         "AA", "CA", "Manager Average Positive Comments Per Game","AA", "CA",
         "Manager Average Negative Comments Per Game", "AA", "CA"], "Win":[],"Loss":[]}
-    # Store all stats in a dictionary to be passed into a helper function.
-    stat_dict = {"win_aa_pos_cmt":0, "win_aa_neg_cmt":0, "win_ca_pos_cmt":0,
-        "win_ca_neg_cmt":0, "loss_aa_pos_cmt":0, "loss_aa_neg_cmt":0,
-        "loss_ca_pos_cmt":0, "loss_ca_neg_cmt":0, "win_aa_net_sent":0,
-        "win_ca_net_sent":0, "loss_aa_net_sent":0, "loss_ca_net_sent":0}
-    info_dict = {"won_games":0, "lost_games":0, "aa_coach":0, "ca_coach":0}
-    ment_dict = {"Coach":[], "Race":[], "Annual Salary":[], "Seasons Spent":[],
-        "Mentions Per Win":[], "Mentions Per Loss":[]}
-    _find_num_coaches(roster_file, info_dict, mgmt_list)
-    _add_ment_dict(ment_dict, info_dict, roster_file, mgmt_list)
-    for term in global_ID_list:
-        # File from coach_mentions_glob().
-        with open("/home/sebastianguo/Documents/Research/Teams/" + team +
-            "/mgmt_and_race_by_game/" + str(term) + ".csv", newline='') as game_reader:
-            mgmt_race_reader = pandas.read_csv(game_reader)
-        assertions.assert_mgmt_and_race_file_format(mgmt_race_reader, mgmt_list)
-        stat_dict, ment_dict, info_dict = _add_to_dicts(mgmt_list, mgmt_race_reader,
-            stat_dict, ment_dict, info_dict, term)
-    _average_final_stats(stat_dict, info_dict, mgmt_list)
+    ment_dict = {"Coach":[], "Race":[], "Annual Salary":[], "Seasons Spent":[]}
+    roster = roster_module.as_roster(roster_file)
+    _add_ment_dict(ment_dict, roster, mgmt_list)
+    facts = _load_game_facts(global_ID_list, mgmt_list, team)
+    if pos_cutoff is not None:
+        facts = _recount_sentiment(facts, team, pos_cutoff, neg_cutoff)
+
+    games = group_stats.count_games(facts, ["result"])
+    info_dict = {"won_games":int(games.get("Win", 0)), "lost_games":int(games.get("Lose", 0))}
+    stat_dict = _race_stats(group_stats.group_stats(facts, ["result", "race"],
+        ["pos", "neg", "net"]), info_dict)
     _add_end_dict(end_dict, stat_dict, info_dict)
+    if bootstrap_samples > 0:
+        _add_interval_columns(end_dict, group_stats.bootstrap_stats(facts, ["race"],
+            ["net", "pos", "neg"], ["result"], bootstrap_samples, confidence, seed),
+            info_dict)
 
+    ment_stats = group_stats.group_stats(facts, ["result", "person"], ["mentions"])
     df = pandas.DataFrame(end_dict)
     df2 = pandas.DataFrame(ment_dict)
-    df2["Mentions Per Win"] = (df2["Mentions Per Win"] /
+    df2["Mentions Per Win"] = (_mentions_by_result(ment_stats, "Win", mgmt_list) /
         info_dict["won_games"]).round(decimals = 4)
-    df2["Mentions Per Loss"] = (df2["Mentions Per Loss"] /
+    df2["Mentions Per Loss"] = (_mentions_by_result(ment_stats, "Lose", mgmt_list) /
         info_dict["lost_games"]).round(decimals = 4)
     df2["Mentions Ratio (Per Win/Per Loss)"] = (df2["Mentions Per Win"] /
         df2["Mentions Per Loss"]).round(decimals = 4)
+    if bootstrap_samples > 0:
+        ment_ci = group_stats.bootstrap_stats(facts, ["person"], ["mentions"], ["result"],
+            bootstrap_samples, confidence, seed)
+        for result, column, games in [("Win", "Mentions Per Win", info_dict["won_games"]),
+            ("Lose", "Mentions Per Loss", info_dict["lost_games"])]:
+            for bound in ["low", "high"]:
+                df2[column + " CI " + bound.capitalize()] = [round(_interval(ment_ci,
+                    (result, manager), "mentions ci " + bound, games), 4)
+                    for manager in mgmt_list]
 
     df.to_csv(r'/home/sebastianguo/Documents/Research/Teams/' + team +
         '/mgmt_sentiment.csv', index=False)
     df2.to_csv(r'/home/sebastianguo/Documents/Research/Teams/' + team +
         '/mgmt_mentions.csv', index=False)
 
-def _find_num_coaches(roster_file, info_dict, mgmt_list):
-    """ Finds total number of African American and Caucasian Coaches. """
-    for term in mgmt_list:
-        ind_lst = roster_file.index[roster_file["Player"] == term].tolist()
-        try:
-            if roster_file["Race"][ind_lst[0]] == "AA":
-                info_dict["aa_coach"] += 1
-            elif roster_file["Race"][ind_lst[0]] == "CA":
-                info_dict["ca_coach"] += 1
-        except:
-            raise Exception("Couldn't find a race index for a management person.")
-    return info_dict
+def _load_game_facts(global_ID_list, mgmt_list, team):
+    """
+    Returns the fact table rows of the managers in mgmt_list for the games in
+    global_ID_list. The rows are read from the team's fact table with one read.
+    Games missing from the fact table are read from their file in
+    mgmt_and_race_by_game, which coach_mentions_glob() writes for every game.
+    """
+    facts = fact_table.read_facts(fact_table.fact_table_path(team))
+    facts = facts[facts["global_ID"].isin(global_ID_list) & facts["person"].isin(mgmt_list)]
+    chunks = [facts]
+    found = set(facts["global_ID"].tolist())
+    for term in global_ID_list:
+        if term in found:
+            continue
+        # File from coach_mentions_glob().
+        with open("/home/sebastianguo/Documents/Research/Teams/" + team +
+            "/mgmt_and_race_by_game/" + str(term) + ".csv", newline='') as game_reader:
+            mgmt_race_reader = pandas.read_csv(game_reader)
+        assertions.assert_mgmt_and_race_file_format(mgmt_race_reader, mgmt_list)
+        # "N/A" is read as a missing value.
+        result = mgmt_race_reader["Name"][len(mgmt_list)]
+        result = "N/A" if pandas.isnull(result) else result
+        chunks.append(fact_table.game_facts(team, term, None, result, mgmt_race_reader))
+    facts = pandas.concat(chunks, ignore_index=True)
+    for column in ["result", "person", "race"]:
+        facts[column] = facts[column].astype(object)
+    return facts
+
+def _recount_sentiment(facts, team, pos_cutoff, neg_cutoff):
+    """
+    Returns a copy of facts with the positive, negative and net sentiment of
+    every game recounted from the saved comment probabilities of the game,
+    using the given cutoffs.
+    """
+    facts = facts.copy()
+    for global_ID, rows in facts.groupby("global_ID").groups.items():
+        prob_table = sentiment_analysis.load_probabilities("/home/sebastianguo/Documents/" +
+            "Research/Teams/" + team + "/mgmt_sentiment_probs_by_game/" + str(global_ID) + ".npz")
+        sent_dict = sentiment_analysis.sentiment_counts(prob_table, pos_cutoff, neg_cutoff)
+        counts = numpy.array([sent_dict[name] for name in facts.loc[rows, "person"]],
+            dtype=numpy.int64).reshape(len(rows), 2)
+        facts.loc[rows, "pos"] = counts[:, 0]
+        facts.loc[rows, "neg"] = counts[:, 1]
+        facts.loc[rows, "net"] = counts[:, 0] - counts[:, 1]
+    return facts
 
-def _add_ment_dict(ment_dict, info_dict, roster_file, mgmt_list):
+def _add_ment_dict(ment_dict, roster, mgmt_list):
     """ Adds coaches and other attributes to the ment_dict. """
-    person = roster_file["Player"]
-    race = roster_file["Race"]
-    salary = roster_file["Annual Salary"]
-    seasons = roster_file["Seasons Spent"]
     for manager in mgmt_list:
-        row_ind = roster_file.index[person == manager].tolist()
+        member = roster.get(manager)
+        if member is None:
+            raise Exception("Couldn't find a race index for a management person.")
         ment_dict["Coach"].append(manager)
-        ment_dict["Race"].append(race[row_ind[0]])
-        ment_dict["Annual Salary"].append(salary[row_ind[0]])
-        ment_dict["Seasons Spent"].append(seasons[row_ind[0]])
-        ment_dict["Mentions Per Win"].append(0)
-        ment_dict["Mentions Per Loss"].append(0)
+        ment_dict["Race"].append(member.race)
+        ment_dict["Annual Salary"].append(member.salary)
+        ment_dict["Seasons Spent"].append(member.seasons)
     return ment_dict
 
-def _add_to_dicts(mgmt_list, mgmt_race_reader, stat_dict, ment_dict, info_dict, term):
-    """
-    A helper function to add up net sentiment and total mentions for a data frame
-    created by function coach_mentions_glob(). After looping through every data
-    frame, stat_dict should contain aggregate statistics for net sentiment, total
-    mentions, and positive/negative comments.
-    """
-    pos_cmt = mgmt_race_reader["Positive comments"]
-    neg_cmt = mgmt_race_reader["Negative comments"]
-    net_sent = mgmt_race_reader["Net sentiment"]
-    mentions = mgmt_race_reader["Mentions"]
-    result = mgmt_race_reader["Name"][len(mgmt_list)]
-    if result == "Win": info_dict["won_games"] += 1
-    elif result == "Lose": info_dict["lost_games"] += 1
-    for row_ind in range(len(mgmt_list)):
-        ethnicity = mgmt_race_reader["Race"][row_ind]
-        row_net_sent = net_sent[row_ind]
-        row_pos_cmts = pos_cmt[row_ind]
-        row_neg_cmts = neg_cmt[row_ind]
-        row_ment = mentions[row_ind]
-        if result == "Win":
-            ment_dict["Mentions Per Win"][row_ind] += row_ment
-            if ethnicity == "AA":
-                stat_dict["win_aa_net_sent"] += row_net_sent
-                stat_dict["win_aa_pos_cmt"] += row_pos_cmts
-                stat_dict["win_aa_neg_cmt"] += row_neg_cmts
-            elif ethnicity == "CA":
-                stat_dict["win_ca_pos_cmt"] += row_pos_cmts
-                stat_dict["win_ca_neg_cmt"] += row_neg_cmts
-                stat_dict["win_ca_net_sent"] += row_net_sent
-        elif result == "Lose":
-            ment_dict["Mentions Per Loss"][row_ind] += row_ment
-            if ethnicity == "AA":
-                stat_dict["loss_aa_pos_cmt"] += row_pos_cmts
-                stat_dict["loss_aa_neg_cmt"] += row_neg_cmts
-                stat_dict["loss_aa_net_sent"] += row_net_sent
-            elif ethnicity == "CA":
-                stat_dict["loss_ca_pos_cmt"] += row_pos_cmts
-                stat_dict["loss_ca_neg_cmt"] += row_neg_cmts
-                stat_dict["loss_ca_net_sent"] += row_net_sent
-    return stat_dict, ment_dict, info_dict
-
-def _average_final_stats(stat_dict, info_dict, mgmt_list):
-    """
-    A helper function to find averages for net sentiment and mentions per game.
-    It divides all of the statistics on net sentiment and mentions for race and
-    game results by the number of won or lost games for a file of global IDs.
-    """
-    games_won = info_dict["won_games"]
-    games_lost = info_dict["lost_games"]
-    stat_dict["win_aa_net_sent"] /= games_won
-    stat_dict["loss_aa_net_sent"] /= games_lost
-    stat_dict["win_aa_pos_cmt"] /= games_won
-    stat_dict["win_aa_neg_cmt"] /= games_won
-    stat_dict["loss_aa_pos_cmt"] /= games_lost
-    stat_dict["loss_aa_neg_cmt"] /= games_lost
-    stat_dict["win_ca_net_sent"] /= games_won
-    stat_dict["loss_ca_net_sent"] /= games_lost
-    stat_dict["win_ca_pos_cmt"] /= games_won
-    stat_dict["win_ca_neg_cmt"] /= games_won
-    stat_dict["loss_ca_pos_cmt"] /= games_lost
-    stat_dict["loss_ca_neg_cmt"] /= games_lost
-    num_aa = info_dict["aa_coach"] if info_dict["aa_coach"] != 0 else 1
-    num_ca = info_dict["ca_coach"] if info_dict["ca_coach"] != 0 else 1
-    for key in stat_dict:
-        if "aa" in key:
-            stat_dict[key] /= num_aa
-        elif "ca" in key:
-            stat_dict[key] /= num_ca
-        stat_dict[key] = round(stat_dict[key], 4)
+def _race_stats(race_stats, info_dict):
+    """
+    Returns the stat_dict used by _add_end_dict() from the result and race
+    statistics of group_stats(): the average net sentiment and positive/negative
+    comments per game won/lost per AA or CA coach, rounded to 4 decimals. A race
+    without managers has averages of zero.
+    """
+    stat_dict = {}
+    for result, res_key, games in [("Win", "win", info_dict["won_games"]),
+        ("Lose", "loss", info_dict["lost_games"])]:
+        for race in ["AA", "CA"]:
+            for value, val_key in [("pos", "pos_cmt"), ("neg", "neg_cmt"), ("net", "net_sent")]:
+                if (result, race) in race_stats.index:
+                    stat = race_stats.loc[(result, race), value + " per game per person"]
+                else:
+                    stat = 0.0 if games != 0 else numpy.nan
+                stat_dict[res_key + "_" + race.lower() + "_" + val_key] = round(stat, 4)
     return stat_dict
 
+def _add_interval_columns(end_dict, race_ci, info_dict):
+    """
+    Adds the confidence intervals of the statistics in the "Win" and "Loss"
+    columns of end_dict as the columns "Win CI Low", "Win CI High", "Loss CI Low"
+    and "Loss CI High", rounded to 4 decimals.
+    """
+    for result, column, games in [("Win", "Win", info_dict["won_games"]),
+        ("Lose", "Loss", info_dict["lost_games"])]:
+        for bound in ["low", "high"]:
+            entries = []
+            for value in ["net", "pos", "neg"]:
+                entries.append("")
+                for race in ["AA", "CA"]:
+                    entries.append(round(_interval(race_ci, (result, race),
+                        value + " ci " + bound, games), 4))
+            entries.append("")
+            end_dict[column + " CI " + bound.capitalize()] = entries
+    return end_dict
+
+def _interval(ci_table, key, column, games):
+    """
+    Returns a bound of a confidence interval from group_stats.bootstrap_stats().
+    A group without rows, like a race without managers, has a statistic of zero.
+    """
+    if key in ci_table.index:
+        return ci_table.loc[key, column]
+    return 0.0 if games != 0 else numpy.nan
+
+def _mentions_by_result(ment_stats, result, mgmt_list):
+    """
+    Returns a Series with the total mentions of every manager in games with the
+    given result, in the order of mgmt_list.
+    """
+    if result not in ment_stats.index.get_level_values("result"):
+        return pandas.Series(0, index=range(len(mgmt_list)))
+    return ment_stats["mentions"].xs(result, level="result").reindex(mgmt_list,
+        fill_value=0).reset_index(drop=True)
+
 def _add_end_dict(end_dict, stat_dict, info_dict):
     """
     A helper function to add the aggregate averaged stats in stat_dict to end_dict.
@@ -198,36 +255,108 @@ def _add_end_dict(end_dict, stat_dict, info_dict):
         str(info_dict["won_games"]) + "/" + str(info_dict["lost_games"]))
     return end_dict
 
-def compile_mgmt_stats(team_list):
+def compile_mgmt_stats(team_list, weighting="team", max_workers=8):
     """
     Takes the csv files created by calc_mgmt_stats and compiles them into one
-    aggregate file to look at all of the teams.
+    aggregate file to look at all of the teams. The files of all teams are read
+    concurrently and averaged as one array per column.
+
+    The net sentiment and positive/negative comment rows are the averages of the
+    teams' mgmt_sentiment.csv. The mention rows are the average mentions per game
+    won/lost per AA or CA coach, taken from the teams' mgmt_mentions.csv.
+
+    Parameter team_list: the teams to compile.
+    Precondition: must be a non-empty list with string entries.
+
+    Parameter weighting: "team" for the plain mean of the per-team averages, or
+    "games" to weight every team's win (loss) averages by the games it won
+    (lost), read from the "Win/Loss Ratio" row of its mgmt_sentiment.csv. A team
+    with an empty cell (no games won or lost) is left out of that cell's mean.
+    Precondition: must be "team" or "games".
+
+    Parameter max_workers: the number of threads reading files.
+    Precondition: must be an integer greater than zero.
     """
+    _assertion_compile_mgmt_stats(team_list, weighting, max_workers)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        team_stats = list(executor.map(_read_team_stats, team_list))
+    # Arrays of shape (teams, rows); the header rows are NaN.
+    win = numpy.array([stats[0] for stats in team_stats])
+    loss = numpy.array([stats[1] for stats in team_stats])
+    if weighting == "games":
+        won_games = numpy.array([stats[2] for stats in team_stats], dtype=numpy.float64)
+        lost_games = numpy.array([stats[3] for stats in team_stats], dtype=numpy.float64)
+    else:
+        won_games = lost_games = numpy.ones(len(team_list))
+    win_avg = _weighted_mean(win, won_games)
+    loss_avg = _weighted_mean(loss, lost_games)
     end_dict = {"Statistic Overall For All Teams":["Manager Average Net Sentiment Per Game",
         "AA", "CA", "Manager Average Positive Comments Per Game","AA", "CA",
         "Manager Average Negative Comments Per Game", "AA", "CA",
-        "Manager Average Mentions Per Game", "AA", "CA"], "Win":["",0,0,"",0,0,"",0,0,"",0,0],
-        "Loss":["",0,0,"",0,0,"",0,0,"",0,0]}
-    num_teams = len(team_list)
-    for team_name in team_list:
-        # File from calc_mgmt_stats().
-        with open("/home/sebastianguo/Documents/Research/Teams/" + team_name +
-            "/mgmt_sentiment.csv", newline='') as mgmt_stat_reader:
-            mgmt_stat_reader = pandas.read_csv(mgmt_stat_reader)
-        assertions.assert_mgmt_stat_file_format(mgmt_stat_reader)
-        win_row = mgmt_stat_reader["Win"]
-        loss_row = mgmt_stat_reader["Loss"]
-        # Loop through "Win" and "Loss" rows, formatting is asserted by prev func.
-        for row in range(mgmt_stat_reader.shape[0]):
-            if not pandas.isnull(win_row[row]):
-                end_dict["Win"][row] += win_row[row]
-                end_dict["Loss"][row] += loss_row[row]
-                if team_list[num_teams-1] == team_name:
-                    end_dict["Win"][row] = round(end_dict["Win"][row]/num_teams, 4)
-                    end_dict["Loss"][row] = round(end_dict["Loss"][row]/num_teams, 4)
+        "Manager Average Mentions Per Game", "AA", "CA"],
+        "Win":[""] * 12, "Loss":[""] * 12}
+    win_avg = numpy.around(win_avg, 4)
+    loss_avg = numpy.around(loss_avg, 4)
+    for row in range(len(end_dict["Win"])):
+        if row not in _COMPILED_HEADER_ROWS:
+            end_dict["Win"][row] = win_avg[row]
+            end_dict["Loss"][row] = loss_avg[row]
     df = pandas.DataFrame(end_dict)
     df.to_csv(r'/home/sebastianguo/Documents/Research/misc_data/all_teams_mgmt_stats.csv',
         index=False)
+    return df
+
+def _weighted_mean(values, weights):
+    """
+    Returns the mean of every column of values (teams, rows) weighted by the
+    weight of every team. A team without a value in a row (NaN, for example the
+    loss rows of a team that lost no games) is left out of that row, so it
+    does not make the row of every team NaN.
+    """
+    present = ~numpy.isnan(values)
+    row_weights = (weights[:, None] * present).sum(axis=0)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        return numpy.where(present, values * weights[:, None], 0).sum(axis=0) / row_weights
+
+# Rows of all_teams_mgmt_stats.csv that only hold a statistic name.
+_COMPILED_HEADER_ROWS = [0, 3, 6, 9]
+
+def _read_team_stats(team_name):
+    """
+    Reads the files calc_mgmt_stats() wrote for a team and returns a tuple
+    (win, loss, won games, lost games), where win and loss are arrays with the
+    12 rows of all_teams_mgmt_stats.csv (NaN in the header rows).
+    """
+    # Files from calc_mgmt_stats().
+    with open("/home/sebastianguo/Documents/Research/Teams/" + team_name +
+        "/mgmt_sentiment.csv", newline='') as mgmt_stat_file:
+        mgmt_stat_reader = pandas.read_csv(mgmt_stat_file)
+    assertions.assert_mgmt_stat_file_format(mgmt_stat_reader)
+    with open("/home/sebastianguo/Documents/Research/Teams/" + team_name +
+        "/mgmt_mentions.csv", newline='') as mgmt_ment_file:
+        mgmt_ment_reader = pandas.read_csv(mgmt_ment_file)
+    assertions.assert_mgmt_mentions_file_format(mgmt_ment_reader)
+    win = numpy.full(12, numpy.nan)
+    loss = numpy.full(12, numpy.nan)
+    win[:9] = mgmt_stat_reader["Win"].to_numpy(dtype=numpy.float64)[:9]
+    loss[:9] = mgmt_stat_reader["Loss"].to_numpy(dtype=numpy.float64)[:9]
+    # Average mentions per game per coach of a race, zero without such coaches.
+    race_ment = mgmt_ment_reader.groupby("Race")[["Mentions Per Win",
+        "Mentions Per Loss"]].mean().reindex(["AA", "CA"], fill_value=0)
+    win[10:] = race_ment["Mentions Per Win"].to_numpy()
+    loss[10:] = race_ment["Mentions Per Loss"].to_numpy()
+    # The last row is "Win/Loss Ratio: <won>/<lost>".
+    ratio = mgmt_stat_reader["Statistic Per Game Won or Lost (Per Coach)"][9]
+    won_games, lost_games = ratio[len("Win/Loss Ratio: "):].split("/")
+    return win, loss, int(won_games), int(lost_games)
+
+def _assertion_compile_mgmt_stats(team_list, weighting, max_workers):
+    """ Function to assert assertions for compile_mgmt_stats(). """
+    assertions.assert_str_list(team_list)
+    assert team_list != [], "team_list is empty."
+    assert weighting in ["team", "games"], repr(weighting) + " is not a weighting."
+    assert type(max_workers) == int and max_workers > 0, \
+        repr(max_workers) + " is not an integer greater than zero."
 
 def _assertion_calc_mgmt_stats(global_ID_list, mgmt_list, roster_file, team):
     """ Function to assert assertions for calc_mgmt_stats(). """
@@ -7,13 +7,17 @@ result are correlated to their race.
 
 Creator: Sebastian Guo
 """
+import datetime
 import pandas, string, re
 import assertions
+import sentiment_analysis
+import thread_index as thread_index_module
+import roster as roster_module
 
 def coach_mentions_glob(global_ID, agg_rost_ment_file, roster_file, mgmt_list,
-    sent_dict, result, team):
+    sent_dict, result, team, pos_cutoff=0.5, neg_cutoff=0.5, write=True):
     """
-    A function that outputs a csv file separated by thread/global ID. This file
+    A function that outputs and returns a csv file separated by thread/global ID. This file
     contains the different coaches, general managers, and owners of a basketball
     team, how many times their mentioned, their race, and whether or not the
     game for the team was won or not. It also includes calculations regarding the
@@ -32,27 +36,37 @@ def coach_mentions_glob(global_ID, agg_rost_ment_file, roster_file, mgmt_list,
 
     Parameter roster_file: a reader object that contains information about player
     names and nicknames.
-    Precondition: must be a DataFrame object created by the pandas module. It must
-    also contain the correct headers.
+    Precondition: must be a DataFrame object created by the pandas module or a
+    Roster object. It must also contain the correct headers.
 
     Parameter mgmt_list: a list containing the coaches, GMs, and owners of a team.
     Precondition: must be of type list and contain strings.
 
     Parmaeter sent_dict: a dictionary with managers as keys and comment sentiment
-    as values.
-    Precondition: must be a dictionary with string keys and list values.
+    as values, or a probability table from sentiment_analysis.comment_probabilities().
+    A probability table is turned into comment sentiment with the cutoffs below.
+    Precondition: must be a dictionary with string keys and list values, or a
+    probability table.
 
     Parameter result: whether or not the game corresponding to the global ID was won.
     Precondition: must be either "Win", "Lose", or "N/A".
 
     Parameter team: the basketball team the code is run on.
     Precondition: team is of type string
+
+    Parameter pos_cutoff, neg_cutoff: the cutoffs passed to
+    sentiment_analysis.sentiment_counts() if sent_dict is a probability table.
+    Precondition: must be numbers between 0 and 1 with neg_cutoff <= pos_cutoff.
+
+    Parameter write: whether or not to save the DataFrame as a csv file.
+    Precondition: must be a boolean.
     """
     _assertion_coach_mentions_glob(global_ID, agg_rost_ment_file, roster_file,
         mgmt_list, sent_dict, result, team)
+    if "prob_pos" in sent_dict:
+        sent_dict = sentiment_analysis.sentiment_counts(sent_dict, pos_cutoff, neg_cutoff)
     ment = agg_rost_ment_file["mentions"]
-    position = roster_file["Pos"]
-    race = roster_file["Race"]
+    roster = roster_module.as_roster(roster_file)
 
     end_dict = {"Name":[], "Pos":[], "Race":[], "Mentions":[],
         "Positive comments":[], "Negative comments":[], "Net sentiment":[]}
@@ -61,11 +75,10 @@ def coach_mentions_glob(global_ID, agg_rost_ment_file, roster_file, mgmt_list,
         index_list = agg_rost_ment_file.index[agg_rost_ment_file[name] == 1].tolist()
         for row in index_list:
             agg_ment += ment[row]
-        # Creates a single entry list.
-        index_name = roster_file.index[roster_file["Player"] == name].tolist()
+        member = roster.get(name)
         end_dict["Name"].append(name)
-        end_dict["Pos"].append(position[index_name[0]])
-        end_dict["Race"].append(race[index_name[0]])
+        end_dict["Pos"].append(member.pos)
+        end_dict["Race"].append(member.race)
         end_dict["Mentions"].append(agg_ment)
         pos_cmts = sent_dict[name][0]
         neg_cmts = sent_dict[name][1]
@@ -76,8 +89,10 @@ def coach_mentions_glob(global_ID, agg_rost_ment_file, roster_file, mgmt_list,
     for key in end_dict:
         end_dict[key].append("") if key != "Name" else end_dict[key].append(result)
     df = pandas.DataFrame(end_dict)
-    df.to_csv(r'/home/sebastianguo/Documents/Research/Teams/' + team +
-        '/mgmt_and_race_by_game/' + str(global_ID) + '.csv', index=False)
+    if write:
+        df.to_csv(r'/home/sebastianguo/Documents/Research/Teams/' +
+            team + '/mgmt_and_race_by_game/' + str(global_ID) + '.csv', index=False)
+    return df
 
 def win_or_lose(game_thread_info_file, result_file, team_str, global_ID, team):
     """
@@ -143,6 +158,127 @@ def win_or_lose(game_thread_info_file, result_file, team_str, global_ID, team):
     elif game_result == "L":
         return "Lose"
 
+def resolve_game_results(game_thread_info_file, result_file, team_str, team,
+    global_ID_list=None, thread_index=None, post_game_only=False):
+    """
+    Returns a DataFrame indexed by global ID with the columns "Result" and
+    "Game Date" for every thread in game_thread_info_file (or only the ones in
+    global_ID_list). "Result" is the same "Win", "Lose" or "N/A" that
+    win_or_lose() returns for the thread, and "Game Date" is the date of the
+    game as a datetime (NaT for "N/A").
+
+    Instead of walking back one day at a time for every thread, all dates are
+    parsed once and every thread is matched to its game in one as-of join: the
+    game of a thread is the latest game on or before the post date whose
+    opponent is mentioned in the thread title. A thread with a team in its title
+    but no such game gets "N/A" (win_or_lose() never returns for it).
+
+    Parameter game_thread_info_file: a csv file containing the Reddit thread
+    titles, the corresponding global IDs of those threads, and the dates of the game.
+    Precondition: must be a reader object and contain the headers "ID", "dt",
+    and "title".
+
+    Parameter result_file: a csv file containing the results of a team's season.
+    Precondition: must be a reader object and contain the headers "Result", "Opponent
+    Shortened", and "New Date".
+
+    Parameter team_str: a string containing all NBA teams except "team".
+    Precondition: must be a string.
+
+    Parameter team: the team for which you are trying to find the results.
+    Precondition: must be a string.
+
+    Parameter global_ID_list: the global IDs to resolve. If None, every thread
+    is resolved.
+    Precondition: must be None or a list with integer entries.
+
+    Parameter thread_index: the parsed titles of game_thread_info_file from
+    thread_index.build_thread_index(). If given, the teams in the titles are
+    taken from it instead of running team_str over every title.
+    Precondition: must be None or a DataFrame from module thread_index.
+
+    Parameter post_game_only: if True, only threads that the thread index marks
+    as post-game threads are resolved and all others get "N/A". Needs
+    thread_index.
+    Precondition: must be a boolean.
+    """
+    _assertion_resolve_game_results(game_thread_info_file, result_file, team_str,
+        team, global_ID_list, thread_index, post_game_only)
+    if thread_index is None:
+        # Like win_or_lose(), only the first row of a global ID is used.
+        threads = game_thread_info_file.drop_duplicates("ID")
+        opponents = threads["title"].str.findall(team_str)
+    else:
+        threads = thread_index.reset_index()
+        opponents = thread_index_module.opponents(thread_index, team)
+    if global_ID_list is not None:
+        keep = threads["ID"].isin(global_ID_list).to_numpy()
+        threads = threads[keep]
+        opponents = opponents[keep]
+    if post_game_only:
+        opponents = opponents.where((threads["Thread Type"] == "post-game").to_numpy(),
+            pandas.Series([[]] * len(opponents), index=opponents.index))
+    threads = pandas.DataFrame({"ID": threads["ID"].to_numpy(),
+        "Post Date": _parse_dates(threads["dt"]) if thread_index is None else
+            threads["Post Date"].to_numpy(),
+        "Opponent": opponents.to_numpy()})
+    # Like win_or_lose(), only the first game on a date is used.
+    games = pandas.DataFrame({"Game Date": _parse_dates(result_file["New Date"]),
+        "Opponent": result_file["Opponent Shortened"].to_numpy(),
+        "Result": result_file["Result"].map({"W": "Win", "L": "Lose"}).to_numpy()})
+    games = games.drop_duplicates("Game Date").sort_values("Game Date")
+
+    mentions = threads.explode("Opponent").dropna(subset=["Opponent"])
+    mentions = mentions.drop_duplicates(["ID", "Opponent"]).sort_values("Post Date")
+    matched = pandas.merge_asof(mentions, games, left_on="Post Date",
+        right_on="Game Date", by="Opponent", direction="backward")
+    matched = matched.dropna(subset=["Game Date"]).sort_values("Game Date")
+    matched = matched.drop_duplicates("ID", keep="last").set_index("ID")
+
+    results = pandas.DataFrame(index=pandas.Index(threads["ID"], name="global_ID"))
+    results["Result"] = matched["Result"].reindex(results.index).fillna("N/A")
+    results["Game Date"] = matched["Game Date"].reindex(results.index)
+    return results
+
+def resolve_league_results(game_thread_info_file, result_files, team_file,
+    global_ID_lists=None, thread_index=None, post_game_only=False):
+    """
+    Returns a DataFrame with the columns "Team", "global_ID", "Result" and
+    "Game Date" made by running resolve_game_results() for every team in
+    result_files. The titles are parsed once into a thread index (unless one is
+    given) that every team's resolver shares.
+
+    Parameter game_thread_info_file: the csv file of Reddit threads described
+    in resolve_game_results().
+    Precondition: must be a reader object with the headers "ID", "dt", "title".
+
+    Parameter result_files: the season results of every team.
+    Precondition: must be a dictionary with team name keys and DataFrame values
+    formatted like the result_file of resolve_game_results().
+
+    Parameter team_file: a file containing all 30 basketball teams in the NBA.
+    Precondition: must be a csv reader object containing the header "Team".
+
+    Parameter global_ID_lists: the global IDs to resolve for each team. If None,
+    every thread is resolved for every team.
+    Precondition: must be None or a dictionary with team name keys and lists of
+    integers as values.
+
+    Parameter thread_index, post_game_only: see resolve_game_results().
+    """
+    if thread_index is None:
+        thread_index = thread_index_module.build_thread_index(game_thread_info_file,
+            team_file)
+    team_results = []
+    for team in result_files:
+        global_ID_list = None if global_ID_lists is None else global_ID_lists[team]
+        results = resolve_game_results(game_thread_info_file, result_files[team],
+            make_team_str(team_file, team), team, global_ID_list, thread_index,
+            post_game_only).reset_index()
+        results.insert(0, "Team", team)
+        team_results.append(results)
+    return pandas.concat(team_results, ignore_index=True)
+
 def make_team_str(team_file, team):
     """
     A function to create a regular expression string containing all of the NBA
@@ -172,18 +308,11 @@ def find_management(roster_file):
     Parameter roster_file: a reader object that contains information about player
     names and nicknames.
     Precondition: must be a DataFrame object created by the pandas module and
-    contain the necessary headers.
+    contain the necessary headers, or a Roster object.
     """
     assertions.assert_roster_file_format(roster_file)
-    position = roster_file["Pos"]
-    player = roster_file["Player"]
-
-    mgmt_list = []
-    important_people = ["Coach", "GM", "Owner", "President"]
-    for index in range(roster_file.shape[0]):
-        if position[index] in important_people:
-            mgmt_list.append(player[index])
-    return mgmt_list
+    # The positions counted as management are roster.MGMT_POSITIONS.
+    return list(roster_module.as_roster(roster_file).mgmt_list)
 
 def format_data(raw_result_file, team_file, team):
     """
@@ -223,20 +352,16 @@ def _subtract_date(thread_post_date):
     Subtract the days from the date until a date is found that matches up with
     a game.
     """
-    date_list = thread_post_date.split("/")
-    month = int(date_list[0])
-    day = int(date_list[1])
-    year = int(date_list[2])
-    if month == 1 and day == 1:
-        month = 12
-        day = 31
-        year -= 1
-    elif day == 1:
-        day = 31
-        month -= 1
-    else:
-        day -= 1
-    return str(month) + "/" + str(day) + "/" + str(year)
+    date = datetime.datetime.strptime(thread_post_date, "%m/%d/%Y").date()
+    date -= datetime.timedelta(days=1)
+    return str(date.month) + "/" + str(date.day) + "/" + str(date.year)
+
+def _parse_dates(date_col):
+    """
+    Returns the dates of a column of "MM/DD/YYYY" strings (without zero padding,
+    like the ones made by _change_date()) as a numpy array of datetimes.
+    """
+    return pandas.to_datetime(date_col, format="%m/%d/%Y").to_numpy()
 
 def _change_date(date):
     """
@@ -264,6 +389,20 @@ def _assertion_coach_mentions_glob(global_ID, agg_rost_ment_file, roster_file,
     assertions.assert_result(result)
     assertions.assert_team(team)
 
+def _assertion_resolve_game_results(game_thread_info_file, result_file, team_str,
+    team, global_ID_list, thread_index, post_game_only):
+    """ Function to test assertions for resolve_game_results(). """
+    if thread_index is None:
+        assertions.assert_game_thread_info_file_format(game_thread_info_file)
+        assert not post_game_only, "post_game_only needs a thread index."
+    else:
+        assertions.assert_thread_index(thread_index)
+    assertions.assert_season_result_file_format(result_file)
+    assertions.assert_team(team_str)
+    assertions.assert_team(team)
+    if global_ID_list is not None:
+        assertions.assert_int_list(global_ID_list)
+
 def _assertion_win_or_lose(game_thread_info_file, result_file, team_str,
     global_ID, team):
     """ Function to test assertions for win_or_lose(). """
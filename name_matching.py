@@ -5,6 +5,10 @@ Knicks roster.
 Creator: Sebastian Guo
 """
 import extraction_v2, assertions
+import roster as roster_module
+import comment_store
+import mention_index
+import type_policy
 import pandas, numpy, csv
 
 def find_roster_names(roster_file):
@@ -14,15 +18,11 @@ def find_roster_names(roster_file):
     returns a FormatError.
 
     Parameter roster_file: a reader object that contains information about players.
-    Precondition: must be a DataFrame object created by the pandas module. It must
-    contain the column "Player".
+    Precondition: must be a DataFrame object created by the pandas module or a
+    Roster object. It must contain the column "Player".
     """
     assertions.assert_roster_file_format(roster_file)
-    players = roster_file["Player"]
-    lst = []
-    for index in range(roster_file.shape[0]):
-        lst.append(players[index])
-    return lst
+    return list(roster_module.as_roster(roster_file).player_list)
 
 def roster_mentions(cmt_data_list, roster_file, roster_list, team):
     """
@@ -54,6 +54,7 @@ def roster_mentions(cmt_data_list, roster_file, roster_list, team):
     Precondition: team is of type string
     """
     _assertion_roster_mentions(cmt_data_list, roster_file, roster_list, team)
+    roster = roster_module.as_roster(roster_file)
     tot_ment = {"named entity": [], "category": [], "mentions": []}
     for lst in cmt_data_list:
         if len(lst) == 4 and (lst[2] not in tot_ment["named entity"]):
@@ -66,19 +67,20 @@ def roster_mentions(cmt_data_list, roster_file, roster_list, team):
             index = tot_ment["named entity"].index(lst[2])
             tot_ment["mentions"][index] += 1
     length = len(tot_ment["named entity"])
-    for player in roster_list:
-        tot_ment[player] = [""] * length
+    tot_ment.update(type_policy.new_flags(length, roster_list))
     for index in range(length): # Match named entities to players
-        name = _match_roster(roster_file, tot_ment["named entity"][index])
+        name = _match_roster(roster, tot_ment["named entity"][index])
         if name != "":
             tot_ment[name][index] = 1
-    df = pandas.DataFrame(tot_ment)
+    df = type_policy.apply_types(pandas.DataFrame(tot_ment))
     df.to_csv(r'/home/sebastianguo/Documents/Research/Teams/' + team +
         '/agg_roster_mentions.csv', index=False)
 
-def roster_mentions_glob(global_ID, rost_ment_file, roster_file, roster_list, team):
+def roster_mentions_glob(global_ID, rost_ment_file, roster_file, roster_list, team,
+    write=True):
     """
-    Creates a csv file based off an inputted list cmt_data_list. The outputted
+    Creates and returns a DataFrame based off an inputted list cmt_data_list and
+    saves it as a csv file. The outputted
     csv files contains, for a certain thread/game, the total mentions of each named
     entity and the player that corresponds to the named entity in roster_list.
     This function is similar to roster_mentions(), except it sorts the csv files
@@ -100,8 +102,12 @@ def roster_mentions_glob(global_ID, rost_ment_file, roster_file, roster_list, te
 
     Parameter team: the basketball team the code is run on.
     Precondition: team is of type string
+
+    Parameter write: whether or not to save the DataFrame as a csv file.
+    Precondition: must be a boolean.
     """
     _assertion_roster_mentions_glob(global_ID, rost_ment_file, roster_file, roster_list, team)
+    roster = roster_module.as_roster(roster_file)
 
     name = rost_ment_file["name"]
     cat = rost_ment_file["category"]
@@ -118,19 +124,21 @@ def roster_mentions_glob(global_ID, rost_ment_file, roster_file, roster_list, te
             tot_ment["mentions"][place] += 1
 
     length = len(tot_ment["named entity"])
-    for player in roster_list:
-        tot_ment[player] = [""] * length
+    tot_ment.update(type_policy.new_flags(length, roster_list))
     for number in range(length): # Match named entities to players
-        name = _match_roster(roster_file, tot_ment["named entity"][number])
+        name = _match_roster(roster, tot_ment["named entity"][number])
         if name != "":
             tot_ment[name][number] = 1
-    df = pandas.DataFrame(tot_ment)
-    df.to_csv(r'/home/sebastianguo/Documents/Research/Teams/' + team +
-        '/agg_roster_mentions_by_game/' + str(global_ID) + '.csv', index=False)
-
-def comment_roster(raw_data_file, roster_file, roster_list, cmt_data_list, team):
+    df = type_policy.apply_types(pandas.DataFrame(tot_ment))
+    if write:
+        df.to_csv(r'/home/sebastianguo/Documents/Research/Teams/' +
+            team + '/agg_roster_mentions_by_game/' + str(global_ID) + '.csv', index=False)
+    return df
+
+def comment_roster(raw_data_file, roster_file, roster_list, cmt_data_list, team,
+    write=True, store=None):
     """
-    Create a csv file that contains individual comments and their unique global
+    Create and return a csv file that contains individual comments and their unique global
     and local identifiers, plus columns that mark whether or not the comment
     has a mention of a player on the New York Knicks.
 
@@ -143,7 +151,8 @@ def comment_roster(raw_data_file, roster_file, roster_list, cmt_data_list, team)
 
     Parameter raw_data_file: the file that contains the raw scrapped data.
     Precondition: must be a reader object from the pandas module. It must contain
-    the three column headers global_ID, local_ID and comment.
+    the three column headers global_ID, local_ID and comment, or only global_ID
+    and local_ID if store is given.
 
     Parameter roster_file: a reader object that contains information about player
     names and nicknames.
@@ -159,30 +168,53 @@ def comment_roster(raw_data_file, roster_file, roster_list, cmt_data_list, team)
 
     Parameter team: the basketball team the code is run on.
     Precondition: team is of type string
+
+    Parameter write: whether or not to save the DataFrame as a csv file, and the
+    mention index of its flags (see module mention_index).
+    Precondition: must be a boolean.
+
+    Parameter store: if given, the comment text is not copied into the DataFrame;
+    it gets a column "comment_ID" with the comment ID of every comment in store
+    instead of the column "comment" (see comment_store.with_text()).
+    Precondition: must be None or a comment store from module comment_store.
     """
-    _assertion_comment_roster(raw_data_file, roster_file, roster_list, cmt_data_list, team)
+    _assertion_comment_roster(raw_data_file, roster_file, roster_list, cmt_data_list,
+        team, store)
+    roster = roster_module.as_roster(roster_file)
     agg_dict = {}
     agg_dict["global_ID"] = raw_data_file["global_ID"]
     agg_dict["local_ID"] = raw_data_file["local_ID"]
-    agg_dict["comment"] = raw_data_file["comment"]
+    if store is None:
+        agg_dict["comment"] = raw_data_file["comment"]
+    else:
+        agg_dict["comment_ID"] = comment_store.comment_ids(store,
+            raw_data_file["global_ID"], raw_data_file["local_ID"])
     length = len(raw_data_file["global_ID"])
-    for player in roster_list:
-        agg_dict[player] = [""] * length
+    agg_dict.update(type_policy.new_flags(length, roster_list))
 
+    # The named entities are grouped by comment once instead of being scanned
+    # again for every comment.
+    names_by_comment = _roster_names_by_comment(roster, cmt_data_list)
     for index in range(len(agg_dict["global_ID"])): # Find named entities for a comment.
-        agg_dict = _add_roster_mentions(agg_dict, roster_file, index,
-            agg_dict["global_ID"][index], agg_dict["local_ID"][index], cmt_data_list)
-    df = pandas.DataFrame(agg_dict)
-    df.to_csv(r'/home/sebastianguo/Documents/Research/Teams/' + team +
-        '/cmt_lvl_roster_mentions.csv', index=False)
-
-def comment_roster_glob(cmt_lvl_ment_file, roster_list, global_ID, team):
+        agg_dict = _add_roster_mentions(agg_dict, index, names_by_comment.get(
+            (agg_dict["global_ID"][index], agg_dict["local_ID"][index]), []))
+    df = type_policy.apply_types(pandas.DataFrame(agg_dict))
+    if write:
+        df.to_csv(r'/home/sebastianguo/Documents/Research/Teams/' + team +
+            '/cmt_lvl_roster_mentions.csv', index=False)
+        mention_index.save_mention_index(mention_index.build_mention_index(df,
+            roster_list), mention_index.mention_index_path(team))
+    return df
+
+def comment_roster_glob(cmt_lvl_ment_file, roster_list, global_ID, team,
+    write=True):
     """
     A function to create separate csv files sorted by global ID or different games.
+    It returns the DataFrame saved to the csv file.
     Each csv file contains information similar to the csv file created by
     commentPlayers with comments and a matrix showing whether the comment contains
     a mention of a player name. The format of cmt_lvl_ment_file should contain the headers
-    "global_ID", "local_ID", "comment", and the players from roster_list. The
+    "global_ID", "local_ID", "comment" (or "comment_ID"), and the players from roster_list. The
     function nameMatching.commentPlayers should ensure that these headers exist.
 
     Paramter cmt_lvl_ment_file: a file created by comment_roster().
@@ -197,92 +229,56 @@ def comment_roster_glob(cmt_lvl_ment_file, roster_list, global_ID, team):
 
     Parameter team: the basketball team the code is run on.
     Precondition: team is of type string
-    """
-    _assertion_comment_roster_glob(cmt_lvl_ment_file, roster_list, global_ID, team)
-    agg_dict = {"global_ID":[], "local_ID":[], "comment":[]}
-    glob = cmt_lvl_ment_file["global_ID"]
-    loc = cmt_lvl_ment_file["local_ID"]
-    comm = cmt_lvl_ment_file["comment"]
-    player_matrix = _create_matrix(numpy.empty((0, len(cmt_lvl_ment_file)), int), cmt_lvl_ment_file, roster_list)
-
-    index_list = []
-    for index in range(cmt_lvl_ment_file.shape[0]):
-        if glob[index] == global_ID:
-            agg_dict["global_ID"].append(glob[index])
-            agg_dict["local_ID"].append(loc[index])
-            agg_dict["comment"].append(comm[index])
-            index_list.append(index)
-    for column_ind in range(len(player_matrix)):
-        agg_dict[roster_list[column_ind]] = []
-        for row_ind in index_list:
-            agg_dict[roster_list[column_ind]].append(player_matrix[column_ind][row_ind])
-    df = pandas.DataFrame(agg_dict)
-    df.to_csv(r'/home/sebastianguo/Documents/Research/Teams/' + team +
-        '/cmt_lvl_roster_mentions_by_game/' + str(global_ID) + ".csv", index=False)
 
-def _create_matrix(matrix, cmt_lvl_ment_file, roster_list):
-    """
-    Create a two-dimensional matrix to represent whether or not a table of
-    comments contain mentions of certain players in them. A "1" means that the
-    comment does have a mention and a "0" means the comment doesn't. The matrix
-    is in column major order.
+    Parameter write: whether or not to save the DataFrame as a csv file.
+    Precondition: must be a boolean.
     """
-    for player in roster_list:
-        matrix = numpy.append(matrix, [cmt_lvl_ment_file[player]], axis=0)
-    return matrix
-
-def _match_roster(roster_file, named_entity):
+    _assertion_comment_roster_glob(cmt_lvl_ment_file, roster_list, global_ID, team)
+    rows = (cmt_lvl_ment_file["global_ID"] == global_ID).to_numpy()
+    text_column = "comment" if "comment" in cmt_lvl_ment_file.columns else "comment_ID"
+    df = cmt_lvl_ment_file.loc[rows, ["global_ID", "local_ID", text_column]].reset_index(drop=True)
+    player_matrix = numpy.array([cmt_lvl_ment_file[player].to_numpy()[rows]
+        for player in roster_list]).reshape(len(roster_list), int(rows.sum()))
+    for column_ind in range(len(roster_list)):
+        df[roster_list[column_ind]] = player_matrix[column_ind]
+    # Tables read back from older csv files have 1.0 and missing values as flags.
+    df = type_policy.apply_types(df, roster_list)
+    if write:
+        df.to_csv(r'/home/sebastianguo/Documents/Research/Teams/' +
+            team + '/cmt_lvl_roster_mentions_by_game/' + str(global_ID) + ".csv", index=False)
+    return df
+
+def _match_roster(roster, named_entity):
     """
     Returns, if any, the player that the nameEntity refers to in a csvfile.
     containing columns with full names, first and last names, and their
     associated nicknames. If there is no mention of a player that is associated
     with named_entity, return an empty string.
+
+    roster is a Roster object, whose indexes of first, last and full names and
+    of shortened names and nicknames replace a scan over the roster file.
     """
-    try:
-        full_names = roster_file["Player"]
-        first = roster_file["First"]
-        last = roster_file["Last"]
-        f_short = roster_file["First Short"]
-        l_short = roster_file["Last Short"]
-        nicknames = roster_file["Nicknames"]
-    except:
-        raise commentData.FormatError("The csv file does not contain the correct headers.")
-
-    player = ""
-    for index in range(roster_file.shape[0]):
-        name_list = []
-        if not pandas.isnull(f_short[index]):
-            name_list += f_short[index].split(",")
-        if not pandas.isnull(l_short[index]):
-            name_list += l_short[index].split(",")
-        if not pandas.isnull(nicknames[index]):
-            name_list += nicknames[index].split(",")
-        for term in name_list:
-            if named_entity == term:
-                player = full_names[index]
-                break
-        if not pandas.isnull(first[index]) and named_entity == first[index]:
-            player = full_names[index]
-            break
-        elif not pandas.isnull(last[index]) and named_entity == last[index]:
-            player = full_names[index]
-            break
-        elif named_entity == full_names[index]:
-            player = full_names[index]
-            break
-    return player
-
-def _add_roster_mentions(agg_dict, roster_file, index, global_ID, local_ID, cmt_data_list):
+    return roster.match(named_entity)
+
+def _roster_names_by_comment(roster, cmt_data_list):
     """
-    Add to the agg_dict any player mentions.
+    Returns a dictionary from the (global ID, local ID) of every comment with
+    named entities in cmt_data_list to the players they refer to.
     """
+    names_by_comment = {}
     for entity in cmt_data_list:
-        name = ''
-        if len(entity) == 4 and entity[0] == global_ID and entity[1] == local_ID:
-            name = _match_roster(roster_file, entity[2])
-        if name != '':
-            for key in agg_dict:
-                agg_dict[name][index] = "1"
+        if len(entity) == 4:
+            name = _match_roster(roster, entity[2])
+            if name != '':
+                names_by_comment.setdefault((entity[0], entity[1]), []).append(name)
+    return names_by_comment
+
+def _add_roster_mentions(agg_dict, index, names):
+    """
+    Add to the agg_dict the player mentions names of the comment at index.
+    """
+    for name in names:
+        agg_dict[name][index] = 1
     return agg_dict
 
 def _assertion_roster_mentions(cmt_data_list, roster_file, roster_list, team):
@@ -295,11 +291,11 @@ def _assertion_roster_mentions(cmt_data_list, roster_file, roster_list, team):
     assertions.assert_team(team)
 
 def _assertion_comment_roster(raw_data_file, roster_file, roster_list,
-    cmt_data_list, team):
+    cmt_data_list, team, store=None):
     """
     Function to test assertions for function comment_roster().
     """
-    assertions.assert_raw_data_file_format(raw_data_file)
+    assertions.assert_raw_data_file_format(raw_data_file, store is None)
     assertions.assert_roster_file_format(roster_file)
     assertions.assert_str_list(roster_list)
     assertions.assert_cmt_data_list(cmt_data_list)
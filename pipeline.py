@@ -0,0 +1,823 @@
+"""
+Module with the stage runner of the research pipeline. The stages and their
+dependencies are declared in STAGES:
+
+    raw -> extraction -> roster_mentions
+                      -> comment_matrix -> per_game -> sentiment -> mgmt_stats
+                                        -> prec_rec
+    raw -> game_results -> sentiment
+    raw -> text_index
+
+Every stage has a fingerprint made from the hashes of its input files, the
+source code of the modules it runs, its parameters and the fingerprints of the
+stages it depends on. The fingerprints of the last run are kept in a manifest
+(Teams/<team>/pipeline_manifest.json). A stage is skipped when its fingerprint
+is unchanged and its output files exist; a later stage that needs its results
+then loads them from those files. Rerunning only the last stage therefore does
+not pay for the stages before it.
+
+Run the pipeline with
+    python pipeline.py --teams 76ers --stages mgmt_stats
+which runs mgmt_stats and every stage it depends on that changed since the
+last run. "format_results" is not part of the graph and only runs when
+selected, since it rewrites its own input file.
+
+With --profile, every stage and game is measured (see profiling.py).
+With --workers N, the teams run in a pool of N processes (see run_teams()).
+
+Creator: Sebastian Guo
+"""
+import argparse, ast, concurrent.futures, gc, hashlib, json, multiprocessing, os, pickle
+import sys, time, traceback
+import numpy
+import pandas
+import name_matching, mgmt_matching
+import extraction_v2
+import mgmt_analysis
+import token_cache
+import thread_index
+import roster
+import fact_table
+import season_state
+import profiling
+import write_behind
+import raw_cache
+import comment_store
+import type_policy
+import text_index
+
+RESEARCH_PATH = "/home/sebastianguo/Documents/Research/"
+DEFAULT_TARGETS = ["mgmt_stats"]
+# League-wide data read once by load_shared_data() and used by every team
+# instead of being read again per team. The worker processes of run_teams()
+# inherit it from the parent process.
+_SHARED = {}
+
+def load_shared_data():
+    """
+    Reads teams.csv, the game thread csv and its thread index into _SHARED. The
+    stages never modify them.
+    """
+    glob_ID_path = RESEARCH_PATH + "misc_data/game_thread_urls_2020_enhanced.csv"
+    team_reader = raw_cache.read_table(RESEARCH_PATH + "misc_data/teams.csv")
+    _SHARED["team_reader"] = team_reader
+    _SHARED["glob_ID_reader"] = pandas.read_csv(glob_ID_path)
+    _SHARED["thread_index"] = thread_index.load_thread_index(glob_ID_path, team_reader)
+
+def _team_path(team, name=""):
+    """ Returns the path of a file in the folder of a team. """
+    return RESEARCH_PATH + "Teams/" + team + "/" + name
+
+def _raw_inputs(team):
+    """ Returns the input files of stage raw. """
+    return [_team_path(team, "csv_data/regseason_postgame_2020_" + team + "_.csv"),
+        _team_path(team, "csv_data/roster.csv"), RESEARCH_PATH + "misc_data/teams.csv",
+        _team_path(team, "csv_data/word_removal.csv")]
+
+def _by_game_outputs(folders):
+    """ Returns a function listing the per-game files of the folders for a context. """
+    return lambda ctx: [_team_path(ctx["team"], folder + "/" + str(global_ID) + ".csv")
+        for folder in folders for global_ID in ctx["glob_ID_list"]]
+
+def _run_raw(ctx):
+    """ Reads the raw comments, the roster, the teams and the words to remove. """
+    raw_path, roster_path, team_path, word_path = _raw_inputs(ctx["team"])
+    # The raw scrape and the small files are read from their binary caches,
+    # which are rebuilt when the csv files change (see raw_cache.py).
+    # The tables get the column types of type_policy.py as they are loaded.
+    # The comments are kept memory-mapped in the comment store and the mention
+    # tables refer to them by comment ID (see comment_store.py), so the raw
+    # table only has the ID columns. The extraction and the sentiment stage
+    # read the text they need through the comment store.
+    ctx["comment_store"] = comment_store.open_comment_store(raw_path)
+    ctx["raw_data_reader"] = type_policy.apply_types(pandas.DataFrame({
+        "global_ID": numpy.array(ctx["comment_store"]["global_ID"]),
+        "local_ID": numpy.array(ctx["comment_store"]["local_ID"])}))
+    ctx["roster_reader"] = roster.Roster(type_policy.apply_types(
+        raw_cache.read_table(roster_path)))
+    ctx["team_reader"] = _SHARED["team_reader"] if "team_reader" in _SHARED \
+        else raw_cache.read_table(team_path)
+    ctx["word_file_reader"] = raw_cache.read_table(word_path)
+    # The global IDs in order of appearance, as extraction_v2.get_global_ID() finds them.
+    ctx["glob_ID_list"] = pandas.unique(ctx["raw_data_reader"]["global_ID"]).tolist()
+    ctx["roster_list"] = name_matching.find_roster_names(ctx["roster_reader"])
+    ctx["mgmt_list"] = mgmt_matching.find_management(ctx["roster_reader"])
+
+def _run_format_results(ctx):
+    """ Reformats the season results of the team (see mgmt_matching.format_data()). """
+    raw_result_reader = pandas.read_csv(_team_path(ctx["team"], "csv_data/2019-2020_scores.csv"))
+    mgmt_matching.format_data(raw_result_reader, ctx["team_reader"], ctx["team"])
+
+def _run_extraction(ctx):
+    """ Extracts the named entities of every comment and saves them. """
+    ctx["cmt_data_list"] = extraction_v2.extract_col_data(ctx["raw_data_reader"],
+        ctx["roster_reader"], ctx["word_file_reader"], ctx["team"],
+        store=ctx["comment_store"])
+    with open(_team_path(ctx["team"], "cmt_data_list.pkl"), "wb") as cmt_data_file:
+        pickle.dump(ctx["cmt_data_list"], cmt_data_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+def _load_extraction(ctx):
+    """ Loads the named entities saved by _run_extraction(). """
+    with open(_team_path(ctx["team"], "cmt_data_list.pkl"), "rb") as cmt_data_file:
+        ctx["cmt_data_list"] = pickle.load(cmt_data_file)
+
+def _run_roster_mentions(ctx):
+    """ Writes agg_roster_mentions.csv. """
+    name_matching.roster_mentions(ctx["cmt_data_list"], ctx["roster_reader"],
+        ctx["roster_list"], ctx["team"])
+
+def _run_comment_matrix(ctx):
+    """
+    Writes cmt_lvl_roster_mentions.csv, with comment IDs instead of the text, and
+    its mention index (see mention_index.py), and reads it back.
+    """
+    name_matching.comment_roster(ctx["raw_data_reader"], ctx["roster_reader"],
+        ctx["roster_list"], ctx["cmt_data_list"], ctx["team"], store=ctx["comment_store"])
+    _load_comment_matrix(ctx)
+
+def _load_comment_matrix(ctx):
+    """ Reads cmt_lvl_roster_mentions.csv. """
+    ctx["cmt_lvl_ment_reader"] = type_policy.apply_types(pandas.read_csv(
+        _team_path(ctx["team"], "cmt_lvl_roster_mentions.csv")), ctx["roster_list"])
+
+def _run_game_results(ctx):
+    """ Resolves the result of the game of every thread and saves them. """
+    glob_ID_path, result_path, _ = _game_result_inputs(ctx["team"])
+    team_str = mgmt_matching.make_team_str(ctx["team_reader"], ctx["team"])
+    if "thread_index" in _SHARED:
+        glob_ID_reader, game_thread_index = _SHARED["glob_ID_reader"], _SHARED["thread_index"]
+    else:
+        glob_ID_reader = pandas.read_csv(glob_ID_path)
+        game_thread_index = thread_index.load_thread_index(glob_ID_path, ctx["team_reader"])
+    ctx["game_results"] = mgmt_matching.resolve_game_results(glob_ID_reader,
+        pandas.read_csv(result_path), team_str, ctx["team"], ctx["glob_ID_list"],
+        game_thread_index, **STAGES["game_results"]["params"])
+    ctx["game_results"].to_pickle(_team_path(ctx["team"], "game_results.pkl"))
+
+def _load_game_results(ctx):
+    """ Loads the game results saved by _run_game_results(). """
+    ctx["game_results"] = pandas.read_pickle(_team_path(ctx["team"], "game_results.pkl"))
+
+def _game_result_inputs(team):
+    """ Returns the input files of stage game_results. """
+    return [RESEARCH_PATH + "misc_data/game_thread_urls_2020_enhanced.csv",
+        _team_path(team, "csv_data/2019-2020_scores.csv"), RESEARCH_PATH + "misc_data/teams.csv"]
+
+def _run_per_game(ctx):
+    """ Splits the mentions and comments by global ID and writes them. """
+    with write_behind.WriteBehind() as writer:
+        ctx["by_game"] = split_by_game(ctx["glob_ID_list"], ctx["roster_list"],
+            ctx["cmt_data_list"], ctx["team"], ctx["roster_reader"],
+            ctx["cmt_lvl_ment_reader"], writer)
+
+def _load_per_game(ctx):
+    """ Reads the per-game files written by _run_per_game(). """
+    ctx["by_game"] = {}
+    for global_ID in ctx["glob_ID_list"]:
+        ctx["by_game"][global_ID] = tuple(type_policy.apply_types(pandas.read_csv(
+            _team_path(ctx["team"], folder + "/" + str(global_ID) + ".csv")),
+            [] if folder == "roster_mentions_by_game" else ctx["roster_list"])
+            for folder in BY_GAME_FOLDERS)
+
+def _run_sentiment(ctx):
+    """
+    Finds the comment sentiment and the management mentions of the games that are
+    new or whose inputs changed since the last run, writes them to
+    mgmt_and_race_by_game and updates the fact table and the season state. The
+    games no longer in the data are removed from both. The key of the inputs of
+    every game is kept in sentiment_games.json; if it, the fact table or the
+    season state is missing, or the stage is forced, every game is scored again
+    from scratch. The "clean" tokens of the classified comments are kept in
+    token_cache.npz, so they are only made again for the games scored again.
+    """
+    team = ctx["team"]
+    facts_path = fact_table.fact_table_path(team)
+    state_path = season_state.season_state_path(team)
+    keys_path = _team_path(team, "sentiment_games.json")
+    old_keys = {}
+    if "sentiment" not in ctx["forced"] and \
+        all(os.path.exists(path) for path in [facts_path, state_path, keys_path]):
+        with open(keys_path) as keys_file:
+            old_keys = json.load(keys_file)
+    else:
+        for path in [facts_path, state_path]:
+            if os.path.exists(path):
+                os.remove(path)
+    state = season_state.load_season_state(state_path)
+    stage_key = _stage_code_key("sentiment", [ctx["roster_list"], ctx["mgmt_list"],
+        ctx["roster_reader"].frame.to_csv(index=False)])
+    keys = {str(global_ID): _game_key(stage_key, ctx["by_game"][global_ID],
+        ctx["game_results"], global_ID, ctx["comment_store"])
+        for global_ID in ctx["glob_ID_list"]}
+    removed = [int(global_ID) for global_ID in old_keys if global_ID not in keys]
+    if removed != []:
+        fact_table.remove_games(facts_path, removed)
+        for global_ID in removed:
+            season_state.remove_game(state, global_ID)
+    changed = [global_ID for global_ID in ctx["glob_ID_list"]
+        if old_keys.get(str(global_ID)) != keys[str(global_ID)]]
+    # The tokens depend on the text of the comments and on the tokenizer of
+    # sentiment_analysis.py, so they are kept only for the games not scored again.
+    tokens_path = _team_path(team, "token_cache.npz")
+    tokens = token_cache.load_token_cache(tokens_path,
+        _source_hash(["sentiment_analysis"])) if old_keys != {} else \
+        token_cache.new_token_cache(_source_hash(["sentiment_analysis"]))
+    token_cache.clear_games(tokens, removed + changed)
+    with write_behind.WriteBehind() as writer:
+        score_games(ctx["by_game"], changed, ctx["roster_list"],
+            ctx["mgmt_list"], team, ctx["roster_reader"], ctx["game_results"],
+            ctx["classifier"](), tokens, state, writer,
+            store=ctx["comment_store"], **STAGES["sentiment"]["params"])
+    token_cache.save_token_cache(tokens, tokens_path)
+    season_state.save_season_state(state, state_path)
+    # The keys are saved last, so the games of a run that stops early are scored again.
+    with open(keys_path + ".tmp", "w") as keys_file:
+        json.dump(keys, keys_file)
+    os.replace(keys_path + ".tmp", keys_path)
+
+def _stage_code_key(stage, extra):
+    """
+    Returns a hash of the source of the code of a stage (see _code_modules()),
+    its parameters and the JSON-serializable value extra.
+    """
+    digest = hashlib.sha256((stage + _source_hash(STAGES[stage]["code"])).encode())
+    digest.update(json.dumps([STAGES[stage]["params"], extra], sort_keys=True).encode())
+    return digest.hexdigest()
+
+def _source_hash(modules):
+    """
+    Returns a hash of the source of the modules and of every module of the
+    repository they import (see _code_modules()).
+    """
+    digest = hashlib.sha256()
+    for module in _code_modules(modules):
+        with open(_module_path(module), "rb") as source:
+            digest.update(module.encode() + source.read())
+    return digest.hexdigest()
+
+def _game_key(stage_key, game_frames, game_results, global_ID, store):
+    """
+    Returns a hash of the inputs of a game to the sentiment stage: stage_key,
+    the values of the per-game DataFrames of split_by_game(), the result and
+    date of the game and the text of its comments in store.
+    """
+    digest = hashlib.sha256(stage_key.encode())
+    # The row labels and comment IDs are positions in the whole season, which
+    # move when other games change, so only the values and the text are hashed.
+    for df in game_frames:
+        df = df.drop(columns=["comment_ID"], errors="ignore")
+        digest.update(",".join(df.columns).encode())
+        digest.update(pandas.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    digest.update((str(game_results["Result"][global_ID]) + "|" +
+        str(game_results["Game Date"][global_ID])).encode())
+    cmt_lvl_ment_by_game_reader = game_frames[2]
+    if "comment_ID" in cmt_lvl_ment_by_game_reader.columns:
+        for text in comment_store.texts(store,
+            cmt_lvl_ment_by_game_reader["comment_ID"].to_numpy()):
+            digest.update(str(text).encode() + b"\0")
+    return digest.hexdigest()
+
+def _run_mgmt_stats(ctx):
+    """ Writes mgmt_sentiment.csv and mgmt_mentions.csv. """
+    mgmt_analysis.calc_mgmt_stats(ctx["glob_ID_list"], ctx["mgmt_list"],
+        ctx["roster_reader"], ctx["team"], **STAGES["mgmt_stats"]["params"])
+
+def _run_prec_rec(ctx):
+    """ Writes precision_and_recall.csv from the hand coded sample. """
+    import hand_code_compare
+    hand_code_reader = pandas.read_csv(_team_path(ctx["team"], "csv_data/hand_code_sample.csv"))
+    hand_code_compare.compare_files(ctx["cmt_lvl_ment_reader"], hand_code_reader,
+        ctx["roster_list"], ctx["team"])
+
+def _run_text_index(ctx):
+    """ Indexes the new and changed threads of the team (see text_index.py). """
+    text_index.update_text_index(ctx["team"], ctx["comment_store"])
+
+def _no_load(ctx):
+    """ Stages whose results no later stage reads have nothing to load. """
+
+# The context entry whose length is the number of rows a stage makes.
+_ROWS_OUT = {"extraction": "cmt_data_list", "comment_matrix": "cmt_lvl_ment_reader",
+    "per_game": "by_game", "game_results": "game_results"}
+
+BY_GAME_FOLDERS = ["roster_mentions_by_game", "agg_roster_mentions_by_game",
+    "cmt_lvl_roster_mentions_by_game"]
+
+# Every stage has the keys:
+# "deps": the stages it needs, "inputs": function from team to its input files,
+# "code": the modules whose source, with the source of every module of the
+# repository they import, is part of its fingerprint, "params": the
+# keyword arguments it passes on, also part of its fingerprint, "outputs":
+# function from the context to its output files, "run" and "load": functions
+# that run the stage or load its results into the context, "cached": whether it
+# can be skipped.
+STAGES = {
+    "raw": {"deps": [], "inputs": _raw_inputs,
+        "code": ["raw_cache", "type_policy", "roster", "comment_store"], "params": {},
+        "outputs": lambda ctx: [], "run": _run_raw, "load": _run_raw, "cached": False},
+    "format_results": {"deps": ["raw"], "inputs": lambda team: [], "code": [], "params": {},
+        "outputs": lambda ctx: [], "run": _run_format_results, "load": _no_load,
+        "cached": False},
+    "extraction": {"deps": ["raw"], "inputs": lambda team: [],
+        "code": ["extraction_v2"], "params": {},
+        "outputs": lambda ctx: [_team_path(ctx["team"], "cmt_data_list.pkl")],
+        "run": _run_extraction, "load": _load_extraction, "cached": True},
+    "roster_mentions": {"deps": ["raw", "extraction"], "inputs": lambda team: [],
+        "code": ["name_matching"], "params": {},
+        "outputs": lambda ctx: [_team_path(ctx["team"], "agg_roster_mentions.csv")],
+        "run": _run_roster_mentions, "load": _no_load, "cached": True},
+    "comment_matrix": {"deps": ["raw", "extraction"], "inputs": lambda team: [],
+        "code": ["name_matching", "comment_store", "mention_index"], "params": {},
+        "outputs": lambda ctx: [_team_path(ctx["team"], "cmt_lvl_roster_mentions.csv"),
+        _team_path(ctx["team"], "mention_index.npz")],
+        "run": _run_comment_matrix, "load": _load_comment_matrix, "cached": True},
+    "per_game": {"deps": ["raw", "extraction", "comment_matrix"], "inputs": lambda team: [],
+        "code": ["extraction_v2", "name_matching"], "params": {},
+        "outputs": _by_game_outputs(BY_GAME_FOLDERS),
+        "run": _run_per_game, "load": _load_per_game, "cached": True},
+    "game_results": {"deps": ["raw"], "inputs": _game_result_inputs,
+        "code": ["mgmt_matching", "thread_index"], "params": {"post_game_only": False},
+        "outputs": lambda ctx: [_team_path(ctx["team"], "game_results.pkl")],
+        "run": _run_game_results, "load": _load_game_results, "cached": True},
+    "sentiment": {"deps": ["raw", "extraction", "per_game", "game_results"],
+        "inputs": lambda team: [], "code": ["sentiment_analysis", "sentiment_server",
+        "mgmt_matching", "fact_table", "season_state", "token_cache"], "params": {"pos_cutoff": 0.5, "neg_cutoff": 0.5},
+        "outputs": lambda ctx: _by_game_outputs(["mgmt_and_race_by_game"])(ctx) +
+        [fact_table.fact_table_path(ctx["team"]), season_state.season_state_path(ctx["team"]),
+        _team_path(ctx["team"], "sentiment_games.json"), _team_path(ctx["team"], "token_cache.npz")],
+        "run": _run_sentiment, "load": _no_load, "cached": True},
+    "mgmt_stats": {"deps": ["raw", "sentiment"], "inputs": lambda team: [],
+        "code": ["mgmt_analysis", "group_stats", "fact_table"],
+        "params": {"bootstrap_samples": 2000, "confidence": 0.95, "seed": 0},
+        "outputs": lambda ctx: [_team_path(ctx["team"], "mgmt_sentiment.csv"),
+        _team_path(ctx["team"], "mgmt_mentions.csv")],
+        "run": _run_mgmt_stats, "load": _no_load, "cached": True},
+    "prec_rec": {"deps": ["raw", "comment_matrix"],
+        "inputs": lambda team: [_team_path(team, "csv_data/hand_code_sample.csv")],
+        "code": ["hand_code_compare"], "params": {},
+        "outputs": lambda ctx: [_team_path(ctx["team"], "precision_and_recall.csv")],
+        "run": _run_prec_rec, "load": _no_load, "cached": True},
+    "text_index": {"deps": ["raw"], "inputs": lambda team: [],
+        "code": ["text_index", "extraction_v2"], "params": {},
+        "outputs": lambda ctx: [text_index.text_index_dir(ctx["team"]) + "/meta.json"],
+        "run": _run_text_index, "load": _no_load, "cached": True},
+}
+
+def split_by_game(glob_ID_list, roster_list, cmt_data_list, team, roster_reader,
+    cmt_lvl_ment_reader, writer=None):
+    """
+    Returns a dictionary from every global ID to a tuple with the DataFrames of
+    create_data_frame(), roster_mentions_glob() and comment_roster_glob() for
+    that game. If writer is given, the DataFrames are also written to the
+    folders in BY_GAME_FOLDERS in the background while the next games run.
+
+    Parameter glob_ID_list: the global IDs of the games.
+    Precondition: must be a list of integers.
+
+    Parameter roster_list, cmt_data_list, roster_reader, cmt_lvl_ment_reader:
+    the roster names, the named entities of extract_col_data(), the roster and
+    the table of comment_roster() of the team.
+
+    Parameter team: the basketball team the code is run on.
+    Precondition: must be a string.
+
+    Parameter writer: the output layer that writes the csv files.
+    Precondition: must be None or a write_behind.WriteBehind.
+    """
+    by_game = {}
+    for term in glob_ID_list:
+        with profiling.measure("per_game", team, term) as record:
+            rost_ment_reader = extraction_v2.create_data_frame(term, cmt_data_list,
+                team, False)
+            agg_rost_ment_reader = name_matching.roster_mentions_glob(term,
+                rost_ment_reader, roster_reader, roster_list, team, False)
+            cmt_lvl_ment_by_game_reader = name_matching.comment_roster_glob(
+                cmt_lvl_ment_reader, roster_list, term, team, False)
+            by_game[term] = (rost_ment_reader, agg_rost_ment_reader,
+                cmt_lvl_ment_by_game_reader)
+            if writer is not None:
+                for folder, df in zip(BY_GAME_FOLDERS, by_game[term]):
+                    persist_by_game(writer, df, team, folder, term)
+            record["rows_in"] = len(cmt_lvl_ment_by_game_reader)
+            record["rows_out"] = len(rost_ment_reader)
+    return by_game
+
+def score_games(by_game, glob_ID_list, roster_list, mgmt_list, team, roster_reader,
+    game_results, classifier, tokens, state, writer, pos_cutoff=0.5,
+    neg_cutoff=0.5, store=None):
+    """
+    Finds the sentiment of the comments mentioning management and the management
+    mentions of every game. For every game, the comment probabilities are saved
+    in mgmt_sentiment_probs_by_game, the DataFrame of coach_mentions_glob() is
+    written to mgmt_and_race_by_game by writer, its rows are appended to the
+    fact table, and the season state is updated.
+
+    Parameter by_game: the per-game DataFrames from split_by_game().
+    Precondition: must be a dictionary with a tuple for every global ID.
+
+    Parameter game_results: the DataFrame of mgmt_matching.resolve_game_results().
+    Precondition: must contain every global ID in glob_ID_list.
+
+    Parameter state: the season state to update.
+    Precondition: must be a season state from module season_state.
+
+    Parameter writer: the output layer that writes the files in the background.
+    Precondition: must be a write_behind.WriteBehind.
+
+    Parameter pos_cutoff, neg_cutoff: the cutoffs of mgmt_matching.coach_mentions_glob().
+    Precondition: must be numbers between 0 and 1 with neg_cutoff <= pos_cutoff.
+
+    Parameter store: the comment store of the "comment_ID" column of the
+    comment level mentions, if they have no "comment" column.
+    Precondition: must be None or a comment store from module comment_store.
+
+    Parameter mgmt_list: the managers of the team.
+    Precondition: must be a list of strings.
+
+    Parameter classifier, tokens: the classifier of sentiment_analysis (or the
+    socket path of a sentiment_server.py) and the token cache of the sentiment
+    stage, or None.
+
+    The other parameters are those of split_by_game().
+    """
+    import sentiment_analysis
+    for term in glob_ID_list:
+        rost_ment_reader, agg_rost_ment_reader, cmt_lvl_ment_by_game_reader = by_game[term]
+        with profiling.measure("sentiment", team, term,
+            len(cmt_lvl_ment_by_game_reader)) as record:
+            result = game_results["Result"][term]
+            sent_dict = sentiment_analysis.manager_cmt_sentiment(classifier,
+                cmt_lvl_ment_by_game_reader, term, roster_list, mgmt_list, team, tokens,
+                _team_path(team, "mgmt_sentiment_probs_by_game/" + str(term) + ".npz"),
+                store)
+            mgmt_race_df = mgmt_matching.coach_mentions_glob(term, agg_rost_ment_reader,
+                roster_reader, mgmt_list, sent_dict, result, team, pos_cutoff, neg_cutoff,
+                write=False)
+            persist_by_game(writer, mgmt_race_df, team, "mgmt_and_race_by_game", term)
+            facts = fact_table.game_facts(team, term, game_results["Game Date"][term],
+                result, mgmt_race_df)
+            writer.submit(fact_table.append_facts, facts, fact_table.fact_table_path(team),
+                key=fact_table.fact_table_path(team))
+            season_state.update_season_state(state, facts)
+            record["rows_out"] = len(facts)
+
+def persist_by_game(writer, df, team, folder, global_ID):
+    """
+    Submits the csv write of a per-game DataFrame to writer. Errors are raised
+    by the next submit or by writer.flush().
+    """
+    writer.submit(df.to_csv, _team_path(team, folder + "/" + str(global_ID) + ".csv"),
+        index=False)
+
+def run_pipeline(team, targets=DEFAULT_TARGETS, classifier=None, force=False):
+    """
+    Runs the stages in targets for a team, with every stage they depend on, and
+    skips the stages whose fingerprint is the same as in the last run. Returns a
+    dictionary from every stage considered to "ran" or "skipped".
+
+    Parameter team: the basketball team the stages run on.
+    Precondition: must be a string.
+
+    Parameter targets: the stages to bring up to date.
+    Precondition: must be a list with keys of STAGES.
+
+    Parameter classifier: a trained model to analyze sentiment, the socket path
+    of a sentiment_server.py, or None to train a classifier only if stage
+    sentiment has to run.
+    Precondition: must be None, a string or a Naive Bayes Classifier object.
+
+    Parameter force: whether to run the stages in targets even if they are
+    unchanged (the stages they depend on are still skipped if unchanged).
+    Precondition: must be a boolean.
+    """
+    for stage in targets:
+        assert stage in STAGES, repr(stage) + " is not a stage."
+    print("Team: " + team)
+    manifest_path = _team_path(team, "pipeline_manifest.json")
+    manifest = _load_manifest(manifest_path)
+    ctx = {"team": team, "classifier": _classifier_provider(classifier),
+        "forced": targets if force else []}
+    order = _stage_order(targets)
+    status = {}
+    loaded = set()
+    fingerprints = {}
+    for stage in order:
+        spec = STAGES[stage]
+        fingerprints[stage] = _fingerprint(stage, team, fingerprints, manifest)
+        if stage == "raw":
+            with profiling.measure(stage, team) as record:
+                _run_raw(ctx)
+                record["rows_out"] = len(ctx["raw_data_reader"])
+            loaded.add(stage)
+            continue
+        unchanged = spec["cached"] and not (force and stage in targets) and \
+            manifest["stages"].get(stage) == fingerprints[stage] and \
+            all(os.path.exists(path) for path in spec["outputs"](ctx))
+        if unchanged:
+            status[stage] = "skipped"
+            continue
+        for dep in _all_deps(stage):
+            if dep not in loaded:
+                with profiling.measure(dep + " (load)", team):
+                    STAGES[dep]["load"](ctx)
+                loaded.add(dep)
+        with profiling.measure(stage, team, rows_in=len(ctx["raw_data_reader"])) as record:
+            spec["run"](ctx)
+            if stage in _ROWS_OUT:
+                record["rows_out"] = len(ctx[_ROWS_OUT[stage]])
+        loaded.add(stage)
+        status[stage] = "ran"
+        if spec["cached"]:
+            manifest["stages"][stage] = fingerprints[stage]
+            _save_manifest(manifest, manifest_path)
+        print("Finished running " + stage + ".")
+    profiling.finish_team(team)
+    return status
+
+def run_teams(teams, targets=DEFAULT_TARGETS, classifier=None, force=False,
+    max_workers=1, write=True):
+    """
+    Runs run_pipeline() for every team in teams and returns a summary DataFrame
+    with one row per team and the columns "Team", "Status" ("ok" or "failed"),
+    "Ran" and "Skipped" (the stages), "Seconds" and "Error" (the traceback of a
+    failed team). An error in one team does not stop the others. The summary is
+    saved as misc_data/pipeline_summary.csv.
+
+    teams.csv and the thread index are read once for all teams, and the
+    classifier is trained once, before any team runs, if stage sentiment is out
+    of date for any team. With max_workers greater than 1, the teams run in a
+    pool of that many processes. Where fork is available, the workers inherit
+    the classifier and the shared data from this process without pickling, and
+    the pages holding them stay shared until written to; elsewhere they are
+    pickled once per worker, not once per team.
+
+    Parameter teams: the basketball teams to run on.
+    Precondition: must be a list of strings.
+
+    Parameter targets, classifier, force: see run_pipeline().
+
+    Parameter max_workers: the largest number of teams run at the same time.
+    Precondition: must be an integer greater than zero.
+
+    Parameter write: whether or not to save the summary as a csv file.
+    Precondition: must be a boolean.
+    """
+    assert type(max_workers) == int and max_workers > 0, \
+        repr(max_workers) + " is not an integer greater than zero."
+    load_shared_data()
+    if classifier is None and any("sentiment" in _stale_stages(team, targets, force)
+        for team in teams):
+        classifier = _classifier_provider(None)()
+    if max_workers == 1 or len(teams) < 2:
+        _init_worker(None, classifier)
+        reports = [_run_team(team, targets, force) for team in teams]
+    else:
+        reports = _run_team_pool(teams, targets, classifier, force,
+            min(max_workers, len(teams)))
+    summary = pandas.DataFrame(reports, columns=["Team", "Status", "Ran", "Skipped",
+        "Seconds", "Error"])
+    if write:
+        summary.to_csv(RESEARCH_PATH + "misc_data/pipeline_summary.csv", index=False)
+    return summary
+
+def print_summary(summary):
+    """
+    Prints a summary from run_teams() and the error of every failed team, and
+    returns the exit status of the run: 1 if any team failed and 0 otherwise.
+    """
+    print(summary.drop(columns="Error").to_string(index=False))
+    failed = summary[summary["Status"] == "failed"]
+    for team, error in zip(failed["Team"], failed["Error"]):
+        print("\n" + team + " failed:\n" + str(error), file=sys.stderr)
+    return 1 if len(failed) > 0 else 0
+
+def _run_team_pool(teams, targets, classifier, force, max_workers):
+    """ Runs _run_team() for every team in a process pool and returns the reports in order. """
+    start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+    shared = None if start_method == "fork" else dict(_SHARED)
+    # Moves the objects made so far out of the collected generations, so the
+    # garbage collector of a worker does not write to (and copy) their pages.
+    gc.freeze()
+    reports = {}
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers,
+            mp_context=multiprocessing.get_context(start_method),
+            initializer=_init_worker, initargs=(shared, classifier)) as executor:
+            futures = {executor.submit(_run_team, team, targets, force): team for team in teams}
+            for future in concurrent.futures.as_completed(futures):
+                team = futures[future]
+                try:
+                    reports[team] = future.result()
+                except Exception:
+                    # The worker process itself died, for example out of memory.
+                    reports[team] = [team, "failed", "", "", numpy.nan, traceback.format_exc()]
+                print(team + ": " + reports[team][1])
+    finally:
+        gc.unfreeze()
+    return [reports[team] for team in teams]
+
+def _init_worker(shared, classifier):
+    """
+    Sets up a process that runs teams: keeps the shared data (None if it is
+    already there) and the classifier provider in _SHARED.
+    """
+    if shared is not None:
+        _SHARED.update(shared)
+    _SHARED["classifier"] = _classifier_provider(classifier)
+
+def _run_team(team, targets, force):
+    """
+    Runs run_pipeline() for a team and returns its row of the summary of
+    run_teams(). Errors are caught and reported in the row.
+    """
+    start = time.perf_counter()
+    try:
+        status = run_pipeline(team, targets, _SHARED["classifier"], force)
+    except Exception:
+        return [team, "failed", "", "", round(time.perf_counter() - start, 3),
+            traceback.format_exc()]
+    return [team, "ok", " ".join(stage for stage in status if status[stage] == "ran"),
+        " ".join(stage for stage in status if status[stage] == "skipped"),
+        round(time.perf_counter() - start, 3), ""]
+
+def _stale_stages(team, targets, force):
+    """
+    Returns the stages of run_pipeline(team, targets) whose fingerprint differs
+    from the last run, without running anything. Stages with missing outputs are
+    not found, so a worker may still have to train its own classifier.
+    """
+    manifest = _load_manifest(_team_path(team, "pipeline_manifest.json"))
+    fingerprints = {}
+    stale = []
+    for stage in _stage_order(targets):
+        fingerprints[stage] = _fingerprint(stage, team, fingerprints, manifest)
+        if STAGES[stage]["cached"] and ((force and stage in targets) or
+            manifest["stages"].get(stage) != fingerprints[stage]):
+            stale.append(stage)
+    return stale
+
+def _stage_order(targets):
+    """
+    Returns the stages in targets and every stage they depend on, in an order
+    where every stage comes after its dependencies.
+    """
+    order = []
+    def visit(stage):
+        if stage not in order:
+            for dep in STAGES[stage]["deps"]:
+                visit(dep)
+            order.append(stage)
+    for stage in targets:
+        visit(stage)
+    return order
+
+def _all_deps(stage):
+    """ Returns every stage stage depends on, directly or not, in run order. """
+    return _stage_order(STAGES[stage]["deps"])
+
+def _fingerprint(stage, team, fingerprints, manifest):
+    """
+    Returns the fingerprint of a stage: a hash of the stage name, the hashes of
+    its input files and code, its parameters and the fingerprints of its
+    dependencies.
+    """
+    spec = STAGES[stage]
+    digest = hashlib.sha256(stage.encode())
+    for path in spec["inputs"](team):
+        digest.update(path.encode() + _file_hash(path, manifest).encode())
+    for module in _code_modules(spec["code"]):
+        digest.update(module.encode() + _file_hash(_module_path(module), manifest).encode())
+    digest.update(json.dumps(spec["params"], sort_keys=True).encode())
+    for dep in spec["deps"]:
+        digest.update(dep.encode() + fingerprints[dep].encode())
+    return digest.hexdigest()
+
+def _code_modules(modules):
+    """
+    Returns the modules in modules and every module of the repository they
+    import, directly or not, in sorted order. Imports inside functions count
+    too, so a stage is run again when any code it can call changes.
+    """
+    found = set()
+    todo = list(modules)
+    while todo:
+        module = todo.pop()
+        if module in found:
+            continue
+        found.add(module)
+        todo += _local_imports(module)
+    return sorted(found)
+
+def _local_imports(module):
+    """
+    Returns the modules of the repository imported anywhere in module. They
+    are kept in _LOCAL_IMPORTS, so every module is parsed once per process.
+    """
+    if module not in _LOCAL_IMPORTS:
+        with open(_module_path(module)) as source:
+            tree = ast.parse(source.read())
+        names = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names.update(alias.name.split(".")[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names.add(node.module.split(".")[0])
+        _LOCAL_IMPORTS[module] = sorted(name for name in names
+            if os.path.exists(_module_path(name)))
+    return _LOCAL_IMPORTS[module]
+
+_LOCAL_IMPORTS = {}
+
+def _module_path(module):
+    """ Returns the path of the source of a module of the repository. """
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), module + ".py")
+
+def _file_hash(path, manifest):
+    """
+    Returns the sha256 hash of a file, or "missing" if it does not exist. The
+    hash is kept in the manifest with the size and modification time of the
+    file, so unchanged files are not read again.
+    """
+    if not os.path.exists(path):
+        return "missing"
+    stat = os.stat(path)
+    known = manifest["files"].get(path)
+    if known is not None and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+        return known[2]
+    digest = hashlib.sha256()
+    with open(path, "rb") as input_file:
+        for block in iter(lambda: input_file.read(1 << 20), b""):
+            digest.update(block)
+    manifest["files"][path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+    return digest.hexdigest()
+
+def _load_manifest(path):
+    """ Returns the manifest at path, or an empty manifest. """
+    if not os.path.exists(path):
+        return {"stages": {}, "files": {}}
+    with open(path) as manifest_file:
+        return json.load(manifest_file)
+
+def _save_manifest(manifest, path):
+    """ Saves the manifest to path, replacing the old one in one step. """
+    with open(path + ".tmp", "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=1)
+    os.replace(path + ".tmp", path)
+
+def _classifier_provider(classifier):
+    """
+    Returns a function that returns the classifier, training one the first time
+    it is called if classifier is None.
+    """
+    if callable(classifier) and not hasattr(classifier, "classify"):
+        return classifier
+    cache = {"classifier": classifier}
+    def provider():
+        if cache["classifier"] is None:
+            import sentiment_analysis
+            print("Training classifier.")
+            cache["classifier"] = sentiment_analysis.train_classifier()
+            print("Finished training classifier.")
+        return cache["classifier"]
+    return provider
+
+def _parse_args(argv=None):
+    """ Parses the command line arguments of the pipeline. """
+    parser = argparse.ArgumentParser(description="Extract and analyze mentions " +
+        "of NBA rosters in Reddit post-game threads.")
+    parser.add_argument("--teams", nargs="+", default=["76ers"],
+        help="teams to run on")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES),
+        default=DEFAULT_TARGETS, help="stages to bring up to date, with the " +
+        "stages they depend on")
+    parser.add_argument("--force", action="store_true",
+        help="run the selected stages even if they are unchanged")
+    parser.add_argument("--workers", type=int, default=1,
+        help="number of teams run at the same time in separate processes")
+    parser.add_argument("--profile", action="store_true",
+        help="measure every stage and game and save Teams/<team>/profile_report.json")
+    parser.add_argument("--profile-stage", choices=list(STAGES),
+        help="also run this stage under cProfile (implies --profile)")
+    parser.add_argument("--sentiment-socket",
+        help="socket of a running sentiment_server.py to use instead of " +
+        "training a classifier")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """
+    Runs the pipeline with the command line arguments argv, prints the summary
+    of the teams and returns the exit status: 1 if a team failed, else 0.
+
+    Parameter argv: the arguments, without the program name. If None, the
+    arguments of the process.
+    Precondition: must be None or a list of strings.
+    """
+    args = _parse_args(argv)
+    if args.profile or args.profile_stage is not None:
+        profiling.enable(args.profile_stage)
+    summary = run_teams(args.teams, args.stages, args.sentiment_socket, args.force,
+        args.workers)
+    return print_summary(summary)
+
+if __name__ == '__main__':
+    sys.exit(main())
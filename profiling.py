@@ -0,0 +1,231 @@
+"""
+Module with the instrumentation of the pipeline. Every stage run by
+pipeline.run_pipeline(), and every game of the per-game stages, is measured with
+measure(): wall time, CPU time, peak resident memory during the block, rows
+in and out, and rows in per second. At the end of a team, the records are saved as
+Teams/<team>/profile_report.json and a summary is printed.
+
+Profiling is off unless the environment variable RESEARCH_PROFILE is set to
+something other than "" or "0", or pipeline.py is run with --profile. Setting
+RESEARCH_PROFILE_STAGE=<stage> (or --profile-stage <stage>) also runs that stage
+under cProfile and saves the statistics as Teams/<team>/profile_<stage>.prof.
+When profiling is off, measure() only yields an empty dictionary.
+
+The peak memory of a block ("peak_rss_mb") is measured on Linux by resetting
+the high-water mark of the process (writing 5 to /proc/self/clear_refs) when
+the block starts and reading VmHWM from /proc/self/status when it ends. A stage
+that contains measured games keeps the largest peak of its games and of its own
+code between them. Where this is not possible, "peak_rss_mb" is None and only
+"process_peak_rss_mb", the peak of the whole process so far, is reported.
+
+Creator: Sebastian Guo
+"""
+import contextlib, cProfile, io, json, os, pstats, sys, time
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; the peak memory is then not reported.
+    resource = None
+
+_STATE = {"enabled": os.environ.get("RESEARCH_PROFILE", "") not in ["", "0"],
+    "cprofile_stage": os.environ.get("RESEARCH_PROFILE_STAGE") or None,
+    "records": [], "open": [], "process_peak": None}
+
+def enable(cprofile_stage=None):
+    """
+    Turns profiling on, for this process and the processes it starts.
+
+    Parameter cprofile_stage: the stage to run under cProfile, if any.
+    Precondition: must be None or a string.
+    """
+    assert cprofile_stage is None or type(cprofile_stage) == str, \
+        repr(cprofile_stage) + " is not None or a string."
+    _STATE["enabled"] = True
+    os.environ["RESEARCH_PROFILE"] = "1"
+    if cprofile_stage is not None:
+        _STATE["cprofile_stage"] = cprofile_stage
+        os.environ["RESEARCH_PROFILE_STAGE"] = cprofile_stage
+
+def is_enabled():
+    """ Returns whether or not profiling is on. """
+    return _STATE["enabled"]
+
+@contextlib.contextmanager
+def measure(stage, team, global_ID=None, rows_in=None):
+    """
+    Context manager that measures the code in its block and yields the record
+    of the measurement, a dictionary. The block can set record["rows_in"] and
+    record["rows_out"] once the numbers of rows are known. If profiling is off,
+    nothing is measured.
+
+    Parameter stage: the stage measured.
+    Precondition: must be a string.
+
+    Parameter team: the basketball team the stage runs on.
+    Precondition: must be a string.
+
+    Parameter global_ID: the game measured, or None for a whole stage.
+    Precondition: must be None or an integer.
+
+    Parameter rows_in: the number of rows the stage reads, if known.
+    Precondition: must be None or an integer.
+    """
+    if not _STATE["enabled"]:
+        yield {}
+        return
+    record = {"stage": stage, "team": team, "global_ID": None if global_ID is None
+        else int(global_ID), "rows_in": rows_in, "rows_out": None}
+    profiler = None
+    if global_ID is None and stage == _STATE["cprofile_stage"]:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    # The blocks this one runs in lose their high-water mark when it is reset,
+    # so they keep the peak so far.
+    # Resetting also resets the peak of getrusage(), so the process peak is kept too.
+    for outer in _STATE["open"]:
+        outer["peak"] = _max_peak(outer["peak"], _high_water_mb())
+    _STATE["process_peak"] = _max_peak(_STATE["process_peak"], _process_peak_mb())
+    peak = {"peak": None, "reset": _reset_high_water()}
+    _STATE["open"].append(peak)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield record
+    finally:
+        record["wall_seconds"] = time.perf_counter() - wall_start
+        record["cpu_seconds"] = time.process_time() - cpu_start
+        _STATE["open"].remove(peak)
+        record["peak_rss_mb"] = _max_peak(peak["peak"], _high_water_mb()) \
+            if peak["reset"] else None
+        for outer in _STATE["open"]:
+            outer["peak"] = _max_peak(outer["peak"], record["peak_rss_mb"])
+        _STATE["process_peak"] = _max_peak(_STATE["process_peak"],
+            _max_peak(record["peak_rss_mb"], _process_peak_mb()))
+        record["process_peak_rss_mb"] = _STATE["process_peak"]
+        record["rows_per_second"] = record["rows_in"] / record["wall_seconds"] \
+            if record["rows_in"] and record["wall_seconds"] > 0 else None
+        if profiler is not None:
+            profiler.disable()
+            record["cprofile_file"] = "/home/sebastianguo/Documents/Research/Teams/" + \
+                team + "/profile_" + stage + ".prof"
+            profiler.dump_stats(record["cprofile_file"])
+            text = io.StringIO()
+            pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(15)
+            record["cprofile_top"] = text.getvalue()
+        _STATE["records"].append(record)
+
+def report(team):
+    """
+    Returns the report of the records of a team as a dictionary with the keys
+    "team", "stages" (the records of whole stages, in run order), "games" (the
+    per-game records) and "game_totals" (for every per-game stage, the number
+    of games and the total, mean and largest wall time and the total rows).
+    """
+    records = [record for record in _STATE["records"] if record["team"] == team]
+    games = [record for record in records if record["global_ID"] is not None]
+    totals = {}
+    for record in games:
+        total = totals.setdefault(record["stage"], {"games": 0, "wall_seconds": 0.0,
+            "cpu_seconds": 0.0, "max_wall_seconds": 0.0, "rows_in": 0, "rows_out": 0})
+        total["games"] += 1
+        total["wall_seconds"] += record["wall_seconds"]
+        total["cpu_seconds"] += record["cpu_seconds"]
+        total["max_wall_seconds"] = max(total["max_wall_seconds"], record["wall_seconds"])
+        total["rows_in"] += record["rows_in"] or 0
+        total["rows_out"] += record["rows_out"] or 0
+    for total in totals.values():
+        total["mean_wall_seconds"] = total["wall_seconds"] / total["games"]
+    return {"team": team, "stages": [record for record in records
+        if record["global_ID"] is None], "games": games, "game_totals": totals}
+
+def write_report(team_report, path=None):
+    """
+    Saves a report from report() as JSON. If path is None, the report is saved
+    as Teams/<team>/profile_report.json.
+    """
+    if path is None:
+        path = "/home/sebastianguo/Documents/Research/Teams/" + team_report["team"] + \
+            "/profile_report.json"
+    with open(path, "w") as report_file:
+        json.dump(team_report, report_file, indent=1)
+    return path
+
+def format_summary(team_report):
+    """ Returns a table of a report from report() to print. """
+    lines = ["Profile of " + team_report["team"] + ":",
+        "%-16s %10s %10s %10s %10s %10s %12s" % ("stage", "wall s", "cpu s",
+        "peak MB", "rows in", "rows out", "rows/s")]
+    for record in team_report["stages"]:
+        lines.append("%-16s %10.3f %10.3f %10s %10s %10s %12s" % (record["stage"],
+            record["wall_seconds"], record["cpu_seconds"], _text(record["peak_rss_mb"]),
+            _text(record["rows_in"]), _text(record["rows_out"]),
+            _text(record["rows_per_second"])))
+    for stage, total in team_report["game_totals"].items():
+        lines.append("%-16s %d games, %.3f s total, %.4f s mean, %.4f s slowest" % (
+            stage + " games", total["games"], total["wall_seconds"],
+            total["mean_wall_seconds"], total["max_wall_seconds"]))
+    for record in team_report["stages"]:
+        if "cprofile_top" in record:
+            lines.append(record["cprofile_top"])
+    return "\n".join(lines)
+
+def finish_team(team):
+    """
+    If profiling is on, saves and prints the report of a team and drops its
+    records.
+    """
+    if not _STATE["enabled"]:
+        return
+    team_report = report(team)
+    write_report(team_report)
+    print(format_summary(team_report))
+    _STATE["records"] = [record for record in _STATE["records"] if record["team"] != team]
+
+def _reset_high_water():
+    """
+    Resets the peak resident memory of the process on Linux and returns whether
+    or not it could be reset.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+def _high_water_mb():
+    """
+    Returns the peak resident memory of the process since the last reset in MB
+    (VmHWM), or None if unknown.
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 2**10, 1)
+    except OSError:
+        pass
+    return None
+
+def _max_peak(peak, other):
+    """ Returns the larger of two peaks, either of which can be None. """
+    if peak is None or other is None:
+        return other if peak is None else peak
+    return max(peak, other)
+
+def _process_peak_mb():
+    """
+    Returns the peak resident memory of the process in MB from getrusage(), or
+    None if unknown. On Linux, this is the peak since the last reset.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    return round(peak / 2**20 if sys.platform == "darwin" else peak / 2**10, 1)
+
+def _text(value):
+    """ Returns a number of the summary table as text. """
+    if value is None:
+        return "-"
+    return str(round(value, 1)) if type(value) == float else str(value)
@@ -0,0 +1,175 @@
+"""
+Module with a binary cache of the raw comment scrape. The first time the raw csv
+file of a team is read, its columns are converted into a folder next to it
+(regseason_postgame_2020_<team>_.cache/):
+
+    global_ID.npy, local_ID.npy: the integer ID columns.
+    text.bin: the comments, one after another in UTF-8, each followed by a zero byte.
+    offsets.npy: where every comment starts in text.bin, plus the length of text.bin.
+    null.npy: which comments are missing in the csv file.
+    meta.json: the size and modification time of the csv file when it was converted.
+
+Later runs open the arrays memory-mapped, which takes about the same time for
+any size of scrape, and only parse the text that is used. The cache is rebuilt
+when the csv file has another size or modification time than in meta.json.
+
+Small csv files (the roster, teams and word removal files) are cached as a
+pickled DataFrame next to the file by read_table().
+
+Creator: Sebastian Guo
+"""
+import json, os, pickle, shutil
+import numpy
+import pandas
+
+RAW_COLUMNS = ["global_ID", "local_ID", "comment"]
+# Changing the layout of the cache changes the version, so old caches are rebuilt.
+_VERSION = 1
+
+def cache_dir(csv_path):
+    """ Returns the cache folder of a raw csv file. """
+    return os.path.splitext(csv_path)[0] + ".cache"
+
+def open_raw_cache(csv_path, chunksize=1000000):
+    """
+    Returns the cache of a raw csv file as a dictionary with the memory-mapped
+    arrays "global_ID", "local_ID", "offsets", "null" and "text" (bytes), and
+    "rows", the number of comments. The cache is built first if it is missing
+    or out of date.
+
+    Parameter csv_path: the path of the raw csv file.
+    Precondition: must be a string. The file must have the columns in RAW_COLUMNS.
+
+    Parameter chunksize: the number of rows converted at a time if the cache is built.
+    Precondition: must be an integer greater than zero.
+    """
+    assert type(csv_path) == str, repr(csv_path) + " is not a string."
+    folder = cache_dir(csv_path)
+    if not is_current(csv_path):
+        build_raw_cache(csv_path, chunksize)
+    with open(os.path.join(folder, "meta.json")) as meta_file:
+        meta = json.load(meta_file)
+    cache = {"rows": meta["rows"]}
+    for name in ["global_ID", "local_ID", "offsets", "null"]:
+        cache[name] = numpy.load(os.path.join(folder, name + ".npy"), mmap_mode="r")
+    # numpy cannot map an empty file.
+    cache["text"] = numpy.memmap(os.path.join(folder, "text.bin"), dtype=numpy.uint8,
+        mode="r") if cache["offsets"][-1] > 0 else numpy.zeros(0, dtype=numpy.uint8)
+    return cache
+
+def load_raw_data(csv_path, chunksize=1000000):
+    """
+    Returns the raw csv file as a DataFrame with the columns in RAW_COLUMNS, the
+    same as pandas.read_csv() gives for them, read from its cache (see
+    open_raw_cache()).
+    """
+    cache = open_raw_cache(csv_path, chunksize)
+    return pandas.DataFrame({"global_ID": numpy.array(cache["global_ID"]),
+        "local_ID": numpy.array(cache["local_ID"]), "comment": comments(cache)},
+        columns=RAW_COLUMNS)
+
+def comments(cache, rows=None):
+    """
+    Returns the comments of rows of a cache as a list of strings, with None for
+    missing comments.
+
+    Parameter cache: a cache from open_raw_cache().
+    Precondition: must be a dictionary from open_raw_cache().
+
+    Parameter rows: the row numbers. If None, every row.
+    Precondition: must be None or a list or array of integers.
+    """
+    offsets = cache["offsets"]
+    null = cache["null"]
+    if rows is None:
+        text = cache["text"].tobytes().decode("utf-8")
+        # One split is much faster than a slice per comment, but only works if
+        # no comment has a zero byte of its own.
+        texts = text.split("\0")[:-1]
+        if len(texts) != cache["rows"]:
+            texts = [_comment(cache, row) for row in range(cache["rows"])]
+        return [None if null[row] else texts[row] for row in range(cache["rows"])] \
+            if null.any() else texts
+    return [None if null[row] else _comment(cache, row) for row in rows]
+
+def is_current(csv_path):
+    """ Returns whether or not the cache of a raw csv file is up to date. """
+    meta_path = os.path.join(cache_dir(csv_path), "meta.json")
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path) as meta_file:
+        meta = json.load(meta_file)
+    stat = os.stat(csv_path)
+    return meta.get("version") == _VERSION and meta["size"] == stat.st_size and \
+        meta["mtime_ns"] == stat.st_mtime_ns
+
+def build_raw_cache(csv_path, chunksize=1000000):
+    """
+    Converts a raw csv file into its cache folder, replacing any old cache. The
+    csv file is read in chunks of chunksize rows, so the memory used does not
+    grow with the text of the scrape. meta.json is written last, so a cache left
+    half built is rebuilt the next time.
+    """
+    assert type(chunksize) == int and chunksize > 0, \
+        repr(chunksize) + " is not an integer greater than zero."
+    stat = os.stat(csv_path)
+    folder = cache_dir(csv_path)
+    if os.path.exists(folder):
+        shutil.rmtree(folder)
+    os.makedirs(folder)
+    global_IDs, local_IDs, nulls, lengths = [], [], [], []
+    with open(os.path.join(folder, "text.bin"), "wb") as text_file:
+        for chunk in pandas.read_csv(csv_path, usecols=RAW_COLUMNS,
+            dtype={"global_ID": numpy.int64, "local_ID": numpy.int64}, chunksize=chunksize):
+            null = chunk["comment"].isna().to_numpy()
+            encoded = [b"" if missing else str(comment).encode("utf-8")
+                for comment, missing in zip(chunk["comment"].to_numpy(), null)]
+            text_file.write(b"\0".join(encoded) + b"\0")
+            global_IDs.append(chunk["global_ID"].to_numpy())
+            local_IDs.append(chunk["local_ID"].to_numpy())
+            nulls.append(null)
+            lengths.append(numpy.fromiter((len(text) + 1 for text in encoded),
+                dtype=numpy.int64, count=len(encoded)))
+    lengths = numpy.concatenate(lengths) if lengths else numpy.zeros(0, dtype=numpy.int64)
+    offsets = numpy.zeros(len(lengths) + 1, dtype=numpy.int64)
+    numpy.cumsum(lengths, out=offsets[1:])
+    numpy.save(os.path.join(folder, "global_ID.npy"), _concat(global_IDs, numpy.int64))
+    numpy.save(os.path.join(folder, "local_ID.npy"), _concat(local_IDs, numpy.int64))
+    numpy.save(os.path.join(folder, "null.npy"), _concat(nulls, bool))
+    numpy.save(os.path.join(folder, "offsets.npy"), offsets)
+    with open(os.path.join(folder, "meta.json"), "w") as meta_file:
+        json.dump({"version": _VERSION, "source": csv_path, "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns, "rows": len(lengths)}, meta_file)
+
+def read_table(csv_path):
+    """
+    Returns pandas.read_csv(csv_path), read from a pickle next to the file
+    (<csv_path>.pkl) if the file has the same size and modification time as
+    when the pickle was made, and otherwise read from the csv file and pickled.
+
+    Parameter csv_path: the path of a small csv file.
+    Precondition: must be a string.
+    """
+    assert type(csv_path) == str, repr(csv_path) + " is not a string."
+    stat = os.stat(csv_path)
+    key = (_VERSION, stat.st_size, stat.st_mtime_ns)
+    pickle_path = csv_path + ".pkl"
+    if os.path.exists(pickle_path):
+        with open(pickle_path, "rb") as pickle_file:
+            cached_key, table = pickle.load(pickle_file)
+        if cached_key == key:
+            return table
+    table = pandas.read_csv(csv_path)
+    with open(pickle_path + ".tmp", "wb") as pickle_file:
+        pickle.dump((key, table), pickle_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(pickle_path + ".tmp", pickle_path)
+    return table
+
+def _comment(cache, row):
+    """ Returns the text of one row of a cache. """
+    start, end = int(cache["offsets"][row]), int(cache["offsets"][row + 1]) - 1
+    return cache["text"][start:end].tobytes().decode("utf-8")
+
+def _concat(arrays, dtype):
+    """ Returns the arrays joined into one, or an empty array. """
+    return numpy.concatenate(arrays) if arrays else numpy.zeros(0, dtype=dtype)
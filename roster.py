@@ -0,0 +1,144 @@
+"""
+Module with the Roster class, a compact form of roster.csv with dictionary
+indexes so looking up a person by name, position, race or any of their name
+variations takes constant time instead of a scan over the roster columns. A
+Roster is built once from the roster DataFrame and passed through the pipeline.
+Every function that takes a roster_file accepts either the DataFrame or a Roster.
+
+Creator: Sebastian Guo
+"""
+import pandas
+import assertions
+
+# Positions of the people counted as management by find_management().
+MGMT_POSITIONS = ["Coach", "GM", "Owner", "President"]
+
+class RosterMember(object):
+    """
+    A class for one row of the roster file: a player, coach, GM, or owner.
+
+    Attribute name: the full name (column "Player").
+    Attribute first, last: the first and last name, or None.
+    Attribute aliases: the shortened first and last names and nicknames, in the
+    order _match_roster() checks them.
+    Attribute pos, race: the position and race.
+    Attribute salary, seasons: the annual salary and seasons spent, or None if
+    the roster file has no such column.
+    """
+    __slots__ = ("name", "first", "last", "aliases", "pos", "race", "salary", "seasons")
+
+    def __init__(self, name, first, last, aliases, pos, race, salary, seasons):
+        self.name = name
+        self.first = first
+        self.last = last
+        self.aliases = aliases
+        self.pos = pos
+        self.race = race
+        self.salary = salary
+        self.seasons = seasons
+
+    def __repr__(self):
+        return "RosterMember(" + repr(self.name) + ", " + repr(self.pos) + ")"
+
+class Roster(object):
+    """
+    A class for a team roster built from roster.csv.
+
+    Attribute frame: the roster DataFrame the Roster was built from.
+    Attribute members: a list of RosterMember objects in roster file order.
+    Attribute by_name: a dictionary from full name to RosterMember.
+    Attribute by_position: a dictionary from position to a list of RosterMembers.
+    Attribute by_race: a dictionary from race to a list of RosterMembers.
+    Attribute player_list: every full name in roster order (find_roster_names()).
+    Attribute mgmt_list: the full names of management in roster order
+    (find_management()).
+    """
+    __slots__ = ("frame", "members", "by_name", "by_position", "by_race",
+        "player_list", "mgmt_list", "_exact", "_alias")
+
+    def __init__(self, roster_file):
+        """
+        Builds the Roster from roster_file.
+
+        Parameter roster_file: a reader object that contains information about
+        player names and nicknames.
+        Precondition: must be a DataFrame object created by the pandas module
+        with the correct headers.
+        """
+        assertions.assert_roster_file_format(roster_file)
+        self.frame = roster_file
+        self.members = []
+        self.by_name = {}
+        self.by_position = {}
+        self.by_race = {}
+        # Named entities matched by _match_roster(): the first row with a
+        # matching first, last or full name wins, otherwise the last row with a
+        # matching alias.
+        self._exact = {}
+        self._alias = {}
+        salary = roster_file["Annual Salary"] if "Annual Salary" in roster_file else None
+        seasons = roster_file["Seasons Spent"] if "Seasons Spent" in roster_file else None
+        for index in range(roster_file.shape[0]):
+            aliases = []
+            for col_name in ["First Short", "Last Short", "Nicknames"]:
+                if not pandas.isnull(roster_file[col_name][index]):
+                    aliases += roster_file[col_name][index].split(",")
+            member = RosterMember(roster_file["Player"][index],
+                _value_or_none(roster_file["First"][index]),
+                _value_or_none(roster_file["Last"][index]), aliases,
+                roster_file["Pos"][index], roster_file["Race"][index],
+                None if salary is None else salary[index],
+                None if seasons is None else seasons[index])
+            self.members.append(member)
+            self.by_name.setdefault(member.name, member)
+            self.by_position.setdefault(member.pos, []).append(member)
+            self.by_race.setdefault(member.race, []).append(member)
+            for term in [member.first, member.last, member.name]:
+                if term is not None:
+                    self._exact.setdefault(term, member.name)
+            for term in aliases:
+                self._alias[term] = member.name
+        self.player_list = [member.name for member in self.members]
+        self.mgmt_list = [member.name for member in self.members
+            if member.pos in MGMT_POSITIONS]
+
+    def __len__(self):
+        return len(self.members)
+
+    def __contains__(self, name):
+        return name in self.by_name
+
+    def get(self, name):
+        """ Returns the RosterMember with full name name, or None. """
+        return self.by_name.get(name)
+
+    def match(self, named_entity):
+        """
+        Returns the full name of the person that named_entity refers to, or an
+        empty string if it refers to nobody. Gives the same answer as
+        name_matching._match_roster() did with a scan over the roster.
+        """
+        player = self._exact.get(named_entity)
+        if player is None:
+            player = self._alias.get(named_entity, "")
+        return player
+
+    def count_race(self, names, race):
+        """ Returns how many of the people in names have the given race. """
+        return sum(1 for name in names if self.by_name[name].race == race)
+
+def as_roster(roster_file):
+    """
+    Returns roster_file if it already is a Roster and otherwise builds a Roster
+    from it.
+
+    Parameter roster_file: the roster of a team.
+    Precondition: must be a Roster or a DataFrame with the roster headers.
+    """
+    if isinstance(roster_file, Roster):
+        return roster_file
+    return Roster(roster_file)
+
+def _value_or_none(value):
+    """ Returns None for an empty csv cell and the value otherwise. """
+    return None if pandas.isnull(value) else value
@@ -0,0 +1,296 @@
+"""
+Module with an incremental aggregate state of the management statistics of a
+season. Every processed game adds its fact table rows to the state, replacing
+the rows of an earlier update of the same game, and the statistics of rolling
+windows (the last N games, month to date, season to date) are answered from
+running sums without reading past games again.
+
+For every group of every grouping (for example ["race"] or ["person"]) within a
+stratum (the game result), the state keeps prefix sums over the games of the
+value columns, of their squares and of the number of rows, and the number of
+games of every stratum. The statistics of a window of games are the difference
+of two prefix sums, so a query takes the same time however many games the
+season has.
+
+The state is a dictionary, saved and loaded with pickle.
+
+Creator: Sebastian Guo
+"""
+import bisect, os, pickle
+import numpy
+import pandas
+import assertions
+import group_stats
+
+GROUPINGS = [["race"], ["person"]]
+
+def season_state_path(team):
+    """ Returns the path of the season state of a team. """
+    return "/home/sebastianguo/Documents/Research/Teams/" + team + "/season_state.pkl"
+
+def new_season_state(groupings=GROUPINGS, values=group_stats.VALUE_COLUMNS,
+    stratum="result"):
+    """
+    Returns an empty season state.
+
+    Parameter groupings: the groupings the statistics are kept for.
+    Precondition: must be a list of lists of fact table columns.
+
+    Parameter values: the value columns summed.
+    Precondition: must be a list with entries from group_stats.VALUE_COLUMNS.
+
+    Parameter stratum: the game dimension that splits the games counted.
+    Precondition: must be a string in group_stats.GAME_DIMENSIONS.
+    """
+    for grouping in groupings:
+        assertions.assert_str_list(grouping)
+    for value in values:
+        assert value in group_stats.VALUE_COLUMNS, repr(value) + " is not a value column."
+    assert stratum in group_stats.GAME_DIMENSIONS, repr(stratum) + " is not a game dimension."
+    return {"groupings": [list(grouping) for grouping in groupings],
+        "values": list(values), "stratum": stratum,
+        # Group keys are (grouping number, stratum, *dimensions).
+        "groups": [], "group_index": {}, "strata": [], "stratum_index": {},
+        # One entry per game, in date order.
+        "games": [], "dates": [], "game_sums": [], "game_rows": [], "game_strata": [],
+        # Entry i holds the sums over the first i games.
+        "prefix_sum": [numpy.zeros((0, len(values)))],
+        "prefix_sq": [numpy.zeros((0, len(values)))],
+        "prefix_rows": [numpy.zeros(0)], "prefix_games": [numpy.zeros(0)],
+        # Month (numpy datetime64[M]) to the number of its first game.
+        "month_start": {}}
+
+def update_season_state(state, facts):
+    """
+    Adds the fact table rows of one game to the state and returns True, or
+    returns False if the game has no date (no game was found for the thread).
+    A game that is already in the state is replaced: its old sums are removed
+    first, so the state holds the rows of its last update. A game is normally
+    later than every game in the state; an earlier or replaced game is inserted
+    in date order and the running sums of the games after it are recomputed.
+
+    Parameter state: a season state from new_season_state().
+    Precondition: must be a dictionary with the keys of new_season_state().
+
+    Parameter facts: the fact table rows of one game, for example from
+    fact_table.game_facts().
+    Precondition: must be a DataFrame with the columns in
+    fact_table.FACT_COLUMNS and a single global ID.
+    """
+    assertions.assert_fact_table(facts)
+    assert facts["global_ID"].nunique() == 1, "The facts are not of a single game."
+    global_ID = int(facts["global_ID"].iloc[0])
+    date = facts["date"].iloc[0]
+    remove_game(state, global_ID)
+    if pandas.isnull(date):
+        return False
+    date = numpy.datetime64(date, "D")
+    game_sums, game_rows = _game_vectors(state, facts)
+    stratum = _index_of(state, "strata", "stratum_index",
+        facts[state["stratum"]].iloc[0])
+    position = bisect.bisect_right(state["dates"], date)
+    state["games"].insert(position, global_ID)
+    state["dates"].insert(position, date)
+    state["game_sums"].insert(position, game_sums)
+    state["game_rows"].insert(position, game_rows)
+    state["game_strata"].insert(position, stratum)
+    _recompute_prefixes(state, position)
+    return True
+
+def remove_game(state, global_ID):
+    """
+    Removes a game from the state and returns True, or returns False if the game
+    is not in the state. The running sums of the games after it are recomputed.
+
+    Parameter state: a season state from new_season_state().
+    Precondition: must be a dictionary with the keys of new_season_state().
+
+    Parameter global_ID: the global ID of the game.
+    Precondition: must be an integer.
+    """
+    if global_ID not in state["games"]:
+        return False
+    position = state["games"].index(global_ID)
+    for name in ["games", "dates", "game_sums", "game_rows", "game_strata"]:
+        del state[name][position]
+    _recompute_prefixes(state, position)
+    return True
+
+def build_season_state(facts, groupings=GROUPINGS, values=group_stats.VALUE_COLUMNS,
+    stratum="result"):
+    """
+    Returns a season state with every game of a fact table added in date order.
+    Takes a fact table and the parameters of new_season_state().
+    """
+    assertions.assert_fact_table(facts)
+    state = new_season_state(groupings, values, stratum)
+    facts = facts.sort_values(["date", "global_ID"], kind="stable")
+    for _, game_facts in facts.groupby("global_ID", sort=False):
+        update_season_state(state, game_facts)
+    return state
+
+def last_games(state, num_games, dimensions):
+    """
+    Returns the statistics of the last num_games games in the state (see
+    window_stats()).
+
+    Parameter num_games: the number of games in the window.
+    Precondition: must be an integer greater than zero.
+
+    Parameter dimensions: the grouping to return.
+    Precondition: must be one of the groupings of the state.
+    """
+    assert type(num_games) == int and num_games > 0, \
+        repr(num_games) + " is not an integer greater than zero."
+    end = len(state["games"])
+    return window_stats(state, max(end - num_games, 0), end, dimensions)
+
+def month_to_date(state, dimensions, date=None):
+    """
+    Returns the statistics of the games from the first of the month of date up
+    to and including date (see window_stats()).
+
+    Parameter dimensions: the grouping to return.
+    Precondition: must be one of the groupings of the state.
+
+    Parameter date: the last day of the window. If None, the date of the last
+    game in the state.
+    Precondition: must be None or a value numpy.datetime64() accepts.
+    """
+    if date is None:
+        if state["dates"] == []:
+            return window_stats(state, 0, 0, dimensions)
+        date = state["dates"][-1]
+    date = numpy.datetime64(date, "D")
+    end = bisect.bisect_right(state["dates"], date)
+    month = date.astype("datetime64[M]")
+    start = state["month_start"].get(month, end)
+    return window_stats(state, min(start, end), end, dimensions)
+
+def season_to_date(state, dimensions):
+    """ Returns the statistics of every game in the state (see window_stats()). """
+    return window_stats(state, 0, len(state["games"]), dimensions)
+
+def window_stats(state, start, end, dimensions):
+    """
+    Returns a DataFrame indexed by the stratum and dimensions with the
+    statistics of the games start, ..., end - 1 of the state (in date order):
+    for every value column v, "v" (the sum), "v per game", "v per game per
+    person" and "v std" (the standard deviation over the games of the group's
+    per-game sum), and the columns "games" and "people" (the average number of
+    rows of the group per game). These are the columns of
+    group_stats.group_stats() for the same games.
+
+    Parameter state: a season state from new_season_state().
+    Precondition: must be a dictionary with the keys of new_season_state().
+
+    Parameter start, end: the window of games.
+    Precondition: must be integers with 0 <= start <= end <= number of games.
+
+    Parameter dimensions: the grouping to return.
+    Precondition: must be one of the groupings of the state.
+    """
+    assert dimensions in state["groupings"], repr(dimensions) + " is not a grouping."
+    assert 0 <= start <= end <= len(state["games"]), "The window is out of range."
+    grouping = state["groupings"].index(dimensions)
+    num_groups = len(state["groups"])
+    sums = _pad(state["prefix_sum"][end], num_groups) - _pad(state["prefix_sum"][start], num_groups)
+    squares = _pad(state["prefix_sq"][end], num_groups) - _pad(state["prefix_sq"][start], num_groups)
+    rows = _pad(state["prefix_rows"][end], num_groups) - _pad(state["prefix_rows"][start], num_groups)
+    games = _pad(state["prefix_games"][end], len(state["strata"])) - \
+        _pad(state["prefix_games"][start], len(state["strata"]))
+    keep = [ind for ind, key in enumerate(state["groups"]) if key[0] == grouping and rows[ind] > 0]
+    index = pandas.MultiIndex.from_arrays([[state["groups"][ind][col] for ind in keep]
+        for col in range(1, len(dimensions) + 2)], names=[state["stratum"]] + dimensions)
+    group_games = numpy.array([games[state["stratum_index"][state["groups"][ind][1]]]
+        for ind in keep], dtype=numpy.float64)
+    stats = pandas.DataFrame(sums[keep], index=index, columns=state["values"])
+    stats["people"] = rows[keep] / group_games
+    stats["games"] = group_games.astype(numpy.int64)
+    for col, value in enumerate(state["values"]):
+        per_game = sums[keep, col] / group_games
+        stats[value + " per game"] = per_game
+        stats[value + " per game per person"] = per_game / stats["people"]
+        stats[value + " std"] = numpy.sqrt(numpy.maximum(squares[keep, col] /
+            group_games - per_game ** 2, 0))
+    return stats.sort_index()
+
+def save_season_state(state, path):
+    """ Saves a season state to path with pickle. """
+    with open(path, "wb") as state_file:
+        pickle.dump(state, state_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+def load_season_state(path, groupings=GROUPINGS, values=group_stats.VALUE_COLUMNS,
+    stratum="result"):
+    """
+    Returns the season state saved at path, or a new season state with the
+    given parameters if there is no file at path.
+    """
+    if not os.path.exists(path):
+        return new_season_state(groupings, values, stratum)
+    with open(path, "rb") as state_file:
+        return pickle.load(state_file)
+
+def _game_vectors(state, facts):
+    """
+    Returns the per-group sums of the value columns and the number of rows of
+    every group for the facts of one game, adding new groups to the state.
+    """
+    stratum_value = facts[state["stratum"]].iloc[0]
+    entries = []
+    for grouping, dimensions in enumerate(state["groupings"]):
+        grouped = facts.groupby(dimensions, observed=True, sort=False)
+        group_sums = grouped[state["values"]].sum()
+        for key, row, count in zip(group_sums.index, group_sums.to_numpy(dtype=numpy.float64),
+            grouped.size().to_numpy()):
+            key = key if type(key) == tuple else (key,)
+            entries.append((_index_of(state, "groups", "group_index",
+                (grouping, stratum_value) + key), row, count))
+    game_sums = numpy.zeros((len(state["groups"]), len(state["values"])))
+    game_rows = numpy.zeros(len(state["groups"]))
+    for group, row, count in entries:
+        game_sums[group] = row
+        game_rows[group] = count
+    return game_sums, game_rows
+
+def _recompute_prefixes(state, position):
+    """
+    Recomputes the prefix sums and the first games of the months from game
+    position onwards. For a game added after every other game, this only adds
+    one prefix entry.
+    """
+    for name in ["prefix_sum", "prefix_sq", "prefix_rows", "prefix_games"]:
+        del state[name][position + 1:]
+    # The months that start at or after position may have moved or lost their games.
+    for month in [month for month, start in state["month_start"].items() if start >= position]:
+        del state["month_start"][month]
+    for game in range(position, len(state["games"])):
+        num_groups = len(state["groups"])
+        game_sums = _pad(state["game_sums"][game], num_groups)
+        game_games = numpy.zeros(len(state["strata"]))
+        game_games[state["game_strata"][game]] = 1
+        state["prefix_sum"].append(_pad(state["prefix_sum"][game], num_groups) + game_sums)
+        state["prefix_sq"].append(_pad(state["prefix_sq"][game], num_groups) + game_sums ** 2)
+        state["prefix_rows"].append(_pad(state["prefix_rows"][game], num_groups) +
+            _pad(state["game_rows"][game], num_groups))
+        state["prefix_games"].append(_pad(state["prefix_games"][game],
+            len(state["strata"])) + game_games)
+    for month in set(date.astype("datetime64[M]") for date in state["dates"][position:]):
+        state["month_start"][month] = bisect.bisect_left(state["dates"],
+            month.astype("datetime64[D]"))
+
+def _index_of(state, list_name, index_name, key):
+    """ Returns the number of key in a list of the state, adding it if it is new. """
+    number = state[index_name].get(key)
+    if number is None:
+        number = len(state[list_name])
+        state[index_name][key] = number
+        state[list_name].append(key)
+    return number
+
+def _pad(array, length):
+    """ Returns array with zero rows added at the end up to length rows. """
+    if array.shape[0] == length:
+        return array
+    padding = numpy.zeros((length - array.shape[0],) + array.shape[1:])
+    return numpy.concatenate([array, padding])
@@ -10,14 +10,14 @@ the website Digital Ocean.
 Creator: Shaumik Daityari
 Implementor: Sebastian Guo
 """
-from nltk.stem.wordnet import WordNetLemmatizer
-from nltk.corpus import twitter_samples, stopwords
-from nltk.tag import pos_tag
-from nltk.tokenize import word_tokenize
-from nltk import FreqDist, classify, NaiveBayesClassifier
-import re, string, random, pandas
+import os, re, string, random, pickle, collections, functools, multiprocessing
+import numpy
 import assertions
 
+# NLTK's corpus readers, tagger and tokenizers are slow to import, so they are
+# imported inside the functions that use them. Importing this module is cheap
+# and only runs that actually score or train pay for NLTK.
+
 def _remove_noise(tokenized_tweet, stop_words = ()):
     """
     Function to return a cleaned up a tokenized tweet string. Gets rid of URLs,
@@ -29,6 +29,8 @@ def _remove_noise(tokenized_tweet, stop_words = ()):
     Parameter stop_words: words that will be considered unecessary for the training
     model and removed.
     """
+    from nltk.stem.wordnet import WordNetLemmatizer
+    from nltk.tag import pos_tag
     cleaned_tokens = []
 
     for token, tag in pos_tag(tokenized_tweet):
@@ -82,30 +84,77 @@ def _calc_word_freq(cleaned_tweet_tokens_list, num_comm_words):
     then prints out the most common words (the number of different words depends on
     input parameter)
     """
+    from nltk import FreqDist
     all_pos_words = _get_all_words(cleaned_tweet_tokens_list)
     freq_dist_pos = FreqDist(all_pos_words)
     print(freq_dist_pos.most_common(num_comm_words))
 
-def train_classifier():
+def train_classifier(train_size=7000, processes=None):
     """
     Function to prepare data, train and return a Naive Bayes Classifier model.
     First, function prepares tweet data to be fed as a datset for training a model.
     The data from twitter is pre-labeled tweets with positive or negative
     sentiment. It then tokenizes the tweets, lemmatizes the tokens, and formats
     the tokens to be fed into the training function.
+
+    Parameter train_size: how much of the shuffled dataset to train on. The rest
+    is held out as test data.
+    Precondition: must be an integer (number of tweets) or a float between 0 and
+    1 (fraction of tweets).
+
+    Parameter processes: the number of processes used to clean the tweets.
+    Precondition: must be a positive integer or None (one per CPU).
+    """
+    counts, test_data = train_nb_counts(train_size, processes)
+    classifier = build_classifier(counts)
+    # print("Accuracy is:", classify.accuracy(classifier, test_data))
+    return classifier
+
+def train_nb_counts(train_size=7000, processes=None):
+    """
+    Returns a tuple (counts, test_data). counts holds the Naive Bayes counts
+    for the training part of the twitter corpus (see new_nb_counts()) and can
+    later be updated with update_nb_counts() or add_labelled_comments() without
+    going through the corpus again. test_data is the held out part of the
+    corpus as a list of (tweet dict, label) tuples.
+
+    Parameter train_size: how much of the shuffled dataset to train on.
+    Precondition: must be an integer (number of tweets) or a float between 0 and
+    1 (fraction of tweets).
+
+    Parameter processes: the number of processes used to clean the tweets.
+    Precondition: must be a positive integer or None (one per CPU).
     """
-    stop_words = stopwords.words('english')
+    assertions.assert_train_size(train_size)
+    dataset = prepare_twitter_dataset(processes)
+    if type(train_size) == float:
+        train_size = int(len(dataset) * train_size)
+    train_data = dataset[:train_size]
+    test_data = dataset[train_size:]
+    counts = new_nb_counts()
+    update_nb_counts(counts, train_data)
+    return counts, test_data
+
+def prepare_twitter_dataset(processes=None):
+    """
+    Returns a shuffled list of (tweet dict, label) tuples made from the positive
+    and negative tweets of the NLTK twitter corpus. The tweets are cleaned in a
+    process pool since _remove_noise() is by far the slowest part of training.
+
+    Parameter processes: the number of processes used to clean the tweets.
+    Precondition: must be a positive integer or None (one per CPU).
+    """
+    from nltk.corpus import twitter_samples, stopwords
+    stop_words = frozenset(stopwords.words('english'))
     # Tokenizes tweets and stores all tweets in a 2D list. Individual tweets are 1D lists.
     # [[tweet 1 token, tweet 1 token], [tweet 2 token, 2 tweet token, tweet 2 token]]
     positive_tweets_tokenized = twitter_samples.tokenized('positive_tweets.json')
     negative_tweets_tokenized = twitter_samples.tokenized('negative_tweets.json')
-    positive_cleaned_tweets_token_list = []
-    negative_cleaned_tweets_token_list = []
     # For each tokenized tweet, clean up noise and lemmatize the tokens.
-    for tokenized_tweet in positive_tweets_tokenized:
-        positive_cleaned_tweets_token_list.append(_remove_noise(tokenized_tweet, stop_words))
-    for tokenized_tweet in negative_tweets_tokenized:
-        negative_cleaned_tweets_token_list.append(_remove_noise(tokenized_tweet, stop_words))
+    positive_cleaned_tweets_token_list = _clean_token_lists(positive_tweets_tokenized,
+        stop_words, processes)
+    negative_cleaned_tweets_token_list = _clean_token_lists(negative_tweets_tokenized,
+        stop_words, processes)
     # _calc_word_freq(positive_tweets_tokenized, 15)
 
     positive_tweets_token_for_model = _get_tweets_for_model(positive_cleaned_tweets_token_list)
@@ -118,23 +167,153 @@ def train_classifier():
                          for tweet_dict in negative_tweets_token_for_model]
     dataset = positive_dataset + negative_dataset
     random.shuffle(dataset)
+    return dataset
 
-    train_data = dataset[:7000]
-    test_data = dataset[7000:]
-    classifier = NaiveBayesClassifier.train(train_data)
-    # print("Accuracy is:", classify.accuracy(classifier, test_data))
-    return classifier
+def _clean_token_lists(tokenized_list, stop_words, processes=None):
+    """
+    Runs _remove_noise() on every tokenized tweet/comment in tokenized_list and
+    returns the cleaned lists in the same order. With more than one process,
+    the lists are split into chunks and cleaned in a process pool.
+    """
+    if processes == 1:
+        return [_remove_noise(tokens, stop_words) for tokens in tokenized_list]
+    num_processes = processes or os.cpu_count() or 1
+    with multiprocessing.Pool(num_processes) as pool:
+        chunksize = max(1, len(tokenized_list) // (num_processes * 4))
+        return pool.map(functools.partial(_remove_noise, stop_words=stop_words),
+            tokenized_list, chunksize)
+
+def _tokenize_comment(comment):
+    """ Tokenizes a comment the same way manager_cmt_sentiment() does. """
+    from nltk.tokenize import word_tokenize
+    return word_tokenize(comment)
+
+def new_nb_counts():
+    """
+    Returns an empty dictionary of Naive Bayes counts. The counts are the
+    sufficient statistics of a Naive Bayes Classifier, so adding new labelled
+    data only adds to them and build_classifier() turns them into a classifier
+    without looking at any of the old data again.
+
+    "label_freq": a Counter with the number of samples for each label.
+    "feature_freq": a dictionary with (label, feature) keys and Counter values
+    counting every value the feature took for that label.
+    "feature_values": a dictionary with feature keys and sets of values.
+    """
+    return {"label_freq": collections.Counter(),
+        "feature_freq": collections.defaultdict(collections.Counter),
+        "feature_values": collections.defaultdict(set)}
+
+def update_nb_counts(counts, labelled_featuresets):
+    """
+    Adds labelled samples to counts in place and returns counts.
+
+    Parameter counts: Naive Bayes counts created by new_nb_counts().
+    Precondition: must be a dictionary with the keys of new_nb_counts().
+
+    Parameter labelled_featuresets: the samples to add.
+    Precondition: must be an iterable of (feature dict, label) tuples.
+    """
+    assertions.assert_nb_counts(counts)
+    label_freq = counts["label_freq"]
+    feature_freq = counts["feature_freq"]
+    feature_values = counts["feature_values"]
+    for featureset, label in labelled_featuresets:
+        label_freq[label] += 1
+        for fname, fval in featureset.items():
+            feature_freq[label, fname][fval] += 1
+            feature_values[fname].add(fval)
+    return counts
+
+def build_classifier(counts):
+    """
+    Returns a Naive Bayes Classifier made from counts. The classifier is the
+    same one NaiveBayesClassifier.train() returns for the samples that were
+    added to counts, but counts itself is left unchanged so it can keep being
+    updated.
+
+    Parameter counts: Naive Bayes counts created by new_nb_counts().
+    Precondition: must be a dictionary with the keys of new_nb_counts().
+    """
+    from nltk import NaiveBayesClassifier, FreqDist
+    from nltk.probability import ELEProbDist
+    assertions.assert_nb_counts(counts)
+    label_freq = counts["label_freq"]
+    feature_freq = counts["feature_freq"]
+    fnames = counts["feature_values"].keys()
+    # Like NaiveBayesClassifier.train(), a feature that is missing from a sample
+    # counts as the value None.
+    has_none = set()
+    feature_probdist = {}
+    for label in label_freq:
+        num_samples = label_freq[label]
+        for fname in fnames:
+            freqdist = FreqDist(feature_freq.get((label, fname), ()))
+            if num_samples - freqdist.N() > 0:
+                freqdist[None] += num_samples - freqdist.N()
+                has_none.add(fname)
+            feature_probdist[label, fname] = freqdist
+    for (label, fname), freqdist in feature_probdist.items():
+        bins = len(counts["feature_values"][fname]) + (fname in has_none and
+            None not in counts["feature_values"][fname])
+        feature_probdist[label, fname] = ELEProbDist(freqdist, bins=bins)
+    label_probdist = ELEProbDist(FreqDist(label_freq))
+    return NaiveBayesClassifier(label_probdist, feature_probdist)
+
+def add_labelled_comments(counts, labelled_file, processes=None):
+    """
+    Adds a batch of hand-labelled Reddit comments to counts and returns counts.
+    The comments are tokenized and cleaned like the training tweets, so the
+    batch can be added to counts made from the twitter corpus.
+
+    Parameter counts: Naive Bayes counts created by new_nb_counts() or
+    train_nb_counts().
+    Precondition: must be a dictionary with the keys of new_nb_counts().
+
+    Parameter labelled_file: a file with hand-labelled comments.
+    Precondition: must be a DataFrame with the headers "comment" and "label".
+    The labels must be either "Positive" or "Negative".
+
+    Parameter processes: the number of processes used to clean the comments.
+    Precondition: must be a positive integer or None (one per CPU).
+    """
+    from nltk.corpus import stopwords
+    assertions.assert_labelled_comment_file_format(labelled_file)
+    stop_words = frozenset(stopwords.words('english'))
+    tokenized_list = [_tokenize_comment(comment) for comment in labelled_file["comment"]]
+    cleaned_list = _clean_token_lists(tokenized_list, stop_words, processes)
+    return update_nb_counts(counts, zip(_get_tweets_for_model(cleaned_list),
+        labelled_file["label"]))
+
+def save_nb_counts(counts, path):
+    """ Pickles the Naive Bayes counts to the file at path. """
+    assertions.assert_nb_counts(counts)
+    with open(path, "wb") as count_file:
+        pickle.dump(counts, count_file)
+
+def load_nb_counts(path):
+    """ Returns the Naive Bayes counts pickled by save_nb_counts(). """
+    with open(path, "rb") as count_file:
+        counts = pickle.load(count_file)
+    assertions.assert_nb_counts(counts)
+    return counts
 
 def manager_cmt_sentiment(classifier, cmt_lvl_rost_ment_reader, global_ID,
-    roster_list, mgmt_list, team):
+    roster_list, mgmt_list, team, token_cache=None, prob_path=None, store=None):
     """
     Function to analyze the sentiment of comments that contain mentions of management.
     The function then finds the number of positive and negative comments for
     a manager in a dictionary. The file that is analyzed will be a csv file
     created from function comment_roster_glob() which sorts out comments by global ID.
 
-    Parameter classifier: a trained model to analyze sentiment.
-    Precondition: an object from the Naive Bayes Classiifer class.
+    A comment counts as positive if the classifier's probability of "Positive"
+    is at least one half, which is the label classifier.classify() returns. The
+    probabilities themselves are found by comment_probabilities() and can be
+    saved so other cutoffs can be applied later without running the classifier.
+
+    Parameter classifier: a trained model to analyze sentiment, or the socket
+    path of a scoring service started with sentiment_server.py.
+    Precondition: an object from the Naive Bayes Classiifer class or a string.
 
     Parameter cmt_lvl_rost_ment_reader: a csv file created from comment_roster_glob().
     Contains comments for a global ID.
@@ -151,23 +330,181 @@ def manager_cmt_sentiment(classifier, cmt_lvl_rost_ment_reader, global_ID,
 
     Parameter team: the basketball team the function looks at.
     Precondition: must be a string.
+
+    Parameter token_cache: if given, the "clean" tokens of a comment are taken
+    from it, or computed once and stored in it, instead of tokenizing the
+    comment for every manager it mentions.
+    Precondition: must be None or a token cache from module token_cache.
+
+    Parameter prob_path: if given, the probability table of the comments is
+    saved to this path with save_probabilities().
+    Precondition: must be None or a string.
+
+    Parameter store: the comment store the "comment_ID" column refers to, if
+    cmt_lvl_rost_ment_reader has comment IDs instead of a "comment" column. Only
+    the text of the comments that are classified is read from it.
+    Precondition: must be None or a comment store from module comment_store.
+    """
+    prob_table = comment_probabilities(classifier, cmt_lvl_rost_ment_reader,
+        global_ID, roster_list, mgmt_list, team, token_cache, store)
+    if prob_path is not None:
+        save_probabilities(prob_table, prob_path)
+    return sentiment_counts(prob_table)
+
+def comment_probabilities(classifier, cmt_lvl_rost_ment_reader, global_ID,
+    roster_list, mgmt_list, team, token_cache=None, store=None):
+    """
+    Returns a probability table for the comments of a global ID that mention
+    management. Every such comment is classified once, however many managers
+    it mentions. The table is a dictionary with the keys:
+
+    "local_ID": a numpy int64 array with the local ID of every comment.
+    "prob_pos": a numpy float64 array with the probability that the comment is
+    positive. The probability that it is negative is 1 - prob_pos.
+    "mentions": a numpy boolean matrix with a row for every comment and a
+    column for every manager, marking which managers a comment mentions.
+    "mgmt_list": the managers in the order of the columns of "mentions".
+
+    The parameters are the same as for manager_cmt_sentiment().
     """
     _assertion_mgmt_cmt_sent(classifier, cmt_lvl_rost_ment_reader, global_ID, roster_list, mgmt_list, team)
-    sentiment_dict = {}
     # Find row indices in comment mention file that have mentions of managers and
     # run sentiment analysis on those comments
-    for manager in mgmt_list:
-        sentiment_dict[manager] = [0,0]
-        for row_ind in cmt_lvl_rost_ment_reader.index[cmt_lvl_rost_ment_reader[manager] == 1].tolist():
-            comment = cmt_lvl_rost_ment_reader["comment"][row_ind]
-            tokenized_comment = _remove_noise(word_tokenize(comment))
-            sentiment = classifier.classify(dict([token, True] for token in tokenized_comment))
-            if sentiment == "Positive":
-                sentiment_dict[manager][0] += 1
-            else:
-                sentiment_dict[manager][1] += 1
+    mentions = numpy.zeros((len(cmt_lvl_rost_ment_reader), len(mgmt_list)), dtype=bool)
+    for col_ind, manager in enumerate(mgmt_list):
+        mentions[:, col_ind] = (cmt_lvl_rost_ment_reader[manager] == 1).to_numpy()
+    row_inds = numpy.flatnonzero(mentions.any(axis=1))
+    comments = [_cached_comment_tokens(token_cache, cmt_lvl_rost_ment_reader,
+        cmt_lvl_rost_ment_reader.index[row_ind], store) for row_ind in row_inds]
+    return {"local_ID": cmt_lvl_rost_ment_reader["local_ID"].to_numpy()[row_inds].astype(numpy.int64),
+        "prob_pos": numpy.array(prob_positive(classifier, comments), dtype=numpy.float64),
+        "mentions": mentions[row_inds], "mgmt_list": list(mgmt_list)}
+
+def sentiment_counts(prob_table, pos_cutoff=0.5, neg_cutoff=0.5):
+    """
+    Returns a dictionary with managers as keys and [positive comments, negative
+    comments] as values, counted from a probability table. A comment is positive
+    if its probability of being positive is at least pos_cutoff and negative if
+    it is below neg_cutoff. With neg_cutoff less than pos_cutoff, the comments
+    in between are neutral and not counted. The probabilities are kept in full
+    (float64) precision, so the default cutoffs give the same counts as the
+    labels of classifier.classify().
+
+    Parameter prob_table: a probability table from comment_probabilities() or
+    load_probabilities().
+    Precondition: must be a dictionary with the keys of a probability table.
+
+    Parameter pos_cutoff: the lowest probability of a positive comment.
+    Precondition: must be a number between 0 and 1.
+
+    Parameter neg_cutoff: the probability that negative comments are below.
+    Precondition: must be a number between 0 and 1 and at most pos_cutoff.
+    """
+    assertions.assert_prob_table(prob_table)
+    assertions.assert_cutoffs(pos_cutoff, neg_cutoff)
+    mentions = prob_table["mentions"]
+    pos_cmts = mentions[prob_table["prob_pos"] >= pos_cutoff].sum(axis=0)
+    neg_cmts = mentions[prob_table["prob_pos"] < neg_cutoff].sum(axis=0)
+    sentiment_dict = {}
+    for col_ind, manager in enumerate(prob_table["mgmt_list"]):
+        sentiment_dict[manager] = [int(pos_cmts[col_ind]), int(neg_cmts[col_ind])]
     return sentiment_dict
 
+def save_probabilities(prob_table, path):
+    """
+    Saves a probability table from comment_probabilities() to a numpy file,
+    creating its folder (such as Teams/<team>/mgmt_sentiment_probs_by_game) if
+    it does not exist.
+    """
+    assertions.assert_prob_table(prob_table)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    numpy.savez(path, local_ID=prob_table["local_ID"], prob_pos=prob_table["prob_pos"],
+        mentions=prob_table["mentions"], mgmt_list=numpy.array(prob_table["mgmt_list"], dtype=str))
+
+def load_probabilities(path):
+    """ Returns the probability table saved by save_probabilities() at path. """
+    with numpy.load(path) as arrays:
+        return {"local_ID": arrays["local_ID"], "prob_pos": arrays["prob_pos"],
+            "mentions": arrays["mentions"], "mgmt_list": arrays["mgmt_list"].tolist()}
+
+def _cached_comment_tokens(token_cache, cmt_lvl_rost_ment_reader, row_ind, store=None):
+    """
+    Returns the "clean" tokens of the comment in row row_ind from the token
+    cache, computing and storing them first if needed. Without a token cache,
+    returns the comment string itself.
+    """
+    if token_cache is None:
+        return _comment_text(cmt_lvl_rost_ment_reader, row_ind, store)
+    import token_cache as tok_cache
+    global_ID = cmt_lvl_rost_ment_reader["global_ID"][row_ind]
+    local_ID = cmt_lvl_rost_ment_reader["local_ID"][row_ind]
+    tokens = tok_cache.get_tokens(token_cache, "clean", global_ID, local_ID)
+    if tokens is None:
+        tokens = _remove_noise(_tokenize_comment(_comment_text(cmt_lvl_rost_ment_reader,
+            row_ind, store)))
+        tok_cache.set_tokens(token_cache, "clean", global_ID, local_ID, tokens)
+    return tokens
+
+def _comment_text(cmt_lvl_rost_ment_reader, row_ind, store):
+    """
+    Returns the text of the comment in row row_ind, from the "comment" column or
+    from store through the "comment_ID" column.
+    """
+    if "comment" in cmt_lvl_rost_ment_reader.columns:
+        return cmt_lvl_rost_ment_reader["comment"][row_ind]
+    assert store is not None, "The comments are comment IDs but there is no comment store."
+    import comment_store
+    return comment_store.texts(store, [cmt_lvl_rost_ment_reader["comment_ID"][row_ind]])[0]
+
+def classify_comments(classifier, comments):
+    """
+    Returns a list with the sentiment label ("Positive" or "Negative") of every
+    comment in comments. If classifier is a socket path, the comments are sent
+    as one batch to the scoring service in sentiment_server.py instead of being
+    classified in this process.
+
+    Parameter classifier: a trained model to analyze sentiment, or the socket
+    path of a scoring service.
+    Precondition: an object from the Naive Bayes Classiifer class or a string.
+
+    Parameter comments: the comments to classify. A comment is either its text
+    or its already cleaned tokens (the "clean" layer of module token_cache).
+    Precondition: must be a list with string or list of string entries.
+    """
+    if len(comments) == 0:
+        return []
+    if type(classifier) == str:
+        import sentiment_server
+        return sentiment_server.request_labels(comments, classifier)
+    return classifier.classify_many([_comment_features(comment) for comment in comments])
+
+def prob_positive(classifier, comments):
+    """
+    Returns a list with the probability that each comment in comments is
+    positive. Works like classify_comments(), including the use of a scoring
+    service when classifier is a socket path.
+    """
+    if len(comments) == 0:
+        return []
+    if type(classifier) == str:
+        import sentiment_server
+        return sentiment_server.request_probabilities(comments, classifier)
+    prob_dists = classifier.prob_classify_many([_comment_features(comment)
+        for comment in comments])
+    return [prob_dist.prob("Positive") for prob_dist in prob_dists]
+
+def _comment_features(comment):
+    """
+    Returns the feature dictionary of a Reddit comment. The comment is tokenized,
+    cleaned and lemmatized, and every token is assigned a True value. If the
+    comment is a list, it already holds the cleaned tokens.
+    """
+    if type(comment) == list:
+        tokenized_comment = comment
+    else:
+        tokenized_comment = _remove_noise(_tokenize_comment(comment))
+    return dict([token, True] for token in tokenized_comment)
+
 def _assertion_mgmt_cmt_sent(classifier, cmt_lvl_rost_ment_reader, global_ID,
     roster_list, mgmt_list, team):
     """ Assertions for function manager_cmt_sentiment() """
@@ -0,0 +1,210 @@
+"""
+Module with an optional local scoring service for comment sentiment. The service
+holds one trained Naive Bayes Classifier in memory and listens on a Unix socket,
+so every team pipeline and analysis script can share the same warm model instead
+of each process training or loading its own copy.
+
+Requests from all clients are collected into micro-batches: the service waits
+until it has MAX_BATCH comments or MAX_WAIT seconds have passed since the first
+request of the batch and then classifies the whole batch at once.
+
+The protocol is one JSON object per line. A request is {"comments": [...]}, where
+a comment is either its text or its list of cleaned tokens, and the answer is
+{"labels": [...], "probs": [...]} in the same order, where "probs" holds the
+probability that each comment is positive, or {"error": "..."} if the batch
+could not be classified.
+
+Run the service with
+    python sentiment_server.py --socket /tmp/nba_reddit_sentiment.sock
+and pass the socket path to main.py with --sentiment-socket, or anywhere a
+classifier is expected by sentiment_analysis.manager_cmt_sentiment().
+
+Creator: Sebastian Guo
+"""
+import argparse, asyncio, functools, json, os, socket
+import assertions
+import sentiment_analysis
+
+DEFAULT_SOCKET = "/tmp/nba_reddit_sentiment.sock"
+# Largest number of comments classified in one batch.
+MAX_BATCH = 512
+# Longest time in seconds a request waits for other requests to join its batch.
+MAX_WAIT = 0.01
+
+def request_labels(comments, socket_path=DEFAULT_SOCKET):
+    """
+    Sends comments to the scoring service and returns a list with the sentiment
+    label ("Positive" or "Negative") of each comment. Raises an Exception if the
+    service could not classify the comments.
+
+    Parameter comments: the comments to classify, either as text or as cleaned
+    tokens (see sentiment_analysis.classify_comments()).
+    Precondition: must be a list with string or list of string entries.
+
+    Parameter socket_path: the Unix socket the scoring service listens on.
+    Precondition: must be a string.
+    """
+    return _request(comments, socket_path)["labels"]
+
+def request_probabilities(comments, socket_path=DEFAULT_SOCKET):
+    """
+    Sends comments to the scoring service and returns a list with the
+    probability that each comment is positive. Takes the same parameters as
+    request_labels().
+    """
+    return _request(comments, socket_path)["probs"]
+
+def _request(comments, socket_path):
+    """ Sends one request to the scoring service and returns the answer. """
+    assertions.assert_comment_list(comments)
+    assertions.assert_socket_path(socket_path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps({"comments": comments}).encode() + b"\n")
+        with sock.makefile("rb") as sock_file:
+            answer = json.loads(sock_file.readline())
+    if "error" in answer:
+        raise Exception("The scoring service failed: " + answer["error"])
+    return answer
+
+def serve(classifier, socket_path=DEFAULT_SOCKET, max_batch=MAX_BATCH,
+    max_wait=MAX_WAIT):
+    """
+    Starts the scoring service and blocks until it is interrupted.
+
+    Parameter classifier: a trained model to analyze sentiment.
+    Precondition: an object from the Naive Bayes Classiifer class.
+
+    Parameter socket_path: the Unix socket to listen on. A stale socket file at
+    this path is removed.
+    Precondition: must be a string.
+
+    Parameter max_batch: the largest number of comments classified at once.
+    Precondition: must be an integer greater than zero.
+
+    Parameter max_wait: the longest time in seconds to wait for a batch to fill.
+    Precondition: must be a number greater than or equal to zero.
+    """
+    assertions.assert_classifier(classifier)
+    assertions.assert_socket_path(socket_path)
+    assert type(max_batch) == int and max_batch > 0, \
+        repr(max_batch) + " is not an integer greater than zero."
+    assert max_wait >= 0, repr(max_wait) + " is less than zero."
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    try:
+        asyncio.run(_serve(classifier, socket_path, max_batch, max_wait))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+async def _serve(classifier, socket_path, max_batch, max_wait):
+    """ Runs the Unix socket server and the batching loop together. """
+    queue = asyncio.Queue()
+    server = await asyncio.start_unix_server(
+        functools.partial(_handle_client, queue), path=socket_path)
+    batcher = asyncio.ensure_future(_batch_loop(classifier, queue, max_batch, max_wait))
+    print("Scoring service listening on " + socket_path)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batcher.cancel()
+
+async def _handle_client(queue, reader, writer):
+    """
+    Reads requests from one client, queues them for the batching loop and writes
+    back the answers in order.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                comments = json.loads(line)["comments"]
+                assertions.assert_comment_list(comments)
+            except Exception as error:
+                answer = {"error": "Bad request: " + repr(error)}
+            else:
+                future = loop.create_future()
+                await queue.put((comments, future))
+                try:
+                    labels, probs = await future
+                    answer = {"labels": labels, "probs": probs}
+                except Exception as error:
+                    answer = {"error": repr(error)}
+            writer.write(json.dumps(answer).encode() + b"\n")
+            await writer.drain()
+    finally:
+        writer.close()
+
+async def _batch_loop(classifier, queue, max_batch, max_wait):
+    """
+    Takes requests from the queue, groups them into micro-batches and classifies
+    every batch in a worker thread so the server keeps accepting requests.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await queue.get()]
+        size = len(batch[0][0])
+        deadline = loop.time() + max_wait
+        while size < max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                request = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(request)
+            size += len(request[0])
+        comments = [comment for request, future in batch for comment in request]
+        try:
+            labels, probs = await loop.run_in_executor(None, _score_comments,
+                classifier, comments)
+        except Exception as error:
+            for request, future in batch:
+                future.set_exception(error)
+            continue
+        start = 0
+        for request, future in batch:
+            end = start + len(request)
+            future.set_result((labels[start:end], probs[start:end]))
+            start = end
+
+def _score_comments(classifier, comments):
+    """
+    Returns a tuple (labels, probs) with the label and the probability of being
+    positive of every comment, using one prob_classify_many() call.
+    """
+    prob_dists = classifier.prob_classify_many([sentiment_analysis._comment_features(comment)
+        for comment in comments])
+    return ([prob_dist.max() for prob_dist in prob_dists],
+        [prob_dist.prob("Positive") for prob_dist in prob_dists])
+
+def _parse_args(argv=None):
+    """ Parses the command line arguments of the scoring service. """
+    parser = argparse.ArgumentParser(description="Local sentiment scoring service.")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET,
+        help="Unix socket to listen on")
+    parser.add_argument("--counts",
+        help="Naive Bayes counts saved by sentiment_analysis.save_nb_counts(); " +
+        "if not given, the classifier is trained on the twitter corpus")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-wait", type=float, default=MAX_WAIT)
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    args = _parse_args()
+    if args.counts is not None:
+        print("Loading classifier.")
+        classifier = sentiment_analysis.build_classifier(
+            sentiment_analysis.load_nb_counts(args.counts))
+    else:
+        print("Training classifier.")
+        classifier = sentiment_analysis.train_classifier()
+    serve(classifier, args.socket, args.max_batch, args.max_wait)
@@ -0,0 +1,78 @@
+"""
+Tests of module comment_store: the store of a small raw csv file gives every
+different comment one ID, gives back the text of the csv file, follows the csv
+file when it changes, and is the same as the store of the DataFrame.
+
+Run with
+    python -m pytest -q test_comment_store.py
+
+Creator: Sebastian Guo
+"""
+import os
+import numpy
+import pandas
+import comment_store
+
+RAW = {"global_ID": [16516, 16516, 16498, 16498, 16498, 16516],
+    "local_ID": [0, 1, 0, 1, 0, 2],
+    "comment": ["Harris was clutch", None, "Trust the process", "Embiid again",
+        "Trust the process", "Brett Brown's rotations"]}
+
+def _write_raw_csv(path, raw):
+    """ Writes a raw csv file with the columns of raw. """
+    pandas.DataFrame(raw).to_csv(path, index=False)
+
+def _touch(path):
+    """ Moves the modification time of path one second on. """
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+
+def test_round_trip(tmp_path):
+    """ Every (global_ID, local_ID) has one comment ID, the first row with its key. """
+    path = str(tmp_path / "raw.csv")
+    _write_raw_csv(path, RAW)
+    store = comment_store.open_comment_store(path)
+    ids = comment_store.comment_ids(store, RAW["global_ID"], RAW["local_ID"])
+    assert ids.tolist() == [0, 1, 2, 3, 2, 5]
+    assert comment_store.texts(store, ids) == [comment if ind != 4 else RAW["comment"][2]
+        for ind, comment in enumerate(RAW["comment"])]
+    assert comment_store.comment_ids(store, [16498, 16701], [5, 0]).tolist() == [-1, -1]
+    assert numpy.all(numpy.diff(store["keys"]) > 0)
+
+def test_with_text(tmp_path):
+    """ with_text() puts the text back in the place of the comment_ID column. """
+    path = str(tmp_path / "raw.csv")
+    _write_raw_csv(path, RAW)
+    store = comment_store.open_comment_store(path)
+    table = pandas.DataFrame({"global_ID": [16498, 16516], "local_ID": [1, 0],
+        "comment_ID": comment_store.comment_ids(store, [16498, 16516], [1, 0]),
+        "Joel Embiid": [1, 0]})
+    exported = comment_store.with_text(table, store)
+    assert list(exported.columns) == ["global_ID", "local_ID", "comment", "Joel Embiid"]
+    assert exported["comment"].tolist() == ["Embiid again", "Harris was clutch"]
+    assert "comment_ID" in table.columns
+
+def test_follows_csv_changes(tmp_path):
+    """ A store opened after the csv file changed has the new comments. """
+    path = str(tmp_path / "raw.csv")
+    _write_raw_csv(path, RAW)
+    comment_store.open_comment_store(path)
+    edited = {name: column + [new] for (name, column), new in
+        zip(RAW.items(), [16701, 0, "Tank for the pick"])}
+    edited["comment"][0] = "Harris was not clutch"
+    _write_raw_csv(path, edited)
+    _touch(path)
+    store = comment_store.open_comment_store(path)
+    ids = comment_store.comment_ids(store, [16516, 16701], [0, 0])
+    assert comment_store.texts(store, ids) == ["Harris was not clutch", "Tank for the pick"]
+
+def test_csv_matches_frame(tmp_path):
+    """ The store of the csv file is the same as the store of its DataFrame. """
+    path = str(tmp_path / "raw.csv")
+    _write_raw_csv(path, RAW)
+    from_csv = comment_store.open_comment_store(path)
+    from_frame = comment_store.from_frame(pandas.read_csv(path))
+    for name in ["keys", "key_ids", "offsets", "null"]:
+        assert numpy.array_equal(numpy.asarray(from_csv[name]), numpy.asarray(from_frame[name])), name
+    assert comment_store.texts(from_csv, from_csv["key_ids"]) == \
+        comment_store.texts(from_frame, from_frame["key_ids"])
@@ -0,0 +1,95 @@
+"""
+Tests of module mention_index: the index of a small mention table has the
+comments of every person that a scan of the table finds, is the same after it
+is saved and loaded, follows the table when it changes, and answers all_of(),
+any_of() and filter_games() like the table does.
+
+Run with
+    python -m pytest -q test_mention_index.py
+
+Creator: Sebastian Guo
+"""
+import numpy
+import pandas
+import comment_store
+import mention_index
+
+ROSTER_LIST = ["Joel Embiid", "Tobias Harris", "Brett Brown"]
+MENTIONS = {"global_ID": [16498, 16498, 16498, 16516, 16516, 16701, 16701],
+    "local_ID": [0, 1, 300, 0, 2, 5, 70000],
+    "comment_ID": [0, 1, 2, 3, 4, 5, 6],
+    "Joel Embiid": [1, 0, 1, 1, 0, 0, 1],
+    "Tobias Harris": [1, 1, 0, 0, 0, 0, 1],
+    "Brett Brown": [0, 0, 0, 0, 0, 0, 0]}
+
+def _read_mentions(tmp_path, mentions):
+    """ Writes the mention table to a csv file and reads it back. """
+    path = str(tmp_path / "cmt_lvl_roster_mentions.csv")
+    pandas.DataFrame(mentions).to_csv(path, index=False)
+    return pandas.read_csv(path)
+
+def _scan(table, person):
+    """ Returns the sorted keys of the comments of the table mentioning person. """
+    flags = table[person].to_numpy() == 1
+    return numpy.unique(comment_store.comment_keys(table["global_ID"].to_numpy()[flags],
+        table["local_ID"].to_numpy()[flags]))
+
+def _assert_same_index(index, other):
+    """ Asserts two mention indexes have the same people and arrays. """
+    assert index["people"] == other["people"]
+    for name in ["counts", "offsets", "data"]:
+        assert numpy.array_equal(index[name], other[name]), name
+
+def test_round_trip(tmp_path):
+    """ A saved and loaded index has the arrays and postings of the built index. """
+    table = _read_mentions(tmp_path, MENTIONS)
+    index = mention_index.build_mention_index(table, ROSTER_LIST)
+    path = str(tmp_path / "mention_index.npz")
+    mention_index.save_mention_index(index, path)
+    loaded = mention_index.load_mention_index(path)
+    _assert_same_index(index, loaded)
+    for person in ROSTER_LIST:
+        assert numpy.array_equal(mention_index.postings(loaded, person), _scan(table, person))
+    assert loaded["counts"].tolist() == [4, 3, 0]
+
+def test_encode_decode():
+    """ Keys with deltas of one to nine bytes decode to themselves. """
+    keys = numpy.array([0, 1, 127, 128, 16384, (16498 << 32) | 70000, (1 << 62) + 5],
+        dtype=numpy.int64)
+    assert numpy.array_equal(mention_index.decode_postings(mention_index.encode_postings(keys)), keys)
+    assert len(mention_index.decode_postings(mention_index.encode_postings(
+        numpy.zeros(0, dtype=numpy.int64)))) == 0
+
+def test_follows_table_changes(tmp_path):
+    """ The index of a changed table is the same as one built from scratch for it. """
+    path = str(tmp_path / "mention_index.npz")
+    mention_index.save_mention_index(mention_index.build_mention_index(
+        _read_mentions(tmp_path, MENTIONS), ROSTER_LIST), path)
+    edited = {name: list(column) for name, column in MENTIONS.items()}
+    edited["Brett Brown"][4] = 1
+    edited["Joel Embiid"][0] = 0
+    table = _read_mentions(tmp_path, edited)
+    mention_index.save_mention_index(mention_index.build_mention_index(table, ROSTER_LIST), path)
+    loaded = mention_index.load_mention_index(path)
+    for person in ROSTER_LIST:
+        assert numpy.array_equal(mention_index.postings(loaded, person), _scan(table, person))
+    assert loaded["counts"].tolist() == [3, 3, 1]
+
+def test_queries(tmp_path):
+    """ all_of(), any_of() and filter_games() agree with a scan of the table. """
+    table = _read_mentions(tmp_path, MENTIONS)
+    index = mention_index.build_mention_index(table, ROSTER_LIST)
+    embiid, harris = _scan(table, "Joel Embiid"), _scan(table, "Tobias Harris")
+    assert numpy.array_equal(mention_index.all_of(index, ["Joel Embiid", "Tobias Harris"]),
+        numpy.intersect1d(embiid, harris))
+    assert numpy.array_equal(mention_index.any_of(index, ["Joel Embiid", "Tobias Harris"]),
+        numpy.union1d(embiid, harris))
+    assert len(mention_index.all_of(index, ["Brett Brown", "Joel Embiid"])) == 0
+    game_results = pandas.DataFrame({"Result": ["Win", "Lose", "N/A"],
+        "Game Date": pandas.to_datetime(["2020-01-02", "2020-01-20", None])},
+        index=pandas.Index([16498, 16516, 16701]))
+    lost = mention_index.filter_games(embiid, game_results, result="Lose")
+    assert mention_index.to_frame(lost).values.tolist() == [[16516, 0]]
+    january = mention_index.filter_games(embiid, game_results, start="2020-01-01",
+        end="2020-01-10")
+    assert (numpy.asarray(january) >> 32).tolist() == [16498, 16498]
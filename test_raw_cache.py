@@ -0,0 +1,89 @@
+"""
+Tests of module raw_cache: the cache of a small raw csv file gives back the
+same columns as the csv file, is rebuilt when the csv file changes, and is the
+same however many rows are converted at a time.
+
+Run with
+    python -m pytest -q test_raw_cache.py
+
+Creator: Sebastian Guo
+"""
+import os
+import numpy
+import pandas
+import raw_cache
+
+COMMENTS = ["Embiid was a monster tonight", None, "Trust the process!",
+    "Brett Brown's rotations again", "", "Harris été clutch"]
+
+def _write_raw_csv(path, comments):
+    """ Writes a raw csv file with the comments of two threads. """
+    pandas.DataFrame({"global_ID": [16498, 16498, 16498, 16516, 16516, 16516][:len(comments)],
+        "local_ID": list(range(len(comments))), "comment": comments,
+        "score": 1}).to_csv(path, index=False)
+
+def _touch(path):
+    """ Moves the modification time of path one second on. """
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+
+def _expected(path):
+    """ Returns the columns of the raw csv file, with None for missing comments. """
+    table = pandas.read_csv(path)
+    return table["global_ID"].tolist(), table["local_ID"].tolist(), \
+        [None if pandas.isna(comment) else comment for comment in table["comment"]]
+
+def test_round_trip(tmp_path):
+    """ The cache gives back the ID columns and the comments of the csv file. """
+    path = str(tmp_path / "raw.csv")
+    _write_raw_csv(path, COMMENTS)
+    cache = raw_cache.open_raw_cache(path)
+    global_IDs, local_IDs, comments = _expected(path)
+    assert cache["rows"] == len(COMMENTS)
+    assert numpy.array(cache["global_ID"]).tolist() == global_IDs
+    assert numpy.array(cache["local_ID"]).tolist() == local_IDs
+    assert raw_cache.comments(cache) == comments
+    assert raw_cache.comments(cache, [3, 1]) == [comments[3], None]
+    # The cache is up to date once it is built.
+    assert raw_cache.is_current(path)
+    data = raw_cache.load_raw_data(path)
+    assert list(data.columns) == raw_cache.RAW_COLUMNS
+    assert data["comment"].isna().tolist() == [comment is None for comment in comments]
+    assert data["comment"].dropna().tolist() == [comment for comment in comments
+        if comment is not None]
+
+def test_rebuilt_when_csv_changes(tmp_path):
+    """ A changed csv file makes the cache out of date, and it is built again. """
+    path = str(tmp_path / "raw.csv")
+    _write_raw_csv(path, COMMENTS)
+    raw_cache.open_raw_cache(path)
+    edited = list(COMMENTS)
+    edited[0] = "Embiid was a monster"
+    _write_raw_csv(path, edited)
+    _touch(path)
+    assert not raw_cache.is_current(path)
+    assert raw_cache.comments(raw_cache.open_raw_cache(path)) == _expected(path)[2]
+    assert raw_cache.is_current(path)
+
+def test_chunks_match_one_chunk(tmp_path):
+    """ A cache built a row at a time is the same as one built in one chunk. """
+    path = str(tmp_path / "raw.csv")
+    _write_raw_csv(path, COMMENTS)
+    raw_cache.build_raw_cache(path, chunksize=len(COMMENTS))
+    whole = {name: numpy.array(array) for name, array in raw_cache.open_raw_cache(path).items()
+        if name != "rows"}
+    raw_cache.build_raw_cache(path, chunksize=1)
+    rows = raw_cache.open_raw_cache(path)
+    for name in whole:
+        assert numpy.array_equal(whole[name], numpy.array(rows[name])), name
+
+def test_read_table(tmp_path):
+    """ read_table() gives back the csv file, and reads it again once it changes. """
+    path = str(tmp_path / "teams.csv")
+    pandas.DataFrame({"Team": ["76ers", "Knicks"]}).to_csv(path, index=False)
+    assert raw_cache.read_table(path)["Team"].tolist() == ["76ers", "Knicks"]
+    assert os.path.exists(path + ".pkl")
+    assert raw_cache.read_table(path)["Team"].tolist() == ["76ers", "Knicks"]
+    pandas.DataFrame({"Team": ["76ers", "Knicks", "Nets"]}).to_csv(path, index=False)
+    _touch(path)
+    assert raw_cache.read_table(path)["Team"].tolist() == ["76ers", "Knicks", "Nets"]
@@ -0,0 +1,115 @@
+"""
+Tests of module text_index: the index of a small raw csv file finds the words
+and phrases a scan of the comments finds, adds nothing when nothing changed, is
+rebuilt when the tokenizer changes, and is the same after an update with new,
+changed and removed threads as an index built from scratch.
+
+Run with
+    python -m pytest -q test_text_index.py
+
+Creator: Sebastian Guo
+"""
+import json, os
+import pandas
+import comment_store
+import extraction_v2
+import text_index
+
+RAW = {"global_ID": [16498, 16498, 16498, 16516, 16516, 16596],
+    "local_ID": [0, 1, 2, 0, 1, 0],
+    "comment": ["Trust the process, Embiid!", "Embiid trust issues", None,
+        "Brett Brown's rotations", "Trust the refs? never", "Tank for the pick"]}
+
+def _store(tmp_path, raw, name="raw.csv"):
+    """ Writes a raw csv file and returns its comment store. """
+    path = str(tmp_path / name)
+    pandas.DataFrame(raw).to_csv(path, index=False)
+    return comment_store.open_comment_store(path)
+
+def _edited(raw):
+    """
+    Returns raw with a comment of thread 16516 changed, thread 16596 removed and
+    a new thread 16634.
+    """
+    edited = {name: list(column) for name, column in raw.items()}
+    edited["comment"][4] = "Trust the rookies"
+    for name, new in zip(["global_ID", "local_ID", "comment"],
+        [[16634, 16634], [0, 1], ["zzyzx trust", "Embiid for MVP"]]):
+        edited[name] = edited[name][:5] + new
+    return edited
+
+def _postings(folder):
+    """ Returns the sorted (word, key, position) of every posting of the index in folder. """
+    postings = []
+    for segment in text_index.open_text_index("76ers", folder):
+        offsets = segment["term_offsets"]
+        for term_ind in range(len(segment["terms"])):
+            for posting in range(offsets[term_ind], offsets[term_ind + 1]):
+                postings.append((segment["terms"][term_ind], int(segment["keys"][posting]),
+                    int(segment["positions"][posting])))
+    return sorted(postings)
+
+def _scan(raw):
+    """ Returns the sorted (word, key, position) of every word of the comments of raw. """
+    postings = []
+    for global_ID, local_ID, comment in zip(raw["global_ID"], raw["local_ID"], raw["comment"]):
+        if comment is not None:
+            key = (global_ID << 32) | local_ID
+            postings.extend((word, key, position) for position, word in
+                enumerate(extraction_v2._split_comment(comment)))
+    return sorted(postings)
+
+def test_round_trip(tmp_path):
+    """ The saved index has every word of the comments, and searches find them. """
+    folder = str(tmp_path / "text_index")
+    assert text_index.update_text_index("76ers", _store(tmp_path, RAW), folder) == 6
+    assert _postings(folder) == _scan(RAW)
+    segments = text_index.open_text_index("76ers", folder)
+    trust = text_index.search(segments, "trust")
+    assert trust[["global_ID", "local_ID"]].values.tolist() == \
+        [[16498, 0], [16498, 1], [16516, 1]]
+    phrase = text_index.search(segments, "trust the", kind="phrase")
+    assert phrase[["global_ID", "local_ID"]].values.tolist() == [[16498, 0], [16516, 1]]
+    assert text_index.search(segments, "emb", kind="prefix")["hits"].tolist() == [1, 1]
+    # Nothing changed, so nothing is added.
+    assert text_index.update_text_index("76ers", _store(tmp_path, RAW), folder) == 0
+    assert len(text_index.open_text_index("76ers", folder)) == 1
+
+def test_rebuilt_when_tokenizer_changes(tmp_path, monkeypatch):
+    """ An index made by another tokenizer is built again from scratch. """
+    folder = str(tmp_path / "text_index")
+    text_index.update_text_index("76ers", _store(tmp_path, RAW), folder)
+    monkeypatch.setattr(text_index, "_tokenizer_hash", lambda: "another tokenizer")
+    assert text_index.update_text_index("76ers", _store(tmp_path, RAW), folder) == 6
+    with open(os.path.join(folder, "meta.json")) as meta_file:
+        meta = json.load(meta_file)
+    assert meta["tokenizer"] == "another tokenizer"
+    assert meta["segments"] == ["segment_0"]
+    assert _postings(folder) == _scan(RAW)
+
+def test_update_matches_rebuild(tmp_path):
+    """ An update with changed threads gives the postings of a new index. """
+    folder = str(tmp_path / "text_index")
+    text_index.update_text_index("76ers", _store(tmp_path, RAW), folder)
+    edited = _edited(RAW)
+    # Only the changed thread 16516 and the new thread 16634 are split again.
+    assert text_index.update_text_index("76ers", _store(tmp_path, edited), folder) == 4
+    rebuilt = str(tmp_path / "rebuilt")
+    text_index.update_text_index("76ers", _store(tmp_path, edited, "rebuilt.csv"), rebuilt)
+    assert _postings(folder) == _postings(rebuilt) == _scan(edited)
+    segments = text_index.open_text_index("76ers", folder)
+    assert text_index.search(segments, "refs").empty
+    assert text_index.search(segments, "tank").empty
+    assert text_index.search(segments, "zzyzx")["global_ID"].tolist() == [16634]
+
+def test_merge_matches_rebuild(tmp_path, monkeypatch):
+    """ Merged segments have the postings of a new index. """
+    monkeypatch.setattr(text_index, "MAX_SEGMENTS", 1)
+    folder = str(tmp_path / "text_index")
+    text_index.update_text_index("76ers", _store(tmp_path, RAW), folder)
+    edited = _edited(RAW)
+    text_index.update_text_index("76ers", _store(tmp_path, edited), folder)
+    assert len(text_index.open_text_index("76ers", folder)) == 1
+    assert _postings(folder) == _scan(edited)
+    # The merged segments are removed.
+    assert len([name for name in os.listdir(folder) if name.startswith("segment_")]) == 1
@@ -0,0 +1,87 @@
+"""
+Tests of module token_cache: a cache filled with the tokens of the comments of
+a small csv file is the same after it is saved and loaded, is dropped when the
+tokenizer version changes, and after a game's comments change and only that
+game is tokenized again, has the tokens of a cache filled from scratch.
+
+The comments are split on whitespace here; the sentiment stage fills the cache
+with sentiment_analysis._remove_noise() of word_tokenize().
+
+Run with
+    python -m pytest -q test_token_cache.py
+
+Creator: Sebastian Guo
+"""
+import numpy
+import pandas
+import token_cache
+
+RAW = {"global_ID": [16498, 16498, 16516, 16516, 16516, 16596],
+    "local_ID": [0, 1, 0, 1, 2, 0],
+    "comment": ["trust the process", "embiid", "brown out", "trust brown",
+        "the refs again", "tank"]}
+
+def _read_raw(tmp_path, raw):
+    """ Writes the comments to a csv file and reads them back. """
+    path = str(tmp_path / "raw.csv")
+    pandas.DataFrame(raw).to_csv(path, index=False)
+    return pandas.read_csv(path)
+
+def _fill(cache, table, global_IDs=None):
+    """ Stores the tokens of the comments of table (of the games in global_IDs) in cache. """
+    for global_ID, local_ID, comment in zip(table["global_ID"], table["local_ID"],
+        table["comment"]):
+        if global_IDs is None or global_ID in global_IDs:
+            token_cache.set_tokens(cache, "clean", global_ID, local_ID, comment.split())
+    return cache
+
+def _tokens(cache, table):
+    """ Returns the tokens in cache of every comment of table. """
+    return [token_cache.get_tokens(cache, "clean", global_ID, local_ID)
+        for global_ID, local_ID in zip(table["global_ID"], table["local_ID"])]
+
+def test_round_trip(tmp_path):
+    """ A saved and loaded cache has the arrays and tokens of the filled cache. """
+    table = _read_raw(tmp_path, RAW)
+    cache = _fill(token_cache.new_token_cache("v1"), table)
+    path = str(tmp_path / "token_cache.npz")
+    token_cache.save_token_cache(cache, path)
+    loaded = token_cache.load_token_cache(path, "v1")
+    assert _tokens(loaded, table) == [comment.split() for comment in RAW["comment"]]
+    assert loaded["vocab"] == cache["vocab"]
+    assert loaded["rows"] == cache["rows"]
+    for name in ["keys", "clean_ids", "clean_starts", "clean_ends"]:
+        assert numpy.array_equal(numpy.array(loaded[name]), numpy.array(cache[name])), name
+    assert token_cache.get_tokens(loaded, "clean", 16701, 0) is None
+
+def test_new_version_drops_tokens(tmp_path):
+    """ A cache saved by another tokenizer version, or no cache, loads empty. """
+    path = str(tmp_path / "token_cache.npz")
+    assert token_cache.load_token_cache(path, "v1")["rows"] == {}
+    token_cache.save_token_cache(_fill(token_cache.new_token_cache("v1"),
+        _read_raw(tmp_path, RAW)), path)
+    loaded = token_cache.load_token_cache(path, "v2")
+    assert loaded["rows"] == {} and loaded["version"] == "v2"
+    assert token_cache.get_tokens(loaded, "clean", 16498, 0) is None
+
+def test_update_matches_rebuild(tmp_path):
+    """
+    Clearing a changed game and tokenizing only it again gives the tokens of a
+    cache filled from scratch, and the saved cache keeps no unused token IDs.
+    """
+    path = str(tmp_path / "token_cache.npz")
+    token_cache.save_token_cache(_fill(token_cache.new_token_cache("v1"),
+        _read_raw(tmp_path, RAW)), path)
+    edited = {name: list(column) for name, column in RAW.items()}
+    edited["comment"][3] = "trust the rookies"
+    edited["comment"][4] = "refs"
+    table = _read_raw(tmp_path, edited)
+    cache = token_cache.load_token_cache(path, "v1")
+    token_cache.clear_games(cache, [16516])
+    assert _tokens(cache, table)[2:5] == [None, None, None]
+    token_cache.save_token_cache(_fill(cache, table, [16516]), path)
+    loaded = token_cache.load_token_cache(path, "v1")
+    rebuilt = _fill(token_cache.new_token_cache("v1"), table)
+    assert _tokens(loaded, table) == _tokens(rebuilt, table)
+    assert len(loaded["clean_ids"]) == len(rebuilt["clean_ids"]) == \
+        sum(len(comment.split()) for comment in edited["comment"])
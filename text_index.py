@@ -0,0 +1,394 @@
+"""
+Module with the text index: an on-disk inverted index from every word of the
+raw comments of a team to where it is used, so counts of any word or phrase
+(refs, trade, tank, the coaches of other teams) do not need a scan of the
+scrape. The comments are split with extraction_v2._split_comment(), the token
+split of the extraction (punctuation removed, lowercased, split on whitespace),
+and so are the queries.
+
+The index of a team is kept in Teams/<team>/text_index/ as segments. Every
+segment indexes the comments of some threads and is a folder of arrays that
+are opened memory-mapped:
+
+    terms.txt: the different words of the segment, sorted, one per line.
+    term_offsets.npy: where the postings of every word start, plus the number of postings.
+    keys.npy: the comment key ((global_ID << 32) | local_ID) of every posting.
+    positions.npy: the position of the word in the comment of every posting.
+    global_ID.npy: the threads of the segment.
+
+The postings of a word are sorted by comment key and position. meta.json lists
+the segments and a hash of the comments of every indexed thread.
+update_text_index() only splits the comments of threads that are new or whose
+comments changed, and adds them as a new segment, so new threads are indexed as
+they arrive; the old postings of a changed thread are dropped from the segments
+that had them. Once there are more than MAX_SEGMENTS segments they are merged
+into one. The index is rebuilt when extraction_v2.py, or a module it imports,
+changes.
+
+Find the comments using a word, a phrase or a word prefix with search() and
+count them by game or team with count_matches(), or from the command line:
+
+    python text_index.py --teams 76ers Knicks --phrase "trust the process" --by team
+
+Creator: Sebastian Guo
+"""
+import argparse, bisect, hashlib, json, os, shutil
+import numpy
+import pandas
+import assertions
+import comment_store
+import extraction_v2
+
+KINDS = ["term", "phrase", "prefix"]
+GROUPS = ["game", "team"]
+MAX_SEGMENTS = 8
+# Changing the layout of the segments changes the version, so old indexes are rebuilt.
+_VERSION = 2
+
+def text_index_dir(team):
+    """ Returns the folder of the text index of a team. """
+    return "/home/sebastianguo/Documents/Research/Teams/" + team + "/text_index"
+
+def update_text_index(team, store, folder=None):
+    """
+    Adds the comments of the threads in store that are not in the text index of
+    team yet, or whose comments changed since they were indexed, as a new
+    segment, and returns the number of comments added. The old postings of
+    changed threads, and of threads no longer in store, are dropped.
+
+    Parameter team: the basketball team whose comments are indexed.
+    Precondition: must be a string.
+
+    Parameter store: the comments of the team.
+    Precondition: must be a comment store from module comment_store, usually of
+    the raw csv file of the team.
+
+    Parameter folder: the folder of the index. If None, text_index_dir(team).
+    Precondition: must be None or a string.
+    """
+    assertions.assert_team(team)
+    folder = text_index_dir(team) if folder is None else folder
+    meta = _read_meta(folder)
+    if meta is None or meta.get("version") != _VERSION or \
+        meta.get("tokenizer") != _tokenizer_hash():
+        if os.path.exists(folder):
+            shutil.rmtree(folder)
+        meta = {"version": _VERSION, "tokenizer": _tokenizer_hash(), "segments": [],
+            "threads": {}, "next": 0}
+    os.makedirs(folder, exist_ok=True)
+    # Every different comment once, by the first row with its key.
+    global_IDs = store["keys"] >> 32
+    thread_hashes = _thread_hashes(store)
+    changed = [global_ID for global_ID, thread_hash in thread_hashes.items()
+        if meta["threads"].get(str(global_ID)) != thread_hash]
+    dropped = [int(global_ID) for global_ID in meta["threads"]
+        if int(global_ID) not in thread_hashes] + changed
+    replaced = _drop_threads(folder, meta, dropped) if dropped != [] else []
+    new = numpy.isin(global_IDs, changed)
+    keys = store["keys"][new]
+    if len(keys) > 0:
+        vocab, term_IDs, term_keys, positions = _split_comments(
+            comment_store.texts(store, store["key_ids"][new]), keys)
+        name = "segment_" + str(meta["next"])
+        _write_segment(os.path.join(folder, name), vocab, term_IDs, term_keys, positions,
+            numpy.unique(global_IDs[new]))
+        meta["segments"].append(name)
+        meta["next"] += 1
+    meta["threads"] = {str(global_ID): thread_hash
+        for global_ID, thread_hash in thread_hashes.items()}
+    _write_meta(folder, meta)
+    for old_name in replaced:
+        shutil.rmtree(os.path.join(folder, old_name))
+    if len(meta["segments"]) > MAX_SEGMENTS:
+        merge_segments(folder)
+    return len(keys)
+
+def merge_segments(folder):
+    """ Merges the segments of the text index in folder into one segment. """
+    meta = _read_meta(folder)
+    old = meta["segments"]
+    meta["segments"] = [_combine_segments(folder, meta, old, [])]
+    _write_meta(folder, meta)
+    for old_name in old:
+        shutil.rmtree(os.path.join(folder, old_name))
+
+def _drop_threads(folder, meta, global_IDs):
+    """
+    Replaces every segment of meta that has a thread in global_IDs by a copy
+    without the postings of those threads, or by nothing if it only has such
+    threads, and returns the names of the replaced segments. meta is changed
+    but not written; the replaced segments must only be removed after it is.
+    """
+    segments, replaced = [], []
+    for name in meta["segments"]:
+        dropped = numpy.isin(numpy.load(os.path.join(folder, name, "global_ID.npy")),
+            global_IDs)
+        if not dropped.any():
+            segments.append(name)
+            continue
+        if not dropped.all():
+            segments.append(_combine_segments(folder, meta, [name], global_IDs))
+        replaced.append(name)
+    meta["segments"] = segments
+    return replaced
+
+def _combine_segments(folder, meta, names, dropped):
+    """
+    Writes the postings of the segments names, without the threads in dropped,
+    as one new segment and returns its name.
+    """
+    segments = [open_segment(os.path.join(folder, name)) for name in names]
+    vocab = sorted(set().union(*[segment["terms"] for segment in segments]))
+    vocab_index = {term: term_ID for term_ID, term in enumerate(vocab)}
+    # The term IDs of every segment's postings, as IDs into the combined vocabulary.
+    term_IDs = numpy.concatenate([numpy.repeat(numpy.array([vocab_index[term]
+        for term in segment["terms"]], dtype=numpy.int64),
+        numpy.diff(segment["term_offsets"])) for segment in segments])
+    keys = numpy.concatenate([segment["keys"] for segment in segments])
+    positions = numpy.concatenate([segment["positions"] for segment in segments])
+    global_IDs = numpy.concatenate([segment["global_ID"] for segment in segments])
+    keep = ~numpy.isin(keys >> 32, dropped)
+    # The words that are only used by dropped threads are left out.
+    used, term_IDs = numpy.unique(term_IDs[keep], return_inverse=True)
+    name = "segment_" + str(meta["next"])
+    _write_segment(os.path.join(folder, name), [vocab[term_ID] for term_ID in used],
+        term_IDs, keys[keep], positions[keep], global_IDs[~numpy.isin(global_IDs, dropped)])
+    meta["next"] += 1
+    return name
+
+def open_text_index(team, folder=None):
+    """
+    Returns the segments of the text index of a team as a list of dictionaries
+    with the keys "terms" (list of strings) and the memory-mapped arrays
+    "term_offsets", "keys", "positions" and "global_ID". An index that was never
+    built has no segments.
+    """
+    folder = text_index_dir(team) if folder is None else folder
+    meta = _read_meta(folder)
+    if meta is None or meta.get("version") != _VERSION:
+        return []
+    return [open_segment(os.path.join(folder, name)) for name in meta["segments"]]
+
+def open_segment(segment_dir):
+    """ Returns one segment of a text index (see open_text_index()). """
+    with open(os.path.join(segment_dir, "terms.txt"), encoding="utf-8") as terms_file:
+        terms = terms_file.read()
+    segment = {"terms": terms.split("\n") if terms != "" else []}
+    for name in ["term_offsets", "keys", "positions", "global_ID"]:
+        segment[name] = numpy.load(os.path.join(segment_dir, name + ".npy"), mmap_mode="r")
+    return segment
+
+def search(segments, query, kind="term"):
+    """
+    Returns the comments of a text index matching query as a DataFrame with the
+    columns global_ID, local_ID and hits, the number of matches in the comment.
+
+    Parameter segments: the text index.
+    Precondition: must be a list from open_text_index().
+
+    Parameter query: the word, phrase or word prefix to find. It is split like
+    the comments, so "Brett Brown's" finds the words "brett" and "browns".
+    Precondition: must be a string with at least one word.
+
+    Parameter kind: "term" for comments with the word (a query of several words
+    finds comments with all of them), "phrase" for comments with the words one
+    after another, and "prefix" for comments with a word starting with query.
+    Precondition: must be a string in KINDS.
+    """
+    assert type(query) == str, repr(query) + " is not a string."
+    assert kind in KINDS, repr(kind) + " is not in " + str(KINDS) + "."
+    words = extraction_v2._split_comment(query)
+    assert words != [], repr(query) + " has no words."
+    assert kind != "prefix" or len(words) == 1, "A prefix query must be one word."
+    matches = [_search_segment(segment, words, kind) for segment in segments]
+    matches = numpy.concatenate(matches) if matches else numpy.zeros(0, dtype=numpy.int64)
+    keys, hits = numpy.unique(matches, return_counts=True)
+    return pandas.DataFrame({"global_ID": keys >> 32, "local_ID": keys & 0xffffffff,
+        "hits": hits})
+
+def search_teams(teams, query, kind="term"):
+    """
+    Returns search() of query over the text index of every team in teams, with
+    a column "Team" in front.
+    """
+    assertions.assert_str_list(teams)
+    tables = []
+    for team in teams:
+        table = search(open_text_index(team), query, kind)
+        table.insert(0, "Team", team)
+        tables.append(table)
+    return pandas.concat(tables, ignore_index=True) if tables else \
+        pandas.DataFrame(columns=["Team", "global_ID", "local_ID", "hits"])
+
+def count_matches(matches, by="game"):
+    """
+    Returns the number of matching comments ("comments") and of matches ("hits")
+    of a search by game (team and global ID) or by team.
+
+    Parameter matches: the result of search_teams().
+    Precondition: must be a DataFrame with the columns Team, global_ID, local_ID and hits.
+
+    Parameter by: "game" or "team".
+    Precondition: must be a string in GROUPS.
+    """
+    assert by in GROUPS, repr(by) + " is not in " + str(GROUPS) + "."
+    keys = ["Team", "global_ID"] if by == "game" else ["Team"]
+    return matches.groupby(keys, sort=True).agg(comments=("local_ID", "size"),
+        hits=("hits", "sum")).reset_index()
+
+def _search_segment(segment, words, kind):
+    """
+    Returns the comment key of every match of words in a segment, once per
+    match.
+    """
+    if kind == "prefix":
+        # The words with the prefix are next to each other in the sorted terms.
+        first = bisect.bisect_left(segment["terms"], words[0])
+        last = bisect.bisect_left(segment["terms"], words[0] + "\U0010ffff")
+        offsets = segment["term_offsets"]
+        return numpy.array(segment["keys"][offsets[first]:offsets[last]])
+    postings = [_postings(segment, word) for word in words]
+    if kind == "term":
+        common = postings[0][0]
+        for word_keys, _ in postings[1:]:
+            common = numpy.intersect1d(common, word_keys)
+        keys = numpy.concatenate([word_keys for word_keys, _ in postings])
+        return keys[numpy.isin(keys, common)]
+    # A phrase starts where every word i of it is at the start position plus i.
+    pairs = None
+    for word_ind in range(len(postings)):
+        word_keys, positions = postings[word_ind]
+        word_pairs = numpy.rec.fromarrays([word_keys, positions - word_ind],
+            names="key,start")
+        pairs = word_pairs if pairs is None else numpy.intersect1d(pairs, word_pairs)
+    return numpy.asarray(pairs["key"], dtype=numpy.int64)
+
+def _postings(segment, word):
+    """ Returns the comment keys and positions of a word in a segment. """
+    term_ind = bisect.bisect_left(segment["terms"], word)
+    if term_ind == len(segment["terms"]) or segment["terms"][term_ind] != word:
+        return numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.int64)
+    start, end = segment["term_offsets"][term_ind], segment["term_offsets"][term_ind + 1]
+    return numpy.array(segment["keys"][start:end]), \
+        numpy.array(segment["positions"][start:end], dtype=numpy.int64)
+
+def _split_comments(comments, keys):
+    """
+    Returns the sorted different words of the comments, and the term ID, comment
+    key and position of every word of every comment. Missing comments have no words.
+    """
+    terms, term_keys, positions = [], [], []
+    for comment, key in zip(comments, keys.tolist()):
+        if comment is not None:
+            words = extraction_v2._split_comment(comment)
+            terms.extend(words)
+            term_keys.extend([key] * len(words))
+            positions.extend(range(len(words)))
+    # The words are numbered in sorted order through a dictionary, since a numpy
+    # array of strings would give every word the length of the longest one.
+    vocab = sorted(set(terms))
+    vocab_index = {term: term_ID for term_ID, term in enumerate(vocab)}
+    return vocab, numpy.fromiter((vocab_index[term] for term in terms), dtype=numpy.int64,
+        count=len(terms)), numpy.array(term_keys, dtype=numpy.int64), \
+        numpy.array(positions, dtype=numpy.int32)
+
+def _write_segment(segment_dir, vocab, term_IDs, keys, positions, global_IDs):
+    """
+    Writes a segment from the sorted words vocab and the term ID, comment key
+    and position of every posting. Postings are grouped by word and sorted by
+    comment key and position.
+    """
+    order = numpy.lexsort((positions, keys, term_IDs))
+    offsets = numpy.zeros(len(vocab) + 1, dtype=numpy.int64)
+    numpy.cumsum(numpy.bincount(term_IDs, minlength=len(vocab)), out=offsets[1:])
+    os.makedirs(segment_dir)
+    with open(os.path.join(segment_dir, "terms.txt"), "w", encoding="utf-8") as terms_file:
+        terms_file.write("\n".join(vocab))
+    numpy.save(os.path.join(segment_dir, "term_offsets.npy"), offsets)
+    numpy.save(os.path.join(segment_dir, "keys.npy"), numpy.asarray(keys, dtype=numpy.int64)[order])
+    numpy.save(os.path.join(segment_dir, "positions.npy"),
+        numpy.asarray(positions, dtype=numpy.int32)[order])
+    numpy.save(os.path.join(segment_dir, "global_ID.npy"),
+        numpy.unique(numpy.asarray(global_IDs, dtype=numpy.int64)))
+
+def _read_meta(folder):
+    """ Returns the meta.json of a text index, or None if there is none. """
+    meta_path = os.path.join(folder, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as meta_file:
+        return json.load(meta_file)
+
+def _write_meta(folder, meta):
+    """
+    Writes the meta.json of a text index. It is replaced in one step, so a
+    segment is only part of the index once it is written completely.
+    """
+    with open(os.path.join(folder, "meta.json.tmp"), "w") as meta_file:
+        json.dump(meta, meta_file)
+    os.replace(os.path.join(folder, "meta.json.tmp"), os.path.join(folder, "meta.json"))
+
+def _thread_hashes(store):
+    """
+    Returns a dictionary from every global ID in store to a hash of the keys
+    and the text of the comments of the thread, to find the threads that
+    changed since they were indexed.
+    """
+    # The keys are sorted, so the comments of a thread are next to each other.
+    global_IDs = store["keys"] >> 32
+    starts = numpy.flatnonzero(numpy.r_[True, global_IDs[1:] != global_IDs[:-1]]) \
+        if len(global_IDs) > 0 else numpy.zeros(0, dtype=numpy.int64)
+    ends = numpy.r_[starts[1:], len(global_IDs)].astype(numpy.int64)
+    offsets = numpy.asarray(store["offsets"])
+    text = store["text"].tobytes()
+    null = numpy.asarray(store["null"])
+    hashes = {}
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        ids = store["key_ids"][start:end]
+        digest = hashlib.sha256(numpy.ascontiguousarray(store["keys"][start:end]).tobytes())
+        digest.update(null[ids].tobytes())
+        for comment_ID in ids.tolist():
+            digest.update(text[offsets[comment_ID]:offsets[comment_ID + 1]])
+        hashes[int(global_IDs[start])] = digest.hexdigest()
+    return hashes
+
+def _tokenizer_hash():
+    """
+    Returns a hash of the source of extraction_v2 and of every module of the
+    repository it imports, the modules the fingerprint of a pipeline stage
+    with code extraction_v2 covers (see pipeline._code_modules()). A change to
+    _split_comment() or to any helper it calls rebuilds the index.
+    """
+    # pipeline.py imports this module, so it is only imported when needed.
+    import pipeline
+    digest = hashlib.sha256()
+    for module in pipeline._code_modules(["extraction_v2"]):
+        with open(pipeline._module_path(module), "rb") as source:
+            digest.update(module.encode() + source.read())
+    return digest.hexdigest()
+
+def _parse_args(argv=None):
+    """ Parses the command line arguments of a query. """
+    parser = argparse.ArgumentParser(description="Count the comments using a " +
+        "word, phrase or word prefix in the text indexes of teams.")
+    parser.add_argument("--teams", nargs="+", default=["76ers"])
+    query = parser.add_mutually_exclusive_group(required=True)
+    query.add_argument("--term")
+    query.add_argument("--phrase")
+    query.add_argument("--prefix")
+    parser.add_argument("--by", choices=GROUPS, default="game")
+    parser.add_argument("--build", action="store_true",
+        help="add the new threads of the teams to their indexes first")
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    args = _parse_args()
+    if args.build:
+        for build_team in args.teams:
+            update_text_index(build_team, comment_store.open_comment_store(
+                "/home/sebastianguo/Documents/Research/Teams/" + build_team +
+                "/csv_data/regseason_postgame_2020_" + build_team + "_.csv"))
+    query_kind = "term" if args.term is not None else "phrase" if args.phrase is not None \
+        else "prefix"
+    found = search_teams(args.teams, args.term or args.phrase or args.prefix, query_kind)
+    print(count_matches(found, args.by).to_string(index=False))
@@ -0,0 +1,142 @@
+"""
+Module that parses the free-text titles of the Reddit threads in
+game_thread_urls_2020_enhanced.csv into a typed table. The titles are parsed
+once, the table is cached in binary form next to the csv file and every team's
+game result resolver in mgmt_matching uses the same table instead of running
+its own regex over the titles.
+
+Creator: Sebastian Guo
+"""
+import os, pickle, re
+import pandas
+import assertions
+
+THREAD_TYPES = ["game", "post-game", "other"]
+# "Post Game Thread", "post-game thread", "Postgame Thread", "POST GAME-THREAD".
+_POST_GAME_RE = re.compile(r"post[\s-]*game[\s-]*thread", re.IGNORECASE)
+_GAME_THREAD_RE = re.compile(r"game[\s-]*thread", re.IGNORECASE)
+_RECORD_RE = re.compile(r"\s*\((\d+-\d+)\)")
+_AWAY_AT_HOME_RE = re.compile(r"\s@\s|\sat\s")
+
+def build_thread_index(game_thread_info_file, team_file):
+    """
+    Returns a DataFrame indexed by thread ID ("ID") with one row per thread and
+    the columns:
+
+    "Thread Type": "game", "post-game" or "other" as a categorical.
+    "Post Date": the date the thread was posted as a datetime.
+    "Teams": a tuple of the NBA teams named in the title, in the order they
+    appear (as found by re.findall() with all the teams in team_file).
+    "Team 1", "Team 2": the first two different teams named in the title.
+    "Team 1 Record", "Team 2 Record": the "W-L" record written in brackets
+    right after Team 1 or Team 2, if there is one.
+    "Away Team", "Home Team": filled only when the title has the form
+    "Away Team ... @ Home Team" (or " at ").
+    "title": the original title.
+
+    Only the first row of a thread ID is used, like in win_or_lose().
+
+    Parameter game_thread_info_file: a csv file containing the Reddit thread
+    titles, the corresponding global IDs of those threads, and the dates of the game.
+    Precondition: must be a reader object and contain the headers "ID", "dt",
+    and "title".
+
+    Parameter team_file: a file containing all 30 basketball teams in the NBA.
+    Precondition: must be a csv reader object containing the header "Team".
+    """
+    assertions.assert_game_thread_info_file_format(game_thread_info_file)
+    assertions.assert_team_file_format(team_file)
+    threads = game_thread_info_file.drop_duplicates("ID")
+    titles = threads["title"].fillna("").astype(str)
+    team_re = re.compile("|".join(team_file["Team"]))
+
+    index_dict = {"Thread Type": [], "Teams": [], "Team 1": [], "Team 1 Record": [],
+        "Team 2": [], "Team 2 Record": [], "Away Team": [], "Home Team": []}
+    for title in titles:
+        index_dict["Thread Type"].append(_thread_type(title))
+        matches = list(team_re.finditer(title))
+        index_dict["Teams"].append(tuple(match.group() for match in matches))
+        first_two = []
+        for match in matches:
+            if len(first_two) < 2 and match.group() not in [m.group() for m in first_two]:
+                first_two.append(match)
+        first_two += [None] * (2 - len(first_two))
+        for number, match in enumerate(first_two, 1):
+            index_dict["Team " + str(number)].append(None if match is None else match.group())
+            index_dict["Team " + str(number) + " Record"].append(_record_after(title, match))
+        away, home = first_two
+        if away is not None and home is not None and \
+            _AWAY_AT_HOME_RE.search(title, away.end(), home.start()):
+            index_dict["Away Team"].append(away.group())
+            index_dict["Home Team"].append(home.group())
+        else:
+            index_dict["Away Team"].append(None)
+            index_dict["Home Team"].append(None)
+
+    index = pandas.DataFrame(index_dict, index=pandas.Index(threads["ID"].to_numpy(), name="ID"))
+    index["Thread Type"] = pandas.Categorical(index["Thread Type"], categories=THREAD_TYPES)
+    index.insert(1, "Post Date", pandas.to_datetime(threads["dt"], format="%m/%d/%Y").to_numpy())
+    index["title"] = titles.to_numpy()
+    return index
+
+def load_thread_index(game_thread_path, team_file, cache_path=None):
+    """
+    Returns the thread index of the csv file at game_thread_path. The index is
+    read from its binary cache if the csv file has the same size and
+    modification time and team_file the same teams as when the cache was made,
+    and otherwise built with build_thread_index() and cached.
+
+    Parameter game_thread_path: the path of game_thread_urls_2020_enhanced.csv.
+    Precondition: must be a string.
+
+    Parameter team_file: a file containing all 30 basketball teams in the NBA.
+    Precondition: must be a csv reader object containing the header "Team".
+
+    Parameter cache_path: where the binary cache is kept. If None, the csv path
+    with the extension ".index.pkl" is used.
+    Precondition: must be None or a string.
+    """
+    assert type(game_thread_path) == str, repr(game_thread_path) + " is not a string."
+    if cache_path is None:
+        cache_path = os.path.splitext(game_thread_path)[0] + ".index.pkl"
+    stat = os.stat(game_thread_path)
+    key = (stat.st_size, stat.st_mtime_ns, tuple(team_file["Team"].astype(str)))
+    if os.path.exists(cache_path):
+        with open(cache_path, "rb") as cache_file:
+            cached = pickle.load(cache_file)
+        # Caches from before the key was kept are a bare DataFrame.
+        if type(cached) == tuple and cached[0] == key:
+            return cached[1]
+    with open(game_thread_path, newline='') as glob_ID_file:
+        glob_ID_reader = pandas.read_csv(glob_ID_file)
+    index = build_thread_index(glob_ID_reader, team_file)
+    with open(cache_path + ".tmp", "wb") as cache_file:
+        pickle.dump((key, index), cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(cache_path + ".tmp", cache_path)
+    return index
+
+def opponents(thread_index, team):
+    """
+    Returns a Series with the same index as thread_index holding, for every
+    thread, the list of teams named in the title other than team. These are
+    the matches of make_team_str(team_file, team) over the title.
+    """
+    return thread_index["Teams"].map(lambda teams: [name for name in teams if name != team])
+
+def _thread_type(title):
+    """ Returns "post-game", "game" or "other" for a thread title. """
+    if _POST_GAME_RE.search(title):
+        return "post-game"
+    elif _GAME_THREAD_RE.search(title):
+        return "game"
+    return "other"
+
+def _record_after(title, match):
+    """
+    Returns the "W-L" record in brackets directly after a team name match, or
+    None if there is none.
+    """
+    if match is None:
+        return None
+    record = _RECORD_RE.match(title, match.end())
+    return None if record is None else record.group(1)
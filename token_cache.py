@@ -0,0 +1,203 @@
+"""
+Module with a cache of tokenized comments for the sentiment stage, so a comment
+is tokenized at most once per tokenizer. Every comment, found by its global and
+local ID, can have tokens in the layers in LAYERS:
+
+"clean": the comment tokenized by word_tokenize() and cleaned and lemmatized by
+sentiment_analysis._remove_noise(). These are the tokens fed to the classifier.
+
+Tokens are stored compactly as integer IDs into one vocabulary. The IDs of all
+comments of a layer are kept in one array and every comment stores where its
+tokens start and end in that array.
+
+The pipeline keeps the cache in Teams/<team>/token_cache.npz across runs, with
+the version of the tokenizer that made it (see pipeline._run_sentiment()): a
+comment is only tokenized again when its game is scored again because its
+comments changed, or when the tokenizer changes.
+
+Creator: Sebastian Guo
+"""
+from array import array
+import os
+import numpy
+import assertions
+
+LAYERS = ["clean"]
+
+def new_token_cache(version=None):
+    """
+    Returns an empty token cache. The cache is a dictionary with the keys
+    "version", "vocab" (list of token strings), "vocab_index" (token string to
+    ID), "rows" ((global ID, local ID) to row number), and for every layer in
+    LAYERS an array of token IDs and arrays with the start and end of every
+    row's tokens. A start of -1 means the row has no tokens in that layer yet.
+
+    Parameter version: the version of the tokenizer the tokens are made with.
+    Precondition: must be None or a string.
+    """
+    assert version is None or type(version) == str, repr(version) + " is not None or a string."
+    cache = {"version": version, "vocab": [], "vocab_index": {}, "rows": {},
+        "keys": array("q")}
+    for layer in LAYERS:
+        cache[layer + "_ids"] = array("i")
+        cache[layer + "_starts"] = array("q")
+        cache[layer + "_ends"] = array("q")
+    return cache
+
+def set_tokens(cache, layer, global_ID, local_ID, tokens):
+    """
+    Stores the tokens of the comment with the given global and local ID in a
+    layer of the cache, replacing any tokens it had in that layer.
+
+    Parameter cache: a token cache created by new_token_cache().
+    Precondition: must be a dictionary with the keys of new_token_cache().
+
+    Parameter layer: the layer to store the tokens in.
+    Precondition: must be a string in LAYERS.
+
+    Parameter global_ID: the global ID of the comment.
+    Precondition: must be an integer.
+
+    Parameter local_ID: the local ID of the comment.
+    Precondition: must be an integer.
+
+    Parameter tokens: the tokens of the comment.
+    Precondition: must be a list with string entries.
+    """
+    assertions.assert_token_layer(layer)
+    row = _get_row(cache, global_ID, local_ID)
+    vocab = cache["vocab"]
+    vocab_index = cache["vocab_index"]
+    ids = cache[layer + "_ids"]
+    cache[layer + "_starts"][row] = len(ids)
+    for token in tokens:
+        token_ID = vocab_index.get(token)
+        if token_ID is None:
+            token_ID = len(vocab)
+            vocab_index[token] = token_ID
+            vocab.append(token)
+        ids.append(token_ID)
+    cache[layer + "_ends"][row] = len(ids)
+
+def get_tokens(cache, layer, global_ID, local_ID):
+    """
+    Returns the list of tokens of the comment with the given global and local ID
+    in a layer of the cache, or None if the comment has no tokens in that layer.
+
+    Parameter cache: a token cache created by new_token_cache().
+    Precondition: must be a dictionary with the keys of new_token_cache().
+
+    Parameter layer: the layer to get the tokens from.
+    Precondition: must be a string in LAYERS.
+
+    Parameter global_ID: the global ID of the comment.
+    Precondition: must be an integer.
+
+    Parameter local_ID: the local ID of the comment.
+    Precondition: must be an integer.
+    """
+    assertions.assert_token_layer(layer)
+    row = cache["rows"].get((int(global_ID), int(local_ID)))
+    if row is None or cache[layer + "_starts"][row] == -1:
+        return None
+    vocab = cache["vocab"]
+    ids = cache[layer + "_ids"]
+    return [vocab[token_ID] for token_ID in
+        ids[cache[layer + "_starts"][row]:cache[layer + "_ends"][row]]]
+
+def clear_games(cache, global_IDs):
+    """
+    Removes the tokens of every comment of the games in global_IDs from every
+    layer of the cache, for games whose comments changed.
+
+    Parameter cache: a token cache created by new_token_cache().
+    Precondition: must be a dictionary with the keys of new_token_cache().
+
+    Parameter global_IDs: the global IDs of the games.
+    Precondition: must be a list of integers.
+    """
+    assert type(global_IDs) == list, repr(global_IDs) + " is not a list."
+    games = set(int(global_ID) for global_ID in global_IDs)
+    for (global_ID, _), row in cache["rows"].items():
+        if global_ID in games:
+            for layer in LAYERS:
+                cache[layer + "_starts"][row] = -1
+                cache[layer + "_ends"][row] = -1
+
+def save_token_cache(cache, path):
+    """
+    Saves the token cache to a compressed numpy file at path. The vocabulary is
+    stored as one newline separated buffer since tokens never contain whitespace.
+    Token IDs no row refers to any more (see clear_games() and set_tokens()) are
+    left out.
+    """
+    arrays = {"vocab": numpy.frombuffer("\n".join(cache["vocab"]).encode("utf-8"),
+        dtype=numpy.uint8), "keys": numpy.array(cache["keys"], dtype=numpy.int64),
+        "version": numpy.frombuffer((cache["version"] or "").encode("utf-8"),
+        dtype=numpy.uint8)}
+    for layer in LAYERS:
+        arrays[layer + "_ids"], arrays[layer + "_starts"], arrays[layer + "_ends"] = \
+            _compact(numpy.array(cache[layer + "_ids"], dtype=numpy.int32),
+            numpy.array(cache[layer + "_starts"], dtype=numpy.int64),
+            numpy.array(cache[layer + "_ends"], dtype=numpy.int64))
+    numpy.savez_compressed(path, **arrays)
+
+def load_token_cache(path, version=None):
+    """
+    Returns the token cache saved by save_token_cache() at path, or a new token
+    cache if there is no file at path or the file has another version.
+
+    Parameter path: the path of the token cache.
+    Precondition: must be a string.
+
+    Parameter version: the version of the tokenizer the tokens must be made with.
+    Precondition: must be None or a string.
+    """
+    cache = new_token_cache(version)
+    if not os.path.exists(path):
+        return cache
+    with numpy.load(path) as arrays:
+        saved = arrays["version"].tobytes().decode("utf-8") if "version" in arrays else ""
+        if saved != (version or ""):
+            return cache
+        vocab = arrays["vocab"].tobytes().decode("utf-8")
+        cache["vocab"] = vocab.split("\n") if vocab != "" else []
+        cache["keys"] = array("q", arrays["keys"].tobytes())
+        for layer in LAYERS:
+            cache[layer + "_ids"] = array("i", arrays[layer + "_ids"].astype(numpy.int32).tobytes())
+            for part in ["_starts", "_ends"]:
+                cache[layer + part] = array("q", arrays[layer + part].astype(numpy.int64).tobytes())
+    cache["vocab_index"] = {token: token_ID for token_ID, token in enumerate(cache["vocab"])}
+    keys = cache["keys"]
+    cache["rows"] = {(keys[ind], keys[ind + 1]): ind // 2 for ind in range(0, len(keys), 2)}
+    return cache
+
+def _compact(ids, starts, ends):
+    """
+    Returns the token IDs, starts and ends of a layer with only the token IDs
+    that a row refers to, in row order.
+    """
+    lengths = numpy.where(starts >= 0, ends - starts, 0)
+    new_starts = numpy.cumsum(lengths) - lengths
+    # The position in ids of every token kept: its row's old start plus its
+    # place in the row.
+    shift = numpy.repeat(starts - new_starts, lengths)
+    new_ids = ids[shift + numpy.arange(len(shift), dtype=numpy.int64)]
+    return new_ids, numpy.where(starts >= 0, new_starts, -1), \
+        numpy.where(starts >= 0, new_starts + lengths, -1)
+
+def _get_row(cache, global_ID, local_ID):
+    """
+    Returns the row number of a comment in the cache, adding an empty row if
+    the comment is not in the cache yet.
+    """
+    key = (int(global_ID), int(local_ID))
+    row = cache["rows"].get(key)
+    if row is None:
+        row = len(cache["rows"])
+        cache["rows"][key] = row
+        cache["keys"].extend(key)
+        for layer in LAYERS:
+            cache[layer + "_starts"].append(-1)
+            cache[layer + "_ends"].append(-1)
+    return row
@@ -0,0 +1,84 @@
+"""
+Module with the column types of the pipeline's tables, applied when a table is
+loaded or made instead of keeping whatever pandas infers:
+
+IDs (global_ID, local_ID): fixed-width integers of ID_DTYPE.
+Mention flags (one column per roster person): FLAG_DTYPE, 1 for a mention and 0
+otherwise, instead of the strings "1" and "".
+Counts (mentions): COUNT_DTYPE.
+Names and labels (named entities, categories, positions, races, teams):
+pandas categoricals, so every different string is kept once with a small
+integer code per row.
+
+Creator: Sebastian Guo
+"""
+import numpy
+import pandas
+
+ID_DTYPE = numpy.int32
+FLAG_DTYPE = numpy.int8
+COUNT_DTYPE = numpy.int32
+ID_COLUMNS = ["global_ID", "local_ID"]
+COUNT_COLUMNS = ["mentions"]
+LABEL_COLUMNS = ["named entity", "name", "category", "team", "Team", "Pos", "Race"]
+
+def id_column(values):
+    """
+    Returns values as a numpy array of ID_DTYPE.
+
+    Parameter values: the IDs.
+    Precondition: must be integers that fit in ID_DTYPE.
+    """
+    values = numpy.asarray(values)
+    limits = numpy.iinfo(ID_DTYPE)
+    assert values.size == 0 or (values.min() >= limits.min and values.max() <= limits.max), \
+        "An ID does not fit in " + numpy.dtype(ID_DTYPE).name + "."
+    return values.astype(ID_DTYPE)
+
+def flag_column(values):
+    """
+    Returns mention flags as a numpy array of FLAG_DTYPE: 1 where a value is 1
+    or "1" (as written by comment_roster() or read back from its csv file) and 0
+    where it is 0, "" or missing.
+    """
+    values = pandas.Series(values)
+    return (pandas.to_numeric(values.replace("", numpy.nan), errors="coerce") == 1) \
+        .to_numpy().astype(FLAG_DTYPE)
+
+def label_column(values):
+    """ Returns names or labels as a pandas Categorical. """
+    return pandas.Categorical(values)
+
+def apply_types(table, flag_columns=None):
+    """
+    Returns table with the types of this module: the columns in ID_COLUMNS,
+    COUNT_COLUMNS and LABEL_COLUMNS it has, and the mention flags in flag_columns.
+    Other columns are kept as they are. The table is changed in place.
+
+    Parameter table: a table of the pipeline.
+    Precondition: must be a DataFrame.
+
+    Parameter flag_columns: the mention flag columns, usually the roster_list.
+    If None, the table has no flag columns.
+    Precondition: must be None or a list of column names of table.
+    """
+    for column in ID_COLUMNS:
+        if column in table.columns:
+            table[column] = id_column(table[column])
+    for column in COUNT_COLUMNS:
+        if column in table.columns:
+            table[column] = table[column].astype(COUNT_DTYPE)
+    for column in LABEL_COLUMNS:
+        if column in table.columns and not isinstance(table[column].dtype,
+            pandas.CategoricalDtype):
+            table[column] = label_column(table[column])
+    for column in [] if flag_columns is None else flag_columns:
+        table[column] = flag_column(table[column])
+    return table
+
+def new_flags(length, roster_list):
+    """
+    Returns a dictionary from every person in roster_list to a zeroed numpy
+    array of FLAG_DTYPE with length entries, the flag columns of a mention table.
+    """
+    return {person: numpy.zeros(length, dtype=FLAG_DTYPE) for person in roster_list}
@@ -0,0 +1,126 @@
+"""
+Module with the WriteBehind class, the output layer of the per-game stages.
+Writes (for example DataFrame.to_csv) are handed to a small pool of background
+threads, so the computation of the next game overlaps the disk writes of the
+previous ones. The number of writes in flight is bounded: once max_pending
+writes are waiting, submit() blocks until one finishes, so a slow disk slows
+the pipeline down instead of filling the memory with DataFrames. flush() waits
+for every write so far and raises the first error of any of them; the per-game
+stages flush at the end of every stage.
+
+Creator: Sebastian Guo
+"""
+import concurrent.futures, threading
+
+class WriteBehind(object):
+    """
+    A class for a bounded pool of background writes. Use it in a with block,
+    which flushes and closes it at the end:
+
+        with WriteBehind() as writer:
+            writer.submit(df.to_csv, path, index=False)
+
+    Writes given the same key run one after another in the order they were
+    submitted, for example appends to the same file. Other writes can run in
+    any order.
+
+    Attribute max_workers: the number of background threads.
+    Attribute max_pending: the largest number of writes submitted but not finished.
+    """
+
+    def __init__(self, max_workers=4, max_pending=32):
+        """
+        Parameter max_workers: the number of background threads.
+        Precondition: must be an integer greater than zero.
+
+        Parameter max_pending: the largest number of writes in flight.
+        Precondition: must be an integer greater than zero.
+        """
+        assert type(max_workers) == int and max_workers > 0, \
+            repr(max_workers) + " is not an integer greater than zero."
+        assert type(max_pending) == int and max_pending > 0, \
+            repr(max_pending) + " is not an integer greater than zero."
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers,
+            thread_name_prefix="write-behind")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._last_by_key = {}
+        self._error = None
+
+    def submit(self, func, *args, key=None, **kwargs):
+        """
+        Runs func(*args, **kwargs) in the background and returns its Future.
+        Blocks while max_pending writes are in flight, and raises the error of
+        an earlier write if one failed.
+
+        Parameter func: the write to run.
+        Precondition: must be callable. Its arguments must not be changed until
+        the write is finished.
+
+        Parameter key: writes with the same key run in submission order.
+        Precondition: must be None or hashable.
+        """
+        self.raise_error()
+        self._slots.acquire()
+        with self._lock:
+            previous = None if key is None else self._last_by_key.get(key)
+            future = self._executor.submit(_run_after, previous, func, args, kwargs)
+            self._pending.add(future)
+            if key is not None:
+                self._last_by_key[key] = future
+        future.add_done_callback(self._finished)
+        return future
+
+    def flush(self):
+        """ Waits for every write submitted so far and raises the first error. """
+        with self._lock:
+            pending = list(self._pending)
+        concurrent.futures.wait(pending)
+        with self._lock:
+            self._last_by_key = {key: future for key, future in
+                self._last_by_key.items() if not future.done()}
+        self.raise_error()
+
+    def raise_error(self):
+        """ Raises the first error of a finished write, if there is one. """
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        """ Flushes the writes and stops the background threads. """
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # The error of the block is raised instead of any write error.
+            self._executor.shutdown(wait=True)
+        return False
+
+    def _finished(self, future):
+        """ Frees the slot of a finished write and keeps its error. """
+        with self._lock:
+            self._pending.discard(future)
+            if self._error is None and not future.cancelled() and \
+                future.exception() is not None:
+                self._error = future.exception()
+        self._slots.release()
+
+def _run_after(previous, func, args, kwargs):
+    """
+    Waits for the write previous (if any) and runs func. previous was submitted
+    earlier to the same first-in first-out pool, so it has already started.
+    """
+    if previous is not None:
+        concurrent.futures.wait([previous])
+    return func(*args, **kwargs)